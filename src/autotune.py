@@ -0,0 +1,333 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import socket
+import sys
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+import config
+from backends import BACKENDS, file_hash
+
+# Settings a profile can override in TargetDetector
+PROFILE_KEYS = ('backend', 'imgsz', 'batch_size', 'threads', 'interop_threads')
+
+
+def _version(package: str) -> Optional[str]:
+    try:
+        from importlib.metadata import version
+        return version(package)
+    except Exception:
+        return None
+
+
+def machine_fingerprint() -> dict:
+    """What a tuned profile depends on: the host, its CPU and the runtime versions"""
+    return {
+        'host': socket.gethostname(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'torch': _version('torch'),
+        'onnxruntime': _version('onnxruntime'),
+        'openvino': _version('openvino'),
+    }
+
+
+def load_profile(path: Optional[str], model_path: str,
+                 max_age_days: Optional[float] = None) -> Optional[dict]:
+    """
+    Tuned settings for model_path on this machine
+    Args:
+        path: Profile file written by autotune.py (None disables profiles)
+        model_path: Model the settings are for
+        max_age_days: Profiles older than this are stale (default TUNING_PROFILE_MAX_AGE_DAYS)
+    Returns:
+        Dict with PROFILE_KEYS (batch_size is None for latency-tuned profiles),
+        or None (with the reason printed) if there is no current profile and
+        the defaults should be used
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable tuning profile {path}: {str(e)}")
+        return None
+
+    if max_age_days is None:
+        max_age_days = config.TUNING_PROFILE_MAX_AGE_DAYS
+    reason = None
+    fingerprint = machine_fingerprint()
+    changed = [key for key, value in fingerprint.items() if data.get('machine', {}).get(key) != value]
+    if changed:
+        reason = f"machine changed ({', '.join(changed)})"
+    else:
+        entry = data.get('models', {}).get(file_hash(model_path)) if os.path.exists(model_path) else None
+        if entry is None:
+            reason = f"{os.path.basename(model_path)} was not tuned"
+        elif (time.time() - entry.get('created', 0)) / 86400 > max_age_days:
+            reason = f"{os.path.basename(model_path)} was tuned more than {max_age_days:g} days ago"
+    if reason is not None:
+        print(f"Tuning profile {path} is stale ({reason}), using defaults; re-run autotune.py")
+        return None
+    return {key: entry['settings'].get(key) for key in PROFILE_KEYS}
+
+
+def merge_profile(profile: dict, override=(), **explicit) -> tuple:
+    """
+    Combine a caller's settings with a profile
+    Args:
+        profile: Settings from load_profile
+        override: Settings the profile replaces even when the caller set them
+                  (TUNING_PROFILE_SETTINGS); other settings are only filled in
+                  from the profile where the caller left them as None
+        explicit: The caller's backend, imgsz, batch_size and threads; None means unset
+    Returns:
+        (settings with PROFILE_KEYS, descriptions of the profile values used,
+        descriptions of explicit values kept over different profile values).
+        interop_threads only comes from the profile with its thread count.
+    """
+    settings, used, kept = dict(explicit), [], []
+    for key, value in explicit.items():
+        tuned = profile.get(key)
+        if tuned is None or tuned == value:
+            continue
+        if value is None:
+            settings[key] = tuned
+            used.append(f"{key} {tuned}")
+        elif key in override:
+            settings[key] = tuned
+            used.append(f"{key} {tuned} (instead of {value})")
+        else:
+            kept.append(f"{key} {value} (profile: {tuned})")
+    settings['interop_threads'] = None
+    if profile.get('threads') is not None and settings.get('threads') == profile['threads']:
+        settings['interop_threads'] = profile.get('interop_threads')
+        used.append(f"interop_threads {settings['interop_threads']}")
+    return settings, used, kept
+
+
+def detector_settings(config) -> dict:
+    """
+    config.py's backend, imgsz and batch size as TargetDetector keyword
+    arguments, with the profile path and the settings a current profile may
+    replace (TUNING_PROFILE_SETTINGS). Without a current profile the config
+    values are used as they are.
+    """
+    return {
+        'backend': config.BACKEND,
+        'imgsz': config.IMGSZ,
+        'max_batch_size': config.BATCH_SIZE,
+        'threads': None,
+        'profile_path': config.TUNING_PROFILE_PATH,
+        'profile_settings': list(config.TUNING_PROFILE_SETTINGS),
+    }
+
+
+def apply_torch_threads(threads: Optional[int], interop_threads: Optional[int]):
+    """
+    Set torch's process-wide thread pools. The inter-op pool can only be sized
+    before torch first runs in parallel, so a late call keeps the current size.
+    """
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads and torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            print(f"Cannot change torch inter-op threads to {interop_threads} after startup")
+
+
+def thread_candidates() -> List[int]:
+    """Intra-op thread counts worth trying on this machine"""
+    cpus = os.cpu_count() or 1
+    return sorted({n for n in (1, 2, 4, 8, cpus // 2, cpus) if 1 <= n <= cpus})
+
+
+def _measure(model_path: str, backend: str, threads: int, interop_threads: int,
+             imgsz_values: List[int], batch_sizes: List[int], frames: List[np.ndarray],
+             iterations: int) -> List[dict]:
+    """
+    Measure every imgsz/batch size for one backend and thread setting. Runs in
+    a fresh process, so thread pools are sized before any inference.
+    """
+    if backend == 'torch':
+        apply_torch_threads(threads, interop_threads)
+    from detect_targets import TargetDetector
+
+    results = []
+    for imgsz in imgsz_values:
+        for batch_size in batch_sizes:
+            detector = TargetDetector(model_path, config.CONF_THRESHOLD, config.IOU_THRESHOLD,
+                                      batch_size, backend, imgsz, threads=threads)
+            batch = [frames[i % len(frames)] for i in range(batch_size)]
+            detector.detect_batch(batch)
+            latencies = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                detector.detect_batch(batch)
+                latencies.append((time.perf_counter() - start) * 1000)
+            p50 = float(np.percentile(latencies, 50))
+            results.append({
+                'backend': backend,
+                'imgsz': imgsz,
+                'batch_size': batch_size,
+                'threads': threads,
+                'interop_threads': interop_threads,
+                'batch_p50_ms': p50,
+                'images_per_sec': batch_size * 1000 / p50,
+                'errors': detector.errors,
+            })
+    return results
+
+
+def choose(results: List[dict], goal: str, target: Optional[float]) -> dict:
+    """
+    Pick the best measured setting
+    Args:
+        results: Rows from _measure
+        goal: 'latency' (single-frame p50) or 'throughput' (images/sec)
+        target: Latency ceiling in ms or throughput floor in images/sec. Among
+                settings meeting it the largest imgsz (best accuracy) wins,
+                then the fastest; None just takes the fastest at the largest imgsz.
+    """
+    results = [r for r in results if r['errors'] == 0]
+    if goal == 'latency':
+        results = [r for r in results if r['batch_size'] == 1]
+        score, meets = (lambda r: -r['batch_p50_ms']), (lambda r: r['batch_p50_ms'] <= target)
+    else:
+        score, meets = (lambda r: r['images_per_sec']), (lambda r: r['images_per_sec'] >= target)
+    if not results:
+        raise RuntimeError("No setting ran without errors")
+
+    if target is None:
+        largest = max(r['imgsz'] for r in results)
+        return max((r for r in results if r['imgsz'] == largest), key=score)
+    meeting = [r for r in results if meets(r)]
+    if not meeting:
+        print(f"No setting meets the {goal} target of {target:g}, using the fastest")
+        return max(results, key=score)
+    largest = max(r['imgsz'] for r in meeting)
+    return max((r for r in meeting if r['imgsz'] == largest), key=score)
+
+
+def load_frames(image_dir: str, limit: int = 8) -> List[np.ndarray]:
+    """Representative frames for timing, or a blank 1280x720 frame if there are none"""
+    frames = []
+    if os.path.isdir(image_dir):
+        for name in sorted(os.listdir(image_dir)):
+            if name.lower().endswith(config.IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(image_dir, name))
+                if image is not None:
+                    frames.append(image)
+            if len(frames) >= limit:
+                break
+    return frames or [np.zeros((720, 1280, 3), dtype=np.uint8)]
+
+
+def autotune(model_path: str, backends: List[str], imgsz_values: List[int],
+             batch_sizes: List[int], goal: str, target: Optional[float],
+             frames: List[np.ndarray], iterations: int) -> tuple:
+    """
+    Benchmark the settings grid on this machine
+    Returns:
+        (best setting, every measured row)
+    """
+    if goal == 'latency':
+        batch_sizes = [1]
+    results = []
+    # One fresh process per backend/thread setting
+    context = mp.get_context('spawn')
+    for backend in backends:
+        interop_values = [1, 2] if backend == 'torch' else [1]
+        for threads in thread_candidates():
+            for interop_threads in interop_values:
+                with context.Pool(1) as pool:
+                    try:
+                        rows = pool.apply(_measure, (model_path, backend, threads, interop_threads,
+                                                     imgsz_values, batch_sizes, frames, iterations))
+                    except Exception as e:
+                        print(f"{backend} with {threads} threads failed: {str(e)}")
+                        continue
+                for row in rows:
+                    print(f"{backend:<18} threads {threads:>2}/{interop_threads} imgsz {row['imgsz']:>4} "
+                          f"batch {row['batch_size']:>2}: {row['batch_p50_ms']:>8.1f} ms, "
+                          f"{row['images_per_sec']:>7.1f} img/s")
+                results.extend(rows)
+    return choose(results, goal, target), results
+
+
+def save_profile(path: str, model_path: str, best: dict, goal: str, target: Optional[float]):
+    """Store best as model_path's profile, keeping other models' profiles if the machine is unchanged"""
+    fingerprint = machine_fingerprint()
+    data = {}
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+    if data.get('machine') != fingerprint:
+        data = {'models': {}}
+    data['machine'] = fingerprint
+    data.pop('created', None)
+    settings = {key: best[key] for key in PROFILE_KEYS}
+    if goal == 'latency':
+        # Measured one frame at a time; batched callers keep their own batch size
+        settings['batch_size'] = None
+    data['models'][file_hash(model_path)] = {
+        'model': model_path,
+        'created': time.time(),
+        'goal': goal,
+        'target': target,
+        'settings': settings,
+        'measured': {'batch_p50_ms': best['batch_p50_ms'], 'images_per_sec': best['images_per_sec']},
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark backend, input size, batch size and thread counts on this machine and "
+                    "save the best as the tuning profile TargetDetector loads at startup")
+    parser.add_argument('--model', default=config.MODEL_PATH)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--imgsz', nargs='+', type=int, default=[config.IMGSZ])
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 4, 8])
+    parser.add_argument('--goal', choices=['latency', 'throughput'], default='latency')
+    parser.add_argument('--target', type=float, default=None,
+                        help="Latency ceiling in ms (latency goal) or images/sec floor (throughput goal)")
+    parser.add_argument('--images', default='data/ForTest/Pic', help="Frames used for timing")
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--output', default=config.TUNING_PROFILE_PATH or 'tuning_profile.json')
+    args = parser.parse_args()
+
+    frames = load_frames(args.images)
+    try:
+        best, _ = autotune(args.model, args.backends, args.imgsz, args.batch_sizes, args.goal,
+                           args.target, frames, args.iterations)
+    except RuntimeError as e:
+        print(f"Auto-tuning failed: {str(e)}")
+        sys.exit(1)
+
+    save_profile(args.output, args.model, best, args.goal, args.target)
+    print(f"Best for {args.goal}: {best['backend']}, imgsz {best['imgsz']}, batch {best['batch_size']}, "
+          f"{best['threads']}/{best['interop_threads']} threads "
+          f"({best['batch_p50_ms']:.1f} ms, {best['images_per_sec']:.1f} img/s), saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,494 @@
+import hashlib
+import os
+import cv2
+import numpy as np
+from typing import List, Optional, Sequence, Tuple, Union
+from detections import Detections, nms
+
+# Padding color used by ultralytics letterboxing
+LETTERBOX_COLOR = (114, 114, 114)
+
+# Static INT8 models are calibrated on these images unless told otherwise
+DEFAULT_CALIBRATION_PATH = 'data/ForTest/Pic'
+CALIBRATION_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def file_hash(path: str, length: int = 16) -> str:
+    """
+    Short SHA-256 digest of a file's contents
+    Args:
+        path: Path to the file
+        length: Number of hex characters to keep
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def letterbox(image: np.ndarray, size: int,
+              stride: Optional[int] = None) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Resize keeping aspect ratio and pad, the same way as ultralytics' LetterBox
+    Args:
+        image: Input image (BGR)
+        size: Model input size
+        stride: Pad only up to the next multiple of stride (ultralytics'
+                minimal rectangle, auto=True) instead of to a size x size square
+    Returns:
+        Letterboxed image, scale gain and (left, top) padding in pixels
+    """
+    h, w = image.shape[:2]
+    gain = min(size / h, size / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_w, pad_h = size - new_w, size - new_h
+    if stride:
+        pad_w, pad_h = pad_w % stride, pad_h % stride
+    pad_x, pad_y = pad_w / 2, pad_h / 2
+
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right,
+                               cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return image, gain, (left, top)
+
+
+def preprocess(frames: List[np.ndarray], size: int, stride: int = 32):
+    """
+    Letterbox a batch of BGR frames into an NCHW float32 RGB tensor in [0, 1].
+    Like ultralytics' predictor for a PyTorch model, a batch of same-shape
+    frames is padded to the minimal stride-aligned rectangle and a mixed batch
+    to a size x size square, so the exported backends see the same input as torch.
+    Returns:
+        Input tensor and a list of (gain, pad, original shape) per frame
+    """
+    if len({frame.shape for frame in frames}) != 1:
+        stride = None
+    boxed = [letterbox(frame, size, stride) for frame in frames]
+    height, width = boxed[0][0].shape[:2] if boxed else (size, size)
+    batch = np.empty((len(frames), 3, height, width), dtype=np.float32)
+    meta = []
+    for i, (frame, (image, gain, pad)) in enumerate(zip(frames, boxed)):
+        # BGR HWC -> RGB CHW
+        batch[i] = image[..., ::-1].transpose(2, 0, 1)
+        meta.append((gain, pad, frame.shape[:2]))
+    batch *= 1 / 255.0
+    return batch, meta
+
+
+class FixedShapePreprocessor:
+    """
+    Letterboxes frames into a preallocated (B, 3, H, W) float32 input tensor of
+    one fixed shape. Scale, padding and the resize buffer are cached per batch
+    slot and only recomputed when that slot's source frame shape changes, and
+    the padding is only written then; otherwise each call is just a resize
+    plus one normalizing write into the tensor. The returned tensor is reused
+    by the next call, so it is not safe to share between threads.
+    """
+
+    def __init__(self, input_size: Tuple[int, int], max_batch_size: int = 8):
+        """
+        Args:
+            input_size: (width, height) of the model input, multiples of 32
+            max_batch_size: Largest batch that will be preprocessed at once
+        """
+        width, height = input_size
+        if width % 32 or height % 32:
+            raise ValueError(f"Fixed input size must be a multiple of 32, got {width}x{height}")
+        self.width, self.height = width, height
+        self.batch = np.empty((max_batch_size, 3, height, width), dtype=np.float32)
+        # Per slot: (source shape, gain, (left, top), (new_w, new_h), resize buffer)
+        self._slots = [None] * max_batch_size
+        self.geometry_updates = 0
+
+    def _geometry(self, i: int, shape: Tuple[int, int]):
+        slot = self._slots[i]
+        if slot is not None and slot[0] == shape:
+            return slot
+
+        h, w = shape
+        gain = min(self.height / h, self.width / w)
+        new_w, new_h = int(round(w * gain)), int(round(h * gain))
+        # Same rounding as letterbox()
+        left = int(round((self.width - new_w) / 2 - 0.1))
+        top = int(round((self.height - new_h) / 2 - 0.1))
+        self.batch[i].fill(LETTERBOX_COLOR[0] / 255.0)
+        resized = np.empty((new_h, new_w, 3), dtype=np.uint8) if (new_w, new_h) != (w, h) else None
+
+        slot = (shape, gain, (left, top), (new_w, new_h), resized)
+        self._slots[i] = slot
+        self.geometry_updates += 1
+        return slot
+
+    def __call__(self, frames: List[np.ndarray]):
+        """
+        Returns:
+            View of the input tensor holding len(frames) images, and a list of
+            (gain, pad, original shape) per frame as returned by preprocess()
+        """
+        if len(frames) > len(self._slots):
+            raise ValueError(f"Batch of {len(frames)} exceeds the preallocated {len(self._slots)}")
+        meta = []
+        for i, frame in enumerate(frames):
+            shape, gain, (left, top), (new_w, new_h), resized = self._geometry(i, frame.shape[:2])
+            if resized is not None:
+                frame = cv2.resize(frame, (new_w, new_h), dst=resized,
+                                   interpolation=cv2.INTER_LINEAR)
+            # BGR HWC uint8 -> RGB CHW float in [0, 1], straight into the padded interior
+            np.multiply(frame[..., ::-1].transpose(2, 0, 1), np.float32(1 / 255.0),
+                        out=self.batch[i, :, top:top + new_h, left:left + new_w])
+            meta.append((gain, (left, top), shape))
+        return self.batch[:len(frames)], meta
+
+
+def candidates(pred: np.ndarray, conf_threshold: float):
+    """
+    Decode one frame's raw YOLO output into pre-NMS candidate boxes
+    Args:
+        pred: Raw output for one frame, shape (4 + num_classes, N), boxes as (cx, cy, w, h)
+        conf_threshold: Minimum class score
+    Returns:
+        xyxy boxes in model input coordinates, best class score and class id of
+        every candidate scoring above conf_threshold
+    """
+    pred = pred.T  # (N, 4 + nc)
+    scores = pred[:, 4:]
+    cls = scores.argmax(axis=1)
+    conf = scores[np.arange(len(scores)), cls]
+    mask = conf > conf_threshold
+
+    boxes, conf, cls = pred[mask, :4], conf[mask], cls[mask]
+    xyxy = np.empty_like(boxes)
+    xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+    xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+    return xyxy, conf, cls
+
+
+def postprocess(predictions: np.ndarray, meta, conf_threshold: float,
+                iou_threshold: float, max_det: int = 300) -> List[Detections]:
+    """
+    Decode raw YOLO outputs, run NMS and map boxes back to source coordinates
+    Args:
+        predictions: Raw model output, shape (B, 4 + num_classes, N) with
+                     boxes as (cx, cy, w, h)
+        meta: Per-frame (gain, pad, original shape) from preprocess
+        conf_threshold: Minimum class score
+        iou_threshold: IoU threshold for NMS
+        max_det: Maximum detections per frame
+    Returns:
+        One Detections per frame
+    """
+    results = []
+    for pred, (gain, (left, top), (h, w)) in zip(predictions, meta):
+        xyxy, conf, cls = candidates(pred, conf_threshold)
+        if len(conf) == 0:
+            results.append(Detections.empty())
+            continue
+
+        keep = nms(xyxy, conf, iou_threshold, cls, max_det)
+        xyxy = xyxy[keep]
+
+        # Undo letterbox padding and scaling
+        xyxy -= np.array([left, top, left, top], dtype=np.float32)
+        xyxy /= gain
+        results.append(Detections(xyxy, conf[keep], cls[keep]).clip(w, h))
+    return results
+
+
+class TorchBackend:
+    """Runs the ultralytics YOLO model directly (eager PyTorch)"""
+
+    name = 'torch'
+
+    def __init__(self, model, device, imgsz: int = 640):
+        self.model = model
+        self.device = device
+        self.imgsz = imgsz
+
+    def _run(self, source, conf_threshold: float, iou_threshold: float, timing=None):
+        import torch
+        with torch.no_grad():
+            results = self.model(source,
+                                 conf=conf_threshold,
+                                 iou=iou_threshold,
+                                 imgsz=self.imgsz,
+                                 device=self.device)
+
+        if timing is not None and len(results) > 0:
+            # ultralytics reports per-image stage times; whatever it doesn't
+            # account for is charged to inference
+            speed = results[0].speed
+            pre = (speed.get('preprocess') or 0.0) * len(results)
+            post = (speed.get('postprocess') or 0.0) * len(results)
+            timing.add('preprocess', pre)
+            timing.add('postprocess', post)
+            timing.add('inference', max(0.0, timing.elapsed_ms() - pre - post))
+            timing.mark()
+        return results
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        """Raw (B, 4 + nc, N) predictions of the underlying network, before NMS"""
+        import torch
+        network = self.model.model
+        network.eval()
+        with torch.no_grad():
+            output = network(torch.from_numpy(batch).to(self.device))
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        return output.float().cpu().numpy()
+
+    def predict(self, frames: List[np.ndarray], conf_threshold: float,
+                iou_threshold: float, timing=None) -> List[Detections]:
+        results = self._run(frames, conf_threshold, iou_threshold, timing)
+
+        # ultralytics returns one Results object per input image, in order
+        detections = [Detections.from_boxes(r.boxes) for r in results]
+        if timing is not None:
+            timing.lap('postprocess')
+        return detections
+
+    def predict_preprocessed(self, batch: np.ndarray, meta, conf_threshold: float,
+                             iou_threshold: float, timing=None) -> List[Detections]:
+        """
+        Run on a tensor from FixedShapePreprocessor; ultralytics skips its own
+        letterboxing for tensor input, and boxes are mapped back with meta
+        """
+        import torch
+        results = self._run(torch.from_numpy(batch), conf_threshold, iou_threshold, timing)
+
+        detections = []
+        for r, (gain, (left, top), (h, w)) in zip(results, meta):
+            boxes = Detections.from_boxes(r.boxes)
+            detections.append(boxes.offset(-left, -top).scale(1 / gain).clip(w, h))
+        if timing is not None:
+            timing.lap('postprocess')
+        return detections
+
+
+class OnnxBackend:
+    """Runs an exported ONNX model with ONNX Runtime on the CPU"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path: str, imgsz: int, threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("The onnx backend requires onnxruntime (pip install onnxruntime)")
+        self.imgsz = imgsz
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def predict(self, frames: List[np.ndarray], conf_threshold: float,
+                iou_threshold: float, timing=None) -> List[Detections]:
+        batch, meta = preprocess(frames, self.imgsz)
+        if timing is not None:
+            timing.lap('preprocess')
+        return self.predict_preprocessed(batch, meta, conf_threshold, iou_threshold, timing)
+
+    def predict_preprocessed(self, batch: np.ndarray, meta, conf_threshold: float,
+                             iou_threshold: float, timing=None) -> List[Detections]:
+        """Run on an already letterboxed NCHW tensor with its preprocess() meta"""
+        predictions = self.infer(batch)
+        if timing is not None:
+            timing.lap('inference')
+        detections = postprocess(predictions, meta, conf_threshold, iou_threshold)
+        if timing is not None:
+            timing.lap('postprocess')
+        return detections
+
+
+class OpenVinoBackend(OnnxBackend):
+    """Runs an exported OpenVINO IR model on the CPU"""
+
+    name = 'openvino'
+
+    def __init__(self, model_dir: str, imgsz: int, threads: Optional[int] = None):
+        try:
+            import openvino as ov
+        except ImportError:
+            raise RuntimeError("The openvino backend requires openvino (pip install openvino)")
+        self.imgsz = imgsz
+        xml_files = [name for name in os.listdir(model_dir) if name.endswith('.xml')]
+        if not xml_files:
+            raise RuntimeError(f"No OpenVINO model found in {model_dir}")
+        core = ov.Core()
+        properties = {'INFERENCE_NUM_THREADS': threads} if threads else {}
+        self.compiled = core.compile_model(os.path.join(model_dir, xml_files[0]), 'CPU', properties)
+        self.output = self.compiled.output(0)
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        return self.compiled(batch)[self.output]
+
+
+# Export format and artifact suffix for each exported backend
+EXPORT_FORMATS = {
+    'onnx': ('onnx', '.onnx'),
+    'openvino': ('openvino', '_openvino_model'),
+}
+
+# INT8 backends: ONNX export quantized with ONNX Runtime, static or dynamic
+QUANTIZED_BACKENDS = {
+    'onnx-int8-static': ('static', '-int8-static.onnx'),
+    'onnx-int8-dynamic': ('dynamic', '-int8-dynamic.onnx'),
+}
+
+BACKENDS = ('torch',) + tuple(EXPORT_FORMATS) + tuple(QUANTIZED_BACKENDS)
+
+
+def calibration_images(calibration_path: Union[str, Sequence[str]]) -> List[str]:
+    """
+    Sorted image paths for static INT8 calibration
+    Args:
+        calibration_path: Directory of images, or a list of image paths
+    """
+    if isinstance(calibration_path, str):
+        paths = [os.path.join(calibration_path, name) for name in os.listdir(calibration_path)
+                 if name.lower().endswith(CALIBRATION_EXTENSIONS)]
+    else:
+        paths = list(calibration_path)
+    if not paths:
+        raise RuntimeError(f"No calibration images found in {calibration_path}")
+    return sorted(paths)
+
+
+def calibration_hash(paths: List[str], length: int = 16) -> str:
+    """Short digest of a calibration set's file names and contents"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(f"{os.path.basename(path)}:{file_hash(path)}\n".encode())
+    return digest.hexdigest()[:length]
+
+
+def exported_model_path(model_path: str, backend: str, imgsz: int,
+                        calibration_path: Union[str, Sequence[str]] = DEFAULT_CALIBRATION_PATH) -> str:
+    """
+    Path of the cached export of model_path, keyed by the model file's hash
+    so that retrained weights never reuse a stale export. Static INT8 models
+    are also keyed by their calibration set, so changing the images rebuilds them.
+    """
+    stem, _ = os.path.splitext(model_path)
+    suffix = (QUANTIZED_BACKENDS[backend][1] if backend in QUANTIZED_BACKENDS
+              else EXPORT_FORMATS[backend][1])
+    key = f"{file_hash(model_path)}-{imgsz}"
+    if backend in QUANTIZED_BACKENDS and QUANTIZED_BACKENDS[backend][0] == 'static':
+        key += f"-cal{calibration_hash(calibration_images(calibration_path))}"
+    return f"{stem}-{key}{suffix}"
+
+
+def export_model(model_path: str, backend: str, imgsz: int,
+                 calibration_path: Union[str, Sequence[str]] = DEFAULT_CALIBRATION_PATH) -> str:
+    """
+    Export model_path for the given backend once and cache it next to the .pt file
+    Args:
+        model_path: Path to the YOLO .pt model
+        backend: One of the non-torch BACKENDS
+        imgsz: Model input size
+        calibration_path: Directory or list of images used for static INT8 calibration
+    Returns:
+        Path to the cached exported model
+    """
+    cached_path = exported_model_path(model_path, backend, imgsz, calibration_path)
+    if os.path.exists(cached_path):
+        return cached_path
+
+    if backend in QUANTIZED_BACKENDS:
+        fp32_path = export_model(model_path, 'onnx', imgsz)
+        mode = QUANTIZED_BACKENDS[backend][0]
+        print(f"Quantizing {fp32_path} to INT8 ({mode})...")
+        quantize_onnx(fp32_path, cached_path, mode, imgsz, calibration_path)
+        return cached_path
+
+    from ultralytics import YOLO
+    print(f"Exporting {model_path} to {backend}...")
+    export_format = EXPORT_FORMATS[backend][0]
+    exported = YOLO(model_path).export(format=export_format, imgsz=imgsz, dynamic=True)
+    os.replace(str(exported), cached_path)
+    return cached_path
+
+
+class CalibrationReader:
+    """Feeds letterboxed calibration images to the ONNX Runtime static quantizer"""
+
+    def __init__(self, calibration_path: Union[str, Sequence[str]], input_name: str, imgsz: int):
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self.paths = calibration_images(calibration_path)
+        self.iterator = iter(self.paths)
+
+    def get_next(self):
+        for path in self.iterator:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            batch, _ = preprocess([image], self.imgsz)
+            return {self.input_name: batch}
+        return None
+
+    def rewind(self):
+        self.iterator = iter(self.paths)
+
+
+def quantize_onnx(fp32_path: str, int8_path: str, mode: str, imgsz: int,
+                  calibration_path: Union[str, Sequence[str]]):
+    """
+    Quantize an FP32 ONNX model to INT8
+    Args:
+        fp32_path: Exported FP32 ONNX model
+        int8_path: Output path for the quantized model
+        mode: 'static' (calibrated activations) or 'dynamic' (weights only,
+              activation ranges computed at runtime)
+        imgsz: Model input size
+        calibration_path: Directory or list of calibration images for static mode
+    """
+    try:
+        import onnxruntime as ort
+        from onnxruntime.quantization import (CalibrationMethod, QuantFormat, QuantType,
+                                              quantize_dynamic, quantize_static)
+    except ImportError:
+        raise RuntimeError("INT8 quantization requires onnxruntime (pip install onnxruntime)")
+
+    tmp_path = int8_path + '.tmp'
+    if mode == 'dynamic':
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QUInt8)
+    elif mode == 'static':
+        session = ort.InferenceSession(fp32_path, providers=['CPUExecutionProvider'])
+        reader = CalibrationReader(calibration_path, session.get_inputs()[0].name, imgsz)
+        quantize_static(fp32_path, tmp_path, reader,
+                        quant_format=QuantFormat.QDQ,
+                        per_channel=True,
+                        activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8,
+                        calibrate_method=CalibrationMethod.MinMax)
+    else:
+        raise ValueError(f"Unknown quantization mode '{mode}', expected 'static' or 'dynamic'")
+    os.replace(tmp_path, int8_path)
+
+
+def load_backend(backend: str, model_path: str, imgsz: int,
+                 calibration_path: Union[str, Sequence[str]] = DEFAULT_CALIBRATION_PATH,
+                 threads: Optional[int] = None):
+    """
+    Export (if needed) and load a CPU runtime backend
+    Args:
+        backend: One of the non-torch BACKENDS
+        model_path: Path to the YOLO .pt model
+        imgsz: Model input size
+        calibration_path: Directory or list of images used for static INT8 calibration
+        threads: Intra-op thread count, None for the runtime's default
+    """
+    if backend not in BACKENDS or backend == 'torch':
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    exported_path = export_model(model_path, backend, imgsz, calibration_path)
+    if backend == 'openvino':
+        return OpenVinoBackend(exported_path, imgsz, threads)
+    return OnnxBackend(exported_path, imgsz, threads)
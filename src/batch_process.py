@@ -0,0 +1,336 @@
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import cv2
+
+import config
+from backends import BACKENDS, export_model
+
+# Per-process detector and result queue, created once by _init_worker
+_detector = None
+_results = None
+
+
+def collect_inputs(patterns: List[str]) -> List[str]:
+    """
+    Expand directories and glob patterns into a sorted list of media files
+    Args:
+        patterns: Directories, files or glob patterns
+    Returns:
+        Unique image and video paths
+    """
+    extensions = config.IMAGE_EXTENSIONS + config.VIDEO_EXTENSIONS
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                paths.update(os.path.join(root, name) for name in names
+                             if name.lower().endswith(extensions))
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True)
+                         if os.path.isfile(path) and path.lower().endswith(extensions))
+    return sorted(os.path.normpath(path) for path in paths)
+
+
+def _init_worker(model_path: str, conf: float, iou: float, batch_size: int, backend: str,
+                 threads: int, results):
+    global _detector, _results
+    from detect_targets import TargetDetector
+
+    # Split the cores between workers instead of letting each one grab all of
+    # them; TargetDetector applies the limit to whichever runtime backend uses
+    _detector = TargetDetector(model_path, conf, iou, batch_size, backend, config.IMGSZ,
+                               threads=threads)
+    _results = results
+
+
+def _record(path: str, frame_index: int, detections) -> dict:
+    return {
+        'file': path,
+        'frame': frame_index,
+        'xyxy': detections.xyxy.tolist(),
+        'conf': detections.conf.tolist(),
+        'cls': detections.cls.tolist(),
+    }
+
+
+def _process_file(path: str):
+    """
+    Run detection on one image or video inside a worker. Records are streamed
+    to the result queue one batch at a time as ('records', path, records),
+    followed by ('done', path, frames, error message or None).
+    """
+    frames_done = 0
+    try:
+        if path.lower().endswith(config.IMAGE_EXTENSIONS):
+            image = cv2.imread(path)
+            if image is None:
+                raise RuntimeError("Failed to load image")
+            _results.put(('records', path, [_record(path, 0, _detector.detect(image))]))
+            frames_done = 1
+        else:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise RuntimeError("Could not open video file")
+            batch_size = _detector.max_batch_size
+            try:
+                while True:
+                    frames = []
+                    while len(frames) < batch_size:
+                        ret, frame = cap.read()
+                        if not ret:
+                            break
+                        frames.append(frame)
+                    if not frames:
+                        break
+                    records = [_record(path, frames_done + offset, detections)
+                               for offset, detections in enumerate(_detector.detect_batch(frames))]
+                    _results.put(('records', path, records))
+                    frames_done += len(frames)
+                    if len(frames) < batch_size:
+                        break
+            finally:
+                cap.release()
+        _results.put(('done', path, frames_done, None))
+    except Exception as e:
+        _results.put(('done', path, frames_done, str(e)))
+
+
+def truncate_partial_line(path: str):
+    """Cut a file back to its last newline, dropping a line torn by a crash"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        position = end
+        while position > 0:
+            step = min(65536, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b'\n')
+            if newline >= 0:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position != end:
+            f.truncate(position)
+
+
+class JsonlWriter:
+    """Appends records as one JSON object per line"""
+
+    def __init__(self, output: str, resume: bool, done: Optional[set] = None):
+        """
+        Args:
+            output: .jsonl file
+            resume: Keep the records of a previous run
+            done: Inputs that run completed; records of any other input (a
+                  crash mid-file, or a failure) are dropped on resume
+        """
+        if resume and os.path.exists(output):
+            truncate_partial_line(output)
+            done = done or set()
+            tmp_path = output + '.tmp'
+            with open(output) as src, open(tmp_path, 'w') as dst:
+                for line in src:
+                    if json.loads(line)['file'] in done:
+                        dst.write(line)
+            os.replace(tmp_path, output)
+        self.file = open(output, 'a' if resume else 'w')
+
+    def write(self, path: str, records: List[dict]):
+        for record in records:
+            self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def finish(self, path: str):
+        """Make path's records durable before it is marked done"""
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def _part_prefix(path: str) -> str:
+    return f"part-{hashlib.sha1(path.encode()).hexdigest()[:16]}-"
+
+
+class ParquetWriter:
+    """Writes one Parquet part file per batch of records into the output directory"""
+
+    def __init__(self, output: str, resume: bool, done: Optional[set] = None):
+        """
+        Args:
+            output: .parquet directory
+            resume: Keep the parts of a previous run
+            done: Inputs that run completed; parts of any other input are removed on resume
+        """
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.output = output
+        self.parts = {}
+        os.makedirs(output, exist_ok=True)
+        keep = {_part_prefix(path) for path in done or ()} if resume else set()
+        for name in os.listdir(output):
+            if name.endswith(('.parquet', '.parquet.tmp')) and name.rsplit('-', 1)[0] + '-' not in keep:
+                os.remove(os.path.join(output, name))
+
+    def write(self, path: str, records: List[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(records, schema=pa.schema([
+            ('file', pa.string()),
+            ('frame', pa.int32()),
+            ('xyxy', pa.list_(pa.list_(pa.float32(), 4))),
+            ('conf', pa.list_(pa.float32())),
+            ('cls', pa.list_(pa.int32())),
+        ]))
+        part = self.parts.get(path, 0)
+        self.parts[path] = part + 1
+        name = f"{_part_prefix(path)}{part:06d}.parquet"
+        tmp_path = os.path.join(self.output, name + '.tmp')
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(self.output, name))
+
+    def finish(self, path: str):
+        self.parts.pop(path, None)
+
+    def close(self):
+        pass
+
+
+def load_manifest(manifest_path: str) -> set:
+    """Return the set of inputs already completed by a previous run"""
+    if not os.path.exists(manifest_path):
+        return set()
+    # A path torn by a crash was not completed
+    truncate_partial_line(manifest_path)
+    with open(manifest_path) as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def run(inputs: List[str], output: str, workers: int, model_path: str, conf: float,
+        iou: float, batch_size: int, backend: str = 'torch', resume: bool = False) -> dict:
+    """
+    Process every input file on a pool of worker processes
+    Args:
+        inputs: Image and video paths
+        output: .jsonl file or .parquet directory
+        workers: Number of worker processes
+        model_path: Path to the YOLO model
+        conf: Confidence threshold
+        iou: IOU threshold for NMS
+        batch_size: Frames per model call inside each worker
+        backend: Inference runtime for TargetDetector
+        resume: Skip inputs listed in the manifest of a previous run
+    Returns:
+        Summary with counts of processed, skipped and failed files and frames
+    """
+    manifest_path = output.rstrip('/\\') + '.done'
+    done = load_manifest(manifest_path) if resume else set()
+    pending = [path for path in inputs if path not in done]
+
+    if output.endswith('.parquet'):
+        writer = ParquetWriter(output, resume, done)
+    else:
+        writer = JsonlWriter(output, resume, done)
+
+    if backend != 'torch' and pending:
+        # Export once up front so the workers don't race to create the cached model
+        export_model(model_path, backend, config.IMGSZ)
+
+    summary = {'files': 0, 'skipped': len(inputs) - len(pending), 'failed': 0, 'frames': 0}
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    start_time = time.perf_counter()
+    context = mp.get_context('spawn')
+    results = context.Queue()
+
+    try:
+        with open(manifest_path, 'a' if resume else 'w') as manifest, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                    initializer=_init_worker,
+                                    initargs=(model_path, conf, iou, batch_size, backend,
+                                              threads, results)) as pool:
+            futures = [pool.submit(_process_file, path) for path in pending]
+            count = 0
+            while count < len(pending):
+                try:
+                    message = results.get(timeout=1.0)
+                except queue.Empty:
+                    # A worker that died (or failed to load the model) never reports back
+                    for future in futures:
+                        if future.done() and future.exception() is not None:
+                            raise future.exception()
+                    continue
+
+                if message[0] == 'records':
+                    _, path, records = message
+                    writer.write(path, records)
+                    continue
+
+                _, path, frames, error = message
+                count += 1
+                if error is not None:
+                    summary['failed'] += 1
+                    writer.finish(path)
+                    print(f"[{count}/{len(pending)}] {path}: error: {error}")
+                    continue
+                # Records are durable before the input is marked done; records of
+                # inputs that never got here are dropped on resume
+                writer.finish(path)
+                manifest.write(path + '\n')
+                manifest.flush()
+                summary['files'] += 1
+                summary['frames'] += frames
+                print(f"[{count}/{len(pending)}] {path}: {frames} frames")
+    finally:
+        writer.close()
+
+    summary['elapsed'] = time.perf_counter() - start_time
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Headless bulk target detection over directories or globs of images and videos. "
+                    "Detections are streamed to a .jsonl file or a directory of .parquet parts; "
+                    "completed inputs are listed in <output>.done so --resume can skip them.")
+    parser.add_argument('inputs', nargs='+', help="Directories, files or glob patterns")
+    parser.add_argument('-o', '--output', default='detections.jsonl',
+                        help="Output .jsonl file or .parquet directory")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument('--model', default=config.MODEL_PATH)
+    parser.add_argument('--conf', type=float, default=config.CONF_THRESHOLD)
+    parser.add_argument('--iou', type=float, default=config.IOU_THRESHOLD)
+    parser.add_argument('--batch-size', type=int, default=config.BATCH_SIZE)
+    parser.add_argument('--backend', choices=BACKENDS, default=config.BACKEND)
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip inputs completed by a previous run")
+    args = parser.parse_args()
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("No images or videos found")
+        sys.exit(1)
+
+    summary = run(inputs, args.output, max(1, args.workers), args.model, args.conf,
+                  args.iou, args.batch_size, args.backend, args.resume)
+    print(f"Processed {summary['files']} files ({summary['frames']} frames) in "
+          f"{summary['elapsed']:.1f}s, skipped {summary['skipped']}, failed {summary['failed']}")
+
+
+if __name__ == '__main__':
+    main()
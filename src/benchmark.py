@@ -0,0 +1,388 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+import autotune
+import config
+from backends import file_hash
+
+# Frame sizes (width, height) used for the synthetic detect benchmark
+DEFAULT_SIZES = [(640, 416), (1280, 720), (1920, 1080)]
+
+
+def percentiles(samples_ms) -> dict:
+    samples_ms = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        'mean': float(samples_ms.mean()),
+        'p50': float(np.percentile(samples_ms, 50)),
+        'p95': float(np.percentile(samples_ms, 95)),
+        'p99': float(np.percentile(samples_ms, 99)),
+    }
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Deterministic BGR frame with noise and a few solid rectangles"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    for _ in range(5):
+        x, y = int(rng.integers(0, width - 60)), int(rng.integers(0, height - 120))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(frame, (x, y), (x + 60, y + 120), color, -1)
+    return frame
+
+
+def synthetic_video(path: str, width: int, height: int, frames: int, fps: float = 30.0):
+    """Write a deterministic MJPG test clip"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    base = synthetic_frame(width, height)
+    for i in range(frames):
+        # Shift the frame so consecutive frames differ
+        writer.write(np.roll(base, i * 4, axis=1))
+    writer.release()
+
+
+def time_calls(fn, iterations: int, warmup: int):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_model_load(model_path: str, backend: str, imgsz: int):
+    """Cold construction of TargetDetector, including the heavy imports"""
+    start = time.perf_counter()
+    from detect_targets import TargetDetector
+    detector = TargetDetector(model_path, config.CONF_THRESHOLD, config.IOU_THRESHOLD,
+                              config.BATCH_SIZE, backend, imgsz)
+    return detector, (time.perf_counter() - start) * 1000
+
+
+def bench_first_detect(detector, width: int, height: int) -> float:
+    """Latency of the very first detect call, which pays one-time setup costs"""
+    frame = synthetic_frame(width, height)
+    start = time.perf_counter()
+    detector.detect(frame)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_detect(detector, sizes, iterations: int, warmup: int) -> dict:
+    results = {}
+    for width, height in sizes:
+        frame = synthetic_frame(width, height)
+        samples = time_calls(lambda: detector.detect(frame), iterations, warmup)
+        results[f'{width}x{height}'] = percentiles(samples)
+    return results
+
+
+def bench_images(detector, image_dir: str, warmup: int) -> dict:
+    paths = sorted(os.path.join(image_dir, name) for name in os.listdir(image_dir)
+                   if name.lower().endswith(config.IMAGE_EXTENSIONS))
+    images = [image for image in (cv2.imread(path) for path in paths) if image is not None]
+    if not images:
+        return {}
+    for image in images[:warmup]:
+        detector.detect(image)
+    samples = []
+    for image in images:
+        start = time.perf_counter()
+        detector.detect(image)
+        samples.append((time.perf_counter() - start) * 1000)
+    result = percentiles(samples)
+    result['images'] = len(images)
+    return result
+
+
+def bench_draw_boxes(detector, box_counts, iterations: int) -> dict:
+    from detections import Detections
+
+    frame = synthetic_frame(1280, 720)
+    rng = np.random.default_rng(0)
+    results = {}
+    for count in box_counts:
+        xy = rng.uniform(0, [1200, 600], (count, 2))
+        boxes = Detections(np.hstack([xy, xy + 60]), rng.uniform(0.5, 1, count))
+        samples = time_calls(lambda: detector.draw_boxes(frame, boxes), iterations, 2)
+        results[f'{count}_boxes'] = percentiles(samples)
+    return results
+
+
+def bench_frame_loop(detector, width: int, height: int, iterations: int) -> dict:
+    """
+    Capture -> draw -> emit hand-off without the model, comparing the copying
+    path (array conversion, cvtColor, draw_boxes copy) with pooled in-place
+    buffers. Allocations are measured with tracemalloc as the bytes allocated
+    on top of the live heap per frame.
+    """
+    from detections import Detections
+    from frame_pool import FramePool
+
+    rgb = cv2.cvtColor(synthetic_frame(width, height), cv2.COLOR_BGR2RGB)
+    boxes = Detections(np.array([[100, 100, 160, 220], [300, 150, 360, 270]], dtype=np.float32),
+                       np.array([0.9, 0.8], dtype=np.float32))
+    pool = FramePool(3)
+
+    def copying():
+        frame = cv2.cvtColor(np.array(rgb), cv2.COLOR_RGB2BGR)
+        return detector.draw_boxes(frame, boxes)
+
+    def pooled():
+        handle = pool.acquire(rgb.shape)
+        cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=handle.array)
+        detector.draw_boxes(handle.array, boxes, in_place=True)
+        handle.release()
+
+    results = {}
+    for name, fn in (('copy', copying), ('pooled', pooled)):
+        samples = time_calls(fn, iterations, 2)
+        allocated = 0
+        tracemalloc.start()
+        try:
+            for _ in range(iterations):
+                current = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                fn()
+                allocated += tracemalloc.get_traced_memory()[1] - current
+        finally:
+            tracemalloc.stop()
+        result = percentiles(samples)
+        result['alloc_kb_per_frame'] = allocated / iterations / 1024
+        results[name] = result
+    results['pool'] = pool.stats()
+    return results
+
+
+def bench_process_video(detector, video_path: str, pipelined: bool) -> dict:
+    from main import process_video
+
+    stats = process_video(video_path, detector, pipelined=pipelined, headless=True)
+    return stats or {}
+
+
+def environment() -> dict:
+    info = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        info['torch_threads'] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def flatten_metrics(results: dict) -> dict:
+    """
+    Pick the headline numbers used for regression checks
+    Returns:
+        {name: (value, 'lower' or 'higher' is better)}
+    """
+    metrics = {'model_load_ms': (results['model_load_ms'], 'lower')}
+    if 'first_detect_ms' in results:
+        metrics['first_detect_ms'] = (results['first_detect_ms'], 'lower')
+    for size, stats in results.get('detect', {}).items():
+        for key in ('p50', 'p95', 'p99'):
+            metrics[f'detect_{size}_{key}_ms'] = (stats[key], 'lower')
+    if results.get('images'):
+        metrics['images_p50_ms'] = (results['images']['p50'], 'lower')
+    for count, stats in results.get('draw_boxes', {}).items():
+        metrics[f'draw_boxes_{count}_p50_ms'] = (stats['p50'], 'lower')
+    for mode in ('copy', 'pooled'):
+        stats = results.get('frame_loop', {}).get(mode)
+        if stats:
+            metrics[f'frame_loop_{mode}_p50_ms'] = (stats['p50'], 'lower')
+            metrics[f'frame_loop_{mode}_alloc_kb'] = (stats['alloc_kb_per_frame'], 'lower')
+    for mode, stats in results.get('process_video', {}).items():
+        if stats:
+            metrics[f'process_video_{mode}_fps'] = (stats['fps'], 'higher')
+    return metrics
+
+
+def run_key(model_path: str, backend: str, imgsz: int) -> dict:
+    """What the numbers depend on: the model weights, backend, input size and machine"""
+    return {
+        'model': os.path.basename(model_path),
+        'model_hash': file_hash(model_path) if os.path.exists(model_path) else None,
+        'backend': backend,
+        'imgsz': imgsz,
+        'machine': autotune.machine_fingerprint(),
+    }
+
+
+def mismatches(results: dict, baseline: dict) -> list:
+    """
+    Reasons the baseline was measured under different conditions than results
+    Returns:
+        Descriptions of the differing fields, empty if the runs are comparable
+    """
+    reasons = []
+    for key in ('model', 'model_hash', 'backend', 'imgsz'):
+        if results.get(key) != baseline.get(key):
+            reasons.append(f"{key}: {baseline.get(key)} -> {results.get(key)}")
+    machine, base_machine = results.get('machine', {}), baseline.get('machine', {})
+    for key in sorted(set(machine) | set(base_machine)):
+        if machine.get(key) != base_machine.get(key):
+            reasons.append(f"machine.{key}: {base_machine.get(key)} -> {machine.get(key)}")
+    return reasons
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare results against a baseline
+    Args:
+        results: Current benchmark results
+        baseline: Saved benchmark results
+        tolerance: Allowed relative slowdown, e.g. 0.15 for 15%
+    Returns:
+        List of (metric, baseline value, current value, relative change, regressed)
+    """
+    current = flatten_metrics(results)
+    previous = flatten_metrics(baseline)
+    rows = []
+    for name, (value, better) in current.items():
+        if name not in previous or previous[name][0] == 0:
+            continue
+        base = previous[name][0]
+        change = (value - base) / base
+        regressed = change > tolerance if better == 'lower' else change < -tolerance
+        rows.append((name, base, value, change, regressed))
+    return rows
+
+
+def run(args) -> dict:
+    results = run_key(args.model, args.backend, args.imgsz)
+
+    # Load first so the cold number includes the torch/ultralytics imports
+    detector, results['model_load_ms'] = bench_model_load(args.model, args.backend, args.imgsz)
+    results['environment'] = environment()
+    print(f"Model load: {results['model_load_ms']:.0f} ms")
+    results['first_detect_ms'] = bench_first_detect(detector, *args.sizes[0])
+    print(f"First detect: {results['first_detect_ms']:.0f} ms "
+          f"(time to first detection {results['model_load_ms'] + results['first_detect_ms']:.0f} ms)")
+
+    results['detect'] = bench_detect(detector, args.sizes, args.iterations, args.warmup)
+    for size, stats in results['detect'].items():
+        print(f"detect {size}: p50 {stats['p50']:.1f} ms, p95 {stats['p95']:.1f} ms, "
+              f"p99 {stats['p99']:.1f} ms")
+
+    if os.path.isdir(args.images):
+        results['images'] = bench_images(detector, args.images, args.warmup)
+        if results['images']:
+            print(f"detect on {results['images']['images']} test images: "
+                  f"p50 {results['images']['p50']:.1f} ms")
+
+    results['draw_boxes'] = bench_draw_boxes(detector, [1, 10, 50], args.iterations)
+    for count, stats in results['draw_boxes'].items():
+        print(f"draw_boxes {count}: p50 {stats['p50']:.3f} ms")
+
+    results['frame_loop'] = bench_frame_loop(detector, 1280, 720, args.iterations)
+    for mode in ('copy', 'pooled'):
+        stats = results['frame_loop'][mode]
+        print(f"frame loop {mode}: p50 {stats['p50']:.3f} ms, "
+              f"{stats['alloc_kb_per_frame']:.0f} KiB allocated per frame")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video
+        if video_path is None or not os.path.exists(video_path):
+            video_path = os.path.join(tmp_dir, 'synthetic.avi')
+            synthetic_video(video_path, 1280, 720, args.video_frames)
+        results['process_video'] = {
+            'sequential': bench_process_video(detector, video_path, pipelined=False),
+            'pipelined': bench_process_video(detector, video_path, pipelined=True),
+        }
+    return results
+
+
+def parse_size(text: str):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark model load, detect latency, draw_boxes, the pooled frame loop and process_video "
+                    "throughput headless on CPU, and compare against a saved baseline")
+    parser.add_argument('--model', default=config.MODEL_PATH)
+    parser.add_argument('--backend', default=config.BACKEND)
+    parser.add_argument('--imgsz', type=int, default=config.IMGSZ)
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=DEFAULT_SIZES,
+                        help="Synthetic frame sizes as WIDTHxHEIGHT")
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--images', default='data/ForTest/Pic')
+    parser.add_argument('--video', default=None,
+                        help="Video for the process_video benchmark (default: synthetic clip)")
+    parser.add_argument('--video-frames', type=int, default=120)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative regression before failing")
+    parser.add_argument('--force-compare', action='store_true',
+                        help="Compare even if the baseline used another model, backend, "
+                             "input size or machine")
+    parser.add_argument('--allow-gpu', action='store_true',
+                        help="Do not hide CUDA devices (benchmarks run on CPU by default)")
+    args = parser.parse_args()
+
+    if not args.allow_gpu:
+        # Must happen before torch is imported
+        os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+    results = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    reasons = mismatches(results, baseline)
+    if reasons:
+        print(f"Baseline {args.baseline} was measured under different conditions:")
+        for reason in reasons:
+            print(f"  {reason}")
+        if not args.force_compare:
+            print("Not comparing; re-run with --save-baseline on this setup, or --force-compare")
+            sys.exit(2)
+    rows = compare(results, baseline, args.tolerance)
+    print(f"\n{'metric':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, base, value, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<36} {base:>10.2f} {value:>10.2f} {change:>+7.1%}{flag}")
+
+    if any(row[4] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+
+import cascade
+import config
+
+
+class CaptureRecorder:
+    """
+    Appends captured frames to a recording directory: frames.u8 holds the raw
+    BGR pixels of every frame back to back (one fixed shape per recording, so
+    a frame is found by offset alone and there is no per-frame overhead),
+    timestamps.f64 the capture time of each frame in seconds from the first,
+    as raw float64, and info.json the frame shape.
+
+    info.json is written with the first frame and both data files are flushed
+    every flush_interval seconds, so a recording cut short by a crash is still
+    readable up to the last flush; Recording derives the frame count from the
+    file sizes.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.shape = None
+        self.frames = 0
+        self._start = None
+        self._last_flush = None
+        self._file = open(os.path.join(directory, 'frames.u8'), 'wb')
+        self._timestamps = open(os.path.join(directory, 'timestamps.f64'), 'wb')
+
+    def write(self, frame: np.ndarray, timestamp: Optional[float] = None) -> bool:
+        """Append a frame; returns False (and skips it) if its shape differs from the first"""
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        if self.shape is None:
+            self.shape = frame.shape
+            self._start = self._last_flush = timestamp
+            self._write_info()
+        elif frame.shape != self.shape:
+            return False
+        self._file.write(np.ascontiguousarray(frame).data)
+        self._timestamps.write(np.float64(timestamp - self._start).tobytes())
+        self.frames += 1
+        if timestamp - self._last_flush >= self.flush_interval:
+            self.flush()
+            self._last_flush = timestamp
+        return True
+
+    def flush(self):
+        """Hand buffered frames and timestamps to the OS, frames first"""
+        self._file.flush()
+        self._timestamps.flush()
+
+    def _write_info(self):
+        path = os.path.join(self.directory, 'info.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'shape': list(self.shape or ()), 'frames': self.frames}, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        self._file.close()
+        self._timestamps.close()
+        self._write_info()
+
+
+class RecordingCapture:
+    """Capture backend wrapper that records every grabbed frame with a CaptureRecorder"""
+
+    def __init__(self, capture, directory: str):
+        self.capture = capture
+        self.name = f'{capture.name}+record'
+        self.recorder = CaptureRecorder(directory)
+        self.skipped = 0
+
+    def grab(self, x: int, y: int, width: int, height: int,
+             out: Optional[np.ndarray] = None) -> np.ndarray:
+        frame = self.capture.grab(x, y, width, height, out=out)
+        if frame is not None and not self.recorder.write(frame):
+            # The overlay was resized; the recording keeps its first size
+            self.skipped += 1
+        return frame
+
+    def close(self):
+        self.recorder.close()
+        self.capture.close()
+        if self.skipped:
+            print(f"Recording skipped {self.skipped} frames captured at a different size")
+
+
+class Recording:
+    """Memory-mapped view of a directory written by CaptureRecorder"""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, 'info.json')) as f:
+            info = json.load(f)
+        self.shape = tuple(info['shape'])
+        # Count whole frames and timestamps on disk rather than trusting
+        # info.json, which is only final if the recorder was closed
+        frames_path = os.path.join(directory, 'frames.u8')
+        frame_bytes = int(np.prod(self.shape)) if self.shape else 0
+        count = os.path.getsize(frames_path) // frame_bytes if frame_bytes else 0
+        timestamps = np.fromfile(os.path.join(directory, 'timestamps.f64'), dtype=np.float64)
+        count = min(count, len(timestamps))
+        if count == 0:
+            raise RuntimeError(f"Recording {directory} has no frames")
+        self.timestamps = timestamps[:count]
+        self.frames = np.memmap(frames_path, dtype=np.uint8, mode='r',
+                                shape=(count,) + self.shape)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+class ReplayCapture:
+    """
+    Capture backend that plays back a Recording in place of the screen. With
+    realtime, each grab returns the latest frame due by the wall clock, as a
+    live screen would: frames the pipeline was too slow for are skipped, and
+    grabs ahead of the recording wait. Otherwise every frame is returned in
+    order, as fast as they are grabbed. The requested region is ignored.
+    """
+
+    name = 'replay'
+
+    def __init__(self, recording: Recording, realtime: bool = False, loops: int = 1,
+                 on_finished=None):
+        """
+        Args:
+            recording: Frames to play back
+            realtime: Pace frames by their recorded timestamps
+            loops: Number of times to play the recording
+            on_finished: Called once when the last frame has been played
+        """
+        self.recording = recording
+        self.realtime = realtime
+        self.loops = max(1, int(loops))
+        self.on_finished = on_finished
+        self.position = 0
+        self.delivered = 0
+        self.skipped = 0
+        self.lag = []  # Seconds each realtime frame was delivered after it was due
+        self._start = None
+        self._duration = float(recording.timestamps[-1]) + (
+            float(np.median(np.diff(recording.timestamps))) if len(recording) > 1 else 0.0)
+
+    def _due(self, position: int) -> float:
+        loop, index = divmod(position, len(self.recording))
+        return loop * self._duration + float(self.recording.timestamps[index])
+
+    def grab(self, x: int, y: int, width: int, height: int,
+             out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        total = self.loops * len(self.recording)
+        if self.position >= total:
+            return None
+        if self._start is None:
+            self._start = time.perf_counter()
+
+        if self.realtime:
+            now = time.perf_counter() - self._start
+            # Skip to the latest frame already due
+            while self.position + 1 < total and self._due(self.position + 1) <= now:
+                self.position += 1
+                self.skipped += 1
+            wait = self._due(self.position) - now
+            if wait > 0:
+                time.sleep(wait)
+            self.lag.append(max(0.0, -wait))
+
+        frame = self.recording.frames[self.position % len(self.recording)]
+        self.position += 1
+        self.delivered += 1
+        if self.position >= total and self.on_finished is not None:
+            self.on_finished()
+        if out is not None and out.shape == frame.shape:
+            np.copyto(out, frame)
+            return out
+        return np.array(frame)
+
+    def stats(self) -> dict:
+        stats = {'delivered': self.delivered, 'skipped': self.skipped}
+        if self.lag:
+            lag_ms = np.asarray(self.lag) * 1000
+            stats['lag_p50_ms'] = float(np.percentile(lag_ms, 50))
+            stats['lag_p95_ms'] = float(np.percentile(lag_ms, 95))
+        return stats
+
+    def close(self):
+        pass
+
+
+class ReplayWindow:
+    """Stands in for the overlay window: a fixed region matching the recording"""
+
+    def __init__(self, shape):
+        self._height, self._width = shape[:2]
+
+    def x(self) -> int:
+        return 0
+
+    def y(self) -> int:
+        return 0
+
+    def width(self) -> int:
+        return self._width
+
+    def height(self) -> int:
+        # CaptureThread.capture_screen leaves out the 50px button area
+        return self._height + 50
+
+
+def release_latest(frames):
+    """Take and release the newest frame of a LatestFrameQueue, as the GUI would after showing it"""
+    handle = frames.take_latest()
+    if handle is not None:
+        handle.release()
+
+
+def replay(directory: str, realtime: bool = False, loops: int = 1, detector=None) -> dict:
+    """
+    Run CaptureThread's capture, detect, draw and emit path on a recording,
+    headless and on the calling thread. Emitted frames are released right
+    away, standing in for the GUI, so none are dropped.
+    Args:
+        directory: Recording written by CaptureRecorder
+        realtime: Play at the recorded rate instead of as fast as possible
+        loops: Number of times to play the recording
+        detector: Detector to use, loaded like the screen detector's if None
+    Returns:
+        CaptureThread.timing_stats() plus replay statistics
+    """
+    from screen_detector import CaptureThread, ModelLoader
+
+    recording = Recording(directory)
+    if detector is None:
+        detector = cascade.from_config(config, ModelLoader.load(config.MODEL_PATH), ModelLoader.load)
+        if config.WARMUP_ITERATIONS > 0:
+            detector.warmup(config.WARMUP_ITERATIONS, config.WARMUP_SIZE)
+
+    source = ReplayCapture(recording, realtime, loops)
+    thread = CaptureThread(ReplayWindow(recording.shape), detector,
+                           capture=source, interactive=False)
+    source.on_finished = lambda: setattr(thread, 'is_capturing', False)
+    thread.frame_ready.connect(lambda: release_latest(thread.frames))
+
+    thread.is_running = True
+    start = time.perf_counter()
+    thread.run()
+    elapsed = time.perf_counter() - start
+
+    stats = thread.timing_stats()
+    stats['replay'] = source.stats()
+    stats['replay'].update({
+        'frames': len(recording),
+        'loops': loops,
+        'realtime': realtime,
+        'elapsed': elapsed,
+        'throughput_fps': source.delivered / elapsed if elapsed > 0 else 0.0,
+    })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a capture recording (CAPTURE_RECORD_PATH) through the screen detector's "
+                    "capture/detect/draw/emit path without a display, and report throughput and "
+                    "per-stage latency")
+    parser.add_argument('recording', nargs='?', default=config.CAPTURE_RECORD_PATH)
+    parser.add_argument('--realtime', action='store_true',
+                        help="Play at the recorded rate instead of as fast as possible")
+    parser.add_argument('--loops', type=int, default=1)
+    parser.add_argument('--json', help="Also write the statistics to this JSON file")
+    args = parser.parse_args()
+    if args.recording is None:
+        print("No recording given and CAPTURE_RECORD_PATH is not set")
+        sys.exit(1)
+
+    stats = replay(args.recording, args.realtime, args.loops)
+    replay_stats = stats['replay']
+    print(f"Replayed {replay_stats['delivered']} frames in {replay_stats['elapsed']:.1f}s "
+          f"({replay_stats['throughput_fps']:.1f} FPS), skipped {replay_stats['skipped']}")
+    if 'lag_p50_ms' in replay_stats:
+        print(f"Delivery lag behind the recording: p50 {replay_stats['lag_p50_ms']:.1f} ms, "
+              f"p95 {replay_stats['lag_p95_ms']:.1f} ms")
+    if stats['rss_mb'] is not None:
+        print(f"Resident memory: {stats['rss_mb']:.0f} MB")
+    for stage, values in stats['stages'].items():
+        print(f"  {stage:<12} p50 {values['p50']:7.2f} ms   p95 {values['p95']:7.2f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(stats, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
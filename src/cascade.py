@@ -0,0 +1,217 @@
+import time
+import numpy as np
+from typing import Callable, List, Optional, Tuple
+from detections import Detections, box_iou
+from tiling import merge_detections
+
+
+def merge_regions(regions: np.ndarray) -> np.ndarray:
+    """Merge overlapping [x1,y1,x2,y2] regions until none overlap"""
+    regions = [r for r in regions]
+    merged = True
+    while merged and len(regions) > 1:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    regions[i] = np.concatenate([np.minimum(a[:2], b[:2]), np.maximum(a[2:], b[2:])])
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return np.asarray(regions, dtype=np.float32).reshape(-1, 4)
+
+
+class CascadeDetector:
+    """
+    Two-model cascade: a fast model (e.g. yolo11n) runs on every frame and a
+    more accurate one (e.g. yolo11s) only where the fast model's output is
+    ambiguous:
+      - a detection's confidence lies in the band around the threshold, where
+        the fast model is most often wrong either way, or
+      - detections overlap more than crowd_iou, where NMS on the fast model's
+        boxes is unreliable.
+    The fast pass runs at the band's lower bound so near-threshold boxes are
+    seen. By default only the ambiguous regions (padded, merged) go to the
+    accurate model, which replaces the fast model's boxes there; the whole
+    frame is escalated when the regions cover most of it.
+
+    Wraps a detector and exposes detect/detect_batch like it (everything else
+    is delegated to the fast detector).
+    """
+
+    def __init__(self, fast, accurate, conf_band: Tuple[float, float] = (0.3, 0.75),
+                 crowd_iou: Optional[float] = 0.3, regions: bool = True,
+                 region_margin: float = 0.5, max_region_fraction: float = 0.5,
+                 min_region_size: int = 128):
+        """
+        Args:
+            fast: Detector run on every frame; its conf_threshold is the final one
+            accurate: Detector run on escalated frames/regions
+            conf_band: (low, high) fast-model confidences treated as ambiguous
+            crowd_iou: IoU between fast detections above which they are crowded (None disables)
+            regions: Escalate padded regions around ambiguous boxes instead of whole frames
+            region_margin: Region padding on each side, as a fraction of the box size
+            max_region_fraction: Escalate the whole frame when regions cover more than this
+            min_region_size: Smallest region side in pixels, so tiny boxes keep some context
+        """
+        self.fast = fast
+        self.accurate = accurate
+        self.conf_band = (float(conf_band[0]), float(conf_band[1]))
+        self.crowd_iou = crowd_iou
+        self.regions = regions
+        self.region_margin = region_margin
+        self.max_region_fraction = max_region_fraction
+        self.min_region_size = min_region_size
+
+        self.frames = 0
+        self.escalated_frames = 0
+        self.full_frame_escalations = 0
+        self.escalated_regions = 0
+        self.reasons = {'ambiguous': 0, 'crowded': 0}
+        self.fast_ms = 0.0
+        self.accurate_ms = 0.0
+        self.accurate_pixels = 0
+        self.pixels = 0
+
+    def __getattr__(self, name):
+        if name in ('fast', 'accurate'):
+            raise AttributeError(name)
+        return getattr(self.fast, name)
+
+    def set_input_size(self, input_size):
+        self.fast.set_input_size(input_size)
+        self.accurate.set_input_size(input_size)
+
+    def warmup(self, iterations: int = 1, size: Tuple[int, int] = (640, 416)) -> float:
+        """Warm up both models, so the first escalation doesn't pay the setup cost"""
+        return self.fast.warmup(iterations, size) + self.accurate.warmup(iterations, size)
+
+    def _flags(self, detections: Detections) -> Tuple[np.ndarray, bool, bool]:
+        """Ambiguous detections, and whether any were near-threshold / crowded"""
+        low, high = self.conf_band
+        ambiguous = (detections.conf > low) & (detections.conf < high)
+        crowded = np.zeros(len(detections), dtype=bool)
+        if self.crowd_iou is not None and len(detections) > 1:
+            ious = box_iou(detections.xyxy, detections.xyxy)
+            np.fill_diagonal(ious, 0.0)
+            crowded = (ious > self.crowd_iou).any(axis=1)
+        return ambiguous | crowded, bool(ambiguous.any()), bool(crowded.any())
+
+    def _regions(self, detections: Detections, width: int, height: int) -> np.ndarray:
+        """Padded, merged regions around the given boxes, clipped to the frame"""
+        xyxy = detections.xyxy
+        centers = (xyxy[:, :2] + xyxy[:, 2:]) / 2
+        half = np.maximum((xyxy[:, 2:] - xyxy[:, :2]) * (0.5 + self.region_margin),
+                          self.min_region_size / 2)
+        regions = np.concatenate([centers - half, centers + half], axis=1)
+        regions = np.clip(regions, 0, [width, height, width, height])
+        return np.round(merge_regions(regions)).astype(np.int32)
+
+    def detect(self, image: np.ndarray, timing=None) -> Detections:
+        if image is None or image.size == 0:
+            return Detections.empty()
+        return self.detect_batch([image], timing)[0]
+
+    def detect_batch(self, frames: List[np.ndarray], timing=None) -> List[Detections]:
+        """
+        Cascaded equivalent of detect_batch(frames): the fast model on every
+        frame, then one accurate-model batch over all escalated frames/regions
+        """
+        threshold = self.fast.conf_threshold
+        start = time.perf_counter()
+        with self.fast.conf_threshold_override(min(self.conf_band[0], threshold)):
+            candidates = self.fast.detect_batch(frames, timing)
+        self.fast_ms += (time.perf_counter() - start) * 1000
+
+        outputs = []
+        # Accurate-model inputs and, for each, (frame index, region or None)
+        inputs, owners = [], []
+        for i, (frame, detections) in enumerate(zip(frames, candidates)):
+            outputs.append(detections.filter_conf(threshold))
+            if frame is None or frame.size == 0:
+                continue
+            self.frames += 1
+            h, w = frame.shape[:2]
+            self.pixels += h * w
+            flagged, ambiguous, crowded = self._flags(detections)
+            if not flagged.any():
+                continue
+
+            self.escalated_frames += 1
+            self.reasons['ambiguous'] += ambiguous
+            self.reasons['crowded'] += crowded
+            regions = self._regions(detections[flagged], w, h) if self.regions else None
+            areas = None if regions is None else (regions[:, 2:] - regions[:, :2]).prod(axis=1)
+            if regions is None or areas.sum() > self.max_region_fraction * h * w:
+                self.full_frame_escalations += 1
+                self.accurate_pixels += h * w
+                inputs.append(frame)
+                owners.append((i, None))
+                continue
+            self.escalated_regions += len(regions)
+            self.accurate_pixels += int(areas.sum())
+            for x1, y1, x2, y2 in regions.tolist():
+                inputs.append(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+                owners.append((i, (x1, y1, x2, y2)))
+
+        if not inputs:
+            return outputs
+        start = time.perf_counter()
+        results = self.accurate.detect_batch(inputs, timing)
+        self.accurate_ms += (time.perf_counter() - start) * 1000
+
+        # Per escalated frame: accurate detections and the regions they cover
+        escalated = {}
+        for (i, region), detections in zip(owners, results):
+            parts, regions = escalated.setdefault(i, ([], []))
+            if region is None:
+                outputs[i] = detections
+                continue
+            parts.append(detections.offset(region[0], region[1]))
+            regions.append(region)
+        for i, (parts, regions) in escalated.items():
+            if not regions:
+                continue
+            # Fast boxes centred in an escalated region are replaced by the accurate model's
+            kept = outputs[i]
+            centers = kept.centers()
+            regions = np.asarray(regions, dtype=np.float32)
+            inside = ((centers[:, None, 0] >= regions[None, :, 0]) & (centers[:, None, 0] < regions[None, :, 2])
+                      & (centers[:, None, 1] >= regions[None, :, 1]) & (centers[:, None, 1] < regions[None, :, 3]))
+            h, w = frames[i].shape[:2]
+            outputs[i] = merge_detections([kept[~inside.any(axis=1)]] + parts).clip(w, h)
+        return outputs
+
+    def stats(self) -> dict:
+        """Escalation rates and the share of pixels and time spent in the accurate model"""
+        frames = max(1, self.frames)
+        return {
+            'frames': self.frames,
+            'escalated_frames': self.escalated_frames,
+            'escalation_rate': self.escalated_frames / frames,
+            'full_frame_escalations': self.full_frame_escalations,
+            'escalated_regions': self.escalated_regions,
+            'reasons': dict(self.reasons),
+            'accurate_pixel_fraction': self.accurate_pixels / self.pixels if self.pixels else 0.0,
+            'fast_ms_per_frame': self.fast_ms / frames,
+            'accurate_ms_per_frame': self.accurate_ms / frames,
+        }
+
+
+def from_config(config, detector, loader: Callable):
+    """
+    detector cascaded into CASCADE_MODEL configured from config.py, or
+    detector itself if CASCADE is off
+    Args:
+        config: config module
+        detector: Fast detector for config.MODEL_PATH
+        loader: loader(model_path) -> detector for CASCADE_MODEL
+    """
+    if not config.CASCADE:
+        return detector
+    return CascadeDetector(detector, loader(config.CASCADE_MODEL), config.CASCADE_CONF_BAND,
+                           config.CASCADE_CROWD_IOU, config.CASCADE_REGIONS,
+                           config.CASCADE_REGION_MARGIN, config.CASCADE_MAX_REGION_FRACTION)
@@ -0,0 +1,187 @@
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+from detections import Detections
+
+# Gate decisions
+FULL = 'full'
+REGION = 'region'
+SKIP = 'skip'
+
+
+class ChangeGate:
+    """
+    Skips inference on frames that are effectively unchanged.
+
+    Each frame is downsampled to a small grayscale thumbnail and diffed against
+    a reference thumbnail. If almost no pixels changed, the previous detections
+    are reused; if only part of the frame changed, the model runs on just that
+    dirty region and its boxes replace the old ones there; otherwise the full
+    frame is detected. The reference only advances where the model ran, so slow
+    drift still accumulates until it crosses the thresholds.
+    """
+
+    def __init__(self, pixel_threshold: int = 12, static_fraction: float = 0.002,
+                 region_fraction: float = 0.3, downsample_width: int = 96,
+                 max_skip: int = 30, margin: int = 16, min_region: int = 160):
+        """
+        Args:
+            pixel_threshold: Gray-level difference for a thumbnail pixel to count as changed
+            static_fraction: At or below this fraction of changed pixels the frame is skipped
+            region_fraction: At or below this fraction only the dirty region is detected
+            downsample_width: Thumbnail width used for the diff
+            max_skip: Force a full detection after this many gated frames
+            margin: Pixels added around the dirty region (source resolution)
+            min_region: Minimum dirty region side (source resolution)
+        """
+        self.pixel_threshold = pixel_threshold
+        self.static_fraction = static_fraction
+        self.region_fraction = region_fraction
+        self.downsample_width = downsample_width
+        self.max_skip = max_skip
+        self.margin = margin
+        self.min_region = min_region
+        self.reset()
+
+    def reset(self):
+        """Forget the reference frame and statistics"""
+        self._reference = None
+        self._shape = None
+        self._since_full = 0
+        self._previous = Detections.empty()
+        self.counts = {FULL: 0, REGION: 0, SKIP: 0}
+        self._region_area = 0.0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        width = min(self.downsample_width, w)
+        height = max(1, int(round(h * width / w)))
+        small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def decide(self, frame: np.ndarray) -> Tuple[str, Optional[Tuple[int, int, int, int]]]:
+        """
+        Classify a frame against the reference and advance the reference
+        Returns:
+            (FULL, None), (SKIP, None) or (REGION, (x1, y1, x2, y2)) in source pixels
+        """
+        small = self._thumbnail(frame)
+        if (self._reference is None or frame.shape != self._shape
+                or self._since_full >= self.max_skip):
+            return self._full(frame, small)
+
+        changed = cv2.absdiff(small, self._reference) > self.pixel_threshold
+        fraction = float(changed.mean())
+        if fraction <= self.static_fraction:
+            self._since_full += 1
+            self.counts[SKIP] += 1
+            return SKIP, None
+        if fraction > self.region_fraction:
+            return self._full(frame, small)
+
+        # Bounding box of the changed thumbnail pixels, scaled back up
+        ys, xs = np.nonzero(changed)
+        sy0, sy1, sx0, sx1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        self._reference[sy0:sy1, sx0:sx1] = small[sy0:sy1, sx0:sx1]
+
+        h, w = frame.shape[:2]
+        scale_x, scale_y = w / small.shape[1], h / small.shape[0]
+        x1, x2 = self._expand(sx0 * scale_x, sx1 * scale_x, w)
+        y1, y2 = self._expand(sy0 * scale_y, sy1 * scale_y, h)
+
+        self._since_full += 1
+        self.counts[REGION] += 1
+        self._region_area += (x2 - x1) * (y2 - y1) / float(w * h)
+        return REGION, (x1, y1, x2, y2)
+
+    def _full(self, frame: np.ndarray, small: np.ndarray):
+        self._reference = small
+        self._shape = frame.shape
+        self._since_full = 0
+        self.counts[FULL] += 1
+        return FULL, None
+
+    def _expand(self, lo: float, hi: float, limit: int) -> Tuple[int, int]:
+        """Add the margin, enforce the minimum size and clamp to [0, limit]"""
+        lo, hi = lo - self.margin, hi + self.margin
+        if hi - lo < self.min_region:
+            center = (lo + hi) / 2
+            lo, hi = center - self.min_region / 2, center + self.min_region / 2
+        lo, hi = int(max(0, lo)), int(min(limit, hi))
+        return lo, hi
+
+    def _merge(self, previous: Detections, region, detections: Detections) -> Detections:
+        """Replace the previous boxes that touch region with detections from the crop"""
+        x1, y1, x2, y2 = region
+        xyxy = previous.xyxy
+        outside = (xyxy[:, 2] <= x1) | (xyxy[:, 0] >= x2) | (xyxy[:, 3] <= y1) | (xyxy[:, 1] >= y2)
+        return Detections.concatenate([previous.filter(outside), detections.offset(x1, y1)])
+
+    def detect(self, detector, frame: np.ndarray, timing=None) -> Detections:
+        """Gated equivalent of detector.detect(frame)"""
+        return self.detect_batch(detector, [frame], timing)[0]
+
+    def detect_batch(self, detector, frames: List[np.ndarray], timing=None) -> List[Detections]:
+        """
+        Gated equivalent of detector.detect_batch(frames). Full frames and dirty
+        regions are sent to the model together in one batch.
+        """
+        decisions = []
+        inputs = []
+        for frame in frames:
+            if frame is None or frame.size == 0:
+                decisions.append((None, None, None))
+                continue
+            mode, region = self.decide(frame)
+            if mode == FULL:
+                decisions.append((mode, None, len(inputs)))
+                inputs.append(frame)
+            elif mode == REGION:
+                x1, y1, x2, y2 = region
+                decisions.append((mode, region, len(inputs)))
+                inputs.append(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+            else:
+                decisions.append((mode, None, None))
+        if timing is not None:
+            timing.lap('preprocess')
+
+        results = detector.detect_batch(inputs, timing) if inputs else []
+
+        # Resolve in order: skipped and region frames build on the frame before them
+        outputs = []
+        previous = self._previous
+        for mode, region, index in decisions:
+            if mode is None:
+                outputs.append(Detections.empty())
+                continue
+            if mode == FULL:
+                previous = results[index]
+            elif mode == REGION:
+                previous = self._merge(previous, region, results[index])
+            outputs.append(previous)
+        self._previous = previous
+        return outputs
+
+    def stats(self) -> dict:
+        """Decision counts, the skip ratio and the mean dirty-region area fraction"""
+        total = sum(self.counts.values())
+        return {
+            'frames': total,
+            'full': self.counts[FULL],
+            'region': self.counts[REGION],
+            'skipped': self.counts[SKIP],
+            'skip_ratio': self.counts[SKIP] / total if total else 0.0,
+            'mean_region_area': (self._region_area / self.counts[REGION]
+                                 if self.counts[REGION] else 0.0),
+        }
+
+
+def from_config(config) -> Optional[ChangeGate]:
+    """ChangeGate configured from config.py, or None if gating is disabled"""
+    if not config.CHANGE_GATING:
+        return None
+    return ChangeGate(config.CHANGE_PIXEL_THRESHOLD, config.CHANGE_STATIC_FRACTION,
+                      config.CHANGE_REGION_FRACTION, config.CHANGE_DOWNSAMPLE_WIDTH,
+                      config.CHANGE_MAX_SKIP)
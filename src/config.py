@@ -2,11 +2,138 @@
 
 # MODEL_PATH = "models/model_YOLO11s_102224.pt"
 MODEL_PATH = "models/model_yolo11n_111024.pt"
-IMAGE_PATH = "data/ForTest/Pic/1.jpg"
+# Trained models compared by the benchmarking and quantization tools
+AVAILABLE_MODELS = ["models/model_yolo11n_111024.pt", "models/model_YOLO11s_102224.pt"]
+IMAGE_PATH = "data/ForTest/Pic/1.jpg"  # A single image or a directory of images
 VIDEO_PATH = "data/ForTest/video/1.mp4"
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
 CONF_THRESHOLD = 0.55
 IOU_THRESHOLD = 0.45
 
+# Maximum number of frames sent to the model in one call
+BATCH_SIZE = 8
+
+# Inference runtime: 'torch', or 'onnx'/'openvino' to export MODEL_PATH once
+# (cached next to the .pt file) and run it on a CPU-optimized runtime.
+# 'onnx-int8-static'/'onnx-int8-dynamic' additionally quantize the ONNX model
+# to INT8 (static mode calibrates on data/ForTest images, see quantize_report.py)
+BACKEND = 'torch'
+IMGSZ = 640  # Model input size used by exported backends
+# Fixed (width, height) model input, multiples of 32. Frames are letterboxed into
+# a reused input tensor with cached scale/padding; None lets each backend
+# preprocess every call. The screen detector's capture window rarely changes size.
+INPUT_SIZE = None
+SCREEN_INPUT_SIZE = (640, 416)
+
+# Per-machine tuning profile written by autotune.py (backend, imgsz, batch size
+# and CPU threads). main.py and the screen detector use its CPU threads and the
+# settings in TUNING_PROFILE_SETTINGS instead of the ones above while it matches
+# this machine, model and runtimes and the model was tuned less than
+# TUNING_PROFILE_MAX_AGE_DAYS ago (None disables)
+TUNING_PROFILE_PATH = "tuning_profile.json"
+TUNING_PROFILE_MAX_AGE_DAYS = 30
+TUNING_PROFILE_SETTINGS = ['backend', 'imgsz']  # Add 'batch_size' to also take its batch size
+
 PROCESS_IMAGE = False
 PROCESS_VIDEO = True
+
+# Video processing
+PIPELINE_VIDEO = True      # Overlap decode, inference and rendering on separate threads
+PIPELINE_QUEUE_SIZE = 4    # Batches buffered between pipeline stages
+HEADLESS = False           # Skip cv2.imshow/waitKey and process as fast as possible
+# Split one video across worker processes, each with its own model (1 disables).
+# Frames are decoded into shared-memory slots and results re-ordered; change
+# gating, tracking, the latency budget and the detection cache are not applied
+INFERENCE_WORKERS = 1
+INFERENCE_POOL_SLOTS = None  # Frames in flight / reorder window, default 2 * workers * BATCH_SIZE
+# Write the annotated video to a file on an encoder thread (None disables). While
+# exporting, the display is not throttled to playback speed (HEADLESS skips it)
+EXPORT_VIDEO_PATH = None       # e.g. "output/annotated.mp4"
+EXPORT_QUEUE_SIZE = 8          # Frames buffered for the encoder
+EXPORT_DETECTIONS_ONLY = False # Only write segments around frames with detections
+EXPORT_PRE_ROLL = 15           # Frames kept before a segment's first detection
+EXPORT_POST_ROLL = 15          # Frames kept after its last detection
+
+# Screen capture for screen_detector.py: 'x11shm' (X11 MIT-SHM), 'mss',
+# 'pyautogui', or 'auto' for the first available in that order
+CAPTURE_BACKEND = 'auto'
+FRAME_POOL_SIZE = 3  # Preallocated frames in flight between capture, detection and the GUI
+GUI_QUEUE_SIZE = 1   # Frames waiting for display; when the GUI falls behind the oldest is dropped
+# Record every captured frame with its timestamp to this directory, for replaying
+# through the detection path headless with capture_replay.py (None disables)
+CAPTURE_RECORD_PATH = None  # e.g. "recordings/session1"
+
+# Dummy detections run while the model loads in the background, so the first
+# real frame doesn't pay one-time setup costs (0 disables warmup)
+WARMUP_ITERATIONS = 1
+WARMUP_SIZE = (640, 416)  # (width, height) of the warmup frame
+
+# Tiled inference for high-resolution images/video: frames larger than a tile
+# are split into overlapping tiles that run as one batch and are merged with
+# a cross-tile NMS, so small objects aren't lost to downscaling
+TILING = False
+TILE_SIZE = 640              # Tile side in pixels
+TILE_OVERLAP = 0.2           # Fraction of a tile shared with its neighbours
+TILE_MATCH_THRESHOLD = 0.5   # Intersection-over-smaller at which boxes from different tiles are merged
+TILE_FULL_FRAME = True       # Also detect on the whole frame, for objects larger than a tile
+TILE_COARSE = False          # Only run tiles that overlap a low-confidence full-frame detection
+TILE_COARSE_CONF = 0.1       # Confidence threshold of that coarse pass
+
+# Latency budget: keep detection under LATENCY_BUDGET_MS per frame by stepping
+# through BUDGET_INPUT_SIZES, then BUDGET_MODELS, then detecting only every
+# 2nd..BUDGET_MAX_STRIDE-th frame (None disables). The chosen operating point
+# is printed when it changes and reported with the stats.
+LATENCY_BUDGET_MS = None
+BUDGET_INPUT_SIZES = [(640, 416), (512, 320), (416, 256), (320, 192)]  # Largest first, multiples of 32
+BUDGET_MODELS = []     # Cheaper fallback models, e.g. the n model when MODEL_PATH is the s model
+BUDGET_MAX_STRIDE = 3
+BUDGET_WINDOW = 30     # Frames measured before an operating point is judged
+
+# Model cascade: MODEL_PATH (the n model) runs on every frame and CASCADE_MODEL
+# only on frames/regions where its detections are ambiguous: a confidence
+# inside CASCADE_CONF_BAND, or boxes overlapping more than CASCADE_CROWD_IOU.
+# Escalation rates are reported with the stats.
+CASCADE = False
+CASCADE_MODEL = "models/model_YOLO11s_102224.pt"
+CASCADE_CONF_BAND = (0.3, 0.75)    # n-model confidences treated as ambiguous
+CASCADE_CROWD_IOU = 0.3            # IoU at which n-model boxes count as crowded (None disables)
+CASCADE_REGIONS = True             # Escalate padded regions around ambiguous boxes, not whole frames
+CASCADE_REGION_MARGIN = 0.5        # Region padding on each side, as a fraction of the box size
+CASCADE_MAX_REGION_FRACTION = 0.5  # Escalate the whole frame when regions cover more than this
+
+# Persistent detection cache for main.py: results are keyed by frame content,
+# model file hash, backend/input size and CONF/IOU_THRESHOLD, so re-running on
+# the same images or footage skips inference (None disables)
+DETECTION_CACHE_PATH = None   # e.g. "cache/detections.sqlite"
+DETECTION_CACHE_MAX_MB = 256  # Least recently used results are evicted beyond this
+
+# Threshold sweeps (threshold_sweep.py): raw pre-NMS candidates above
+# SWEEP_MIN_CONF are stored once per clip, then re-thresholded over the grid
+SWEEP_MIN_CONF = 0.05
+SWEEP_CONF_VALUES = [0.25, 0.35, 0.45, 0.55, 0.65, 0.75]
+SWEEP_IOU_VALUES = [0.3, 0.45, 0.6, 0.75]
+
+# Per-stage timing (capture, preprocess, inference, postprocess, aim, draw, emit)
+TIMING_WINDOW = 512          # Frames kept for rolling percentiles
+SHOW_TIMING_OVERLAY = False  # Draw a p50/p95 panel on the detection window
+TIMING_DUMP_PATH = None      # e.g. "stage_timings.json" to dump the summary periodically
+TIMING_DUMP_INTERVAL = 10.0  # Seconds between dumps
+
+# Change-detection gating: reuse the previous detections on static frames and
+# only detect the changed region when a small part of the frame changed
+CHANGE_GATING = False
+CHANGE_PIXEL_THRESHOLD = 12       # Gray-level difference counted as a change
+CHANGE_STATIC_FRACTION = 0.002    # Changed-pixel fraction at or below which a frame is skipped
+CHANGE_REGION_FRACTION = 0.3      # Changed-pixel fraction at or below which only the dirty region runs
+CHANGE_DOWNSAMPLE_WIDTH = 96      # Thumbnail width used for the frame diff
+CHANGE_MAX_SKIP = 30              # Force a full detection after this many gated frames
+
+# Detect-every-N with tracking: run the full detector only on keyframes and
+# propagate boxes with a Kalman/IoU tracker in between (1 disables tracking)
+DETECT_EVERY_N = 1
+TRACKER_MIN_CONFIDENCE = 0.25  # Re-run the detector early below this track confidence
+TRACKER_IOU_THRESHOLD = 0.3    # Track/detection association threshold
+TRACKER_MAX_MISSES = 2         # Keyframes a track may go unmatched before it is dropped
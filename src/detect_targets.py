@@ -1,23 +1,88 @@
+import contextlib
+import itertools
+import time
 import cv2
-import torch
-from ultralytics import YOLO
 import numpy as np
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from detections import Detections
+import autotune
+from backends import FixedShapePreprocessor, TorchBackend, candidates, load_backend, preprocess
 
 class TargetDetector:
-    def __init__(self, model_path: str, conf_threshold: float = 0.25, iou_threshold: float = 0.45):
+    def __init__(self, model_path: str, conf_threshold: float = 0.25, iou_threshold: float = 0.45,
+                 max_batch_size: Optional[int] = None, backend: Optional[str] = None,
+                 imgsz: Optional[int] = None, input_size: Optional[Tuple[int, int]] = None,
+                 threads: Optional[int] = None, profile_path: Optional[str] = None,
+                 profile_settings: Sequence[str] = (),
+                 calibration_path: Optional[Union[str, Sequence[str]]] = None):
         """
         Initialize the target detector
         Args:
             model_path: Path to the YOLO model
             conf_threshold: Confidence threshold for detections
             iou_threshold: IOU threshold for NMS
+            max_batch_size: Maximum number of frames sent to the model in one call (default 8)
+            backend: Inference runtime: 'torch' (default), or 'onnx'/'openvino' to
+                     export the model once and run it on a CPU-optimized runtime
+            imgsz: Model input size (default 640)
+            input_size: Optional fixed (width, height) model input, multiples of 32.
+                        Frames are letterboxed into a reused input tensor with
+                        cached scale/padding instead of per-call preprocessing
+            threads: Intra-op CPU threads, None for the runtime's default
+            profile_path: Per-machine profile written by autotune.py. If it is
+                          current for this machine and model, its settings fill
+                          in the arguments above that were left as None;
+                          explicit arguments are kept
+            profile_settings: Settings (e.g. 'backend', 'imgsz', 'batch_size')
+                              a current profile replaces even when given above
+            calibration_path: Directory or list of images for static INT8
+                              calibration, None for backends.DEFAULT_CALIBRATION_PATH
         """
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = self.load_model(model_path)
+        interop_threads = None
+        self.profile = autotune.load_profile(profile_path, model_path)
+        if self.profile is not None:
+            settings, used, kept = autotune.merge_profile(self.profile, profile_settings,
+                                                          backend=backend, imgsz=imgsz,
+                                                          batch_size=max_batch_size, threads=threads)
+            backend, imgsz = settings['backend'], settings['imgsz']
+            max_batch_size, threads = settings['batch_size'], settings['threads']
+            interop_threads = settings['interop_threads']
+            if used:
+                print(f"Using tuned settings from {profile_path}: {', '.join(used)}")
+            if kept:
+                print(f"Keeping explicit settings over {profile_path}: {', '.join(kept)}")
+        backend = 'torch' if backend is None else backend
+        imgsz = 640 if imgsz is None else imgsz
+        max_batch_size = 8 if max_batch_size is None else max_batch_size
+
+        self.model_path = model_path
+        self.backend_name = backend
+        self.imgsz = imgsz
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
-        self.model.to(self.device)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.errors = 0  # Failed model calls, whose frames got empty results
+
+        if backend == 'torch':
+            # Imported here so only the torch backend pays for it
+            import torch
+            if threads or interop_threads:
+                autotune.apply_torch_threads(threads, interop_threads)
+            self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            self.model = self.load_model(model_path)
+            self.model.to(self.device)
+            self.backend = TorchBackend(self.model, self.device, imgsz)
+        else:
+            self.device = 'cpu'
+            self.model = None
+            try:
+                calibration = {} if calibration_path is None else {'calibration_path': calibration_path}
+                self.backend = load_backend(backend, model_path, imgsz, threads=threads, **calibration)
+            except Exception as e:
+                raise RuntimeError(f"Failed to load {backend} backend for {model_path}: {str(e)}")
+
+        self.preprocessor = (FixedShapePreprocessor(input_size, self.max_batch_size)
+                             if input_size is not None else None)
         
         # 缓存常用的颜色和字体设置
         self.BOX_COLOR = (0, 255, 0)  # BGR格式
@@ -26,7 +91,7 @@ class TargetDetector:
         self.FONT_SCALE = 0.9
         self.FONT = cv2.FONT_HERSHEY_SIMPLEX
 
-    def load_model(self, model_path: str) -> YOLO:
+    def load_model(self, model_path: str):
         """
         Load the YOLO model
         Args:
@@ -34,62 +99,166 @@ class TargetDetector:
         Returns:
             YOLO model instance
         """
+        from ultralytics import YOLO
         try:
             model = YOLO(model_path)
             return model
         except Exception as e:
             raise RuntimeError(f"Failed to load model from {model_path}: {str(e)}")
 
-    def detect(self, image: np.ndarray) -> List[List[float]]:
+    def set_input_size(self, input_size: Optional[Tuple[int, int]]):
+        """Switch the fixed (width, height) model input, or None to disable it"""
+        current = None if self.preprocessor is None else (self.preprocessor.width, self.preprocessor.height)
+        if input_size is not None:
+            input_size = tuple(input_size)
+        if input_size == current:
+            return
+        self.preprocessor = (FixedShapePreprocessor(input_size, self.max_batch_size)
+                             if input_size is not None else None)
+
+    @contextlib.contextmanager
+    def conf_threshold_override(self, conf_threshold: float):
+        """
+        Temporarily detect at another confidence threshold, e.g. for a
+        low-confidence candidate pass. Wrappers (tiling, cache) delegate this
+        method, so the threshold is always set on the TargetDetector itself.
+        """
+        previous = self.conf_threshold
+        self.conf_threshold = conf_threshold
+        try:
+            yield self
+        finally:
+            self.conf_threshold = previous
+
+    def warmup(self, iterations: int = 1, size: Tuple[int, int] = (640, 416)) -> float:
+        """
+        Run dummy detections so one-time setup (predictor construction, kernel
+        selection, runtime allocations) is paid before the first real frame
+        Args:
+            iterations: Number of dummy detections
+            size: (width, height) of the dummy frame
+        Returns:
+            Milliseconds spent warming up
+        """
+        start = time.perf_counter()
+        frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        for _ in range(iterations):
+            self.detect(frame)
+        return (time.perf_counter() - start) * 1000
+
+    def detect(self, image: np.ndarray, timing=None) -> Detections:
         """
         Detect targets in the image
         Args:
             image: Input image as numpy array (BGR format)
+            timing: Optional StageSample that receives preprocess, inference
+                    and postprocess times
         Returns:
-            List of bounding boxes in [x1,y1,x2,y2] format
+            Detections with boxes in [x1,y1,x2,y2] format, confidences and classes
         """
         if image is None or image.size == 0:
-            return []
+            return Detections.empty()
 
-        try:
-            with torch.no_grad():
-                results = self.model(image, 
-                                   conf=self.conf_threshold, 
-                                   iou=self.iou_threshold, 
-                                   device=self.device)
-                
-                boxes = []
-                if len(results) > 0:
-                    for r in results:
-                        boxes_tensor = r.boxes.cpu().numpy()
-                        for box in boxes_tensor:
-                            coords = box.xyxy[0].tolist()
-                            boxes.append(coords)
-                
-                return boxes
+        return self.detect_batch([image], timing)[0]
 
-        except Exception as e:
-            print(f"Detection error: {str(e)}")
-            return []
+    def detect_batch(self, frames: List[np.ndarray], timing=None) -> List[Detections]:
+        """
+        Detect targets in several images, running the model on up to
+        max_batch_size frames per call
+        Args:
+            frames: List of input images as numpy arrays (BGR format)
+            timing: Optional StageSample that receives preprocess, inference
+                    and postprocess times
+        Returns:
+            One Detections per input frame, in input order.
+            Empty or missing frames get empty Detections.
+        """
+        all_boxes = [Detections.empty() for _ in frames]
+        valid = [i for i, frame in enumerate(frames) if frame is not None and frame.size > 0]
+
+        for start in range(0, len(valid), self.max_batch_size):
+            chunk = valid[start:start + self.max_batch_size]
+            try:
+                if self.preprocessor is not None:
+                    batch, meta = self.preprocessor([frames[i] for i in chunk])
+                    if timing is not None:
+                        timing.lap('preprocess')
+                    results = self.backend.predict_preprocessed(batch, meta,
+                                                                self.conf_threshold,
+                                                                self.iou_threshold,
+                                                                timing)
+                else:
+                    results = self.backend.predict([frames[i] for i in chunk],
+                                                   self.conf_threshold,
+                                                   self.iou_threshold,
+                                                   timing)
+                for i, detections in zip(chunk, results):
+                    all_boxes[i] = detections
 
-    def draw_boxes(self, image: np.ndarray, boxes: List[List[float]]) -> np.ndarray:
+            except Exception as e:
+                self.errors += 1
+                print(f"Detection error: {str(e)}")
+
+        return all_boxes
+
+    def detect_raw(self, frames: List[np.ndarray], min_conf: float = 0.01,
+                   max_candidates: int = 1000) -> List[np.ndarray]:
+        """
+        Raw pre-NMS candidates, for re-thresholding without running the model
+        again (see threshold_sweep.py)
+        Args:
+            frames: List of input images (BGR format)
+            min_conf: Candidates scoring at or below this are dropped
+            max_candidates: Keep at most this many highest-scoring candidates per frame
+        Returns:
+            Per frame, a float32 array of [x1, y1, x2, y2, conf, cls] rows in
+            source image coordinates, sorted by descending conf. Empty or
+            missing frames get an empty (0, 6) array.
+        """
+        rows = [np.zeros((0, 6), dtype=np.float32) for _ in frames]
+        valid = [i for i, frame in enumerate(frames) if frame is not None and frame.size > 0]
+        for start in range(0, len(valid), self.max_batch_size):
+            chunk = valid[start:start + self.max_batch_size]
+            if self.preprocessor is not None:
+                batch, meta = self.preprocessor([frames[i] for i in chunk])
+            else:
+                batch, meta = preprocess([frames[i] for i in chunk], self.imgsz)
+            predictions = self.backend.infer(batch)
+
+            for i, pred, (gain, (left, top), (h, w)) in zip(chunk, predictions, meta):
+                xyxy, conf, cls = candidates(pred, min_conf)
+                order = np.argsort(-conf, kind='stable')[:max_candidates]
+                # Undo letterbox padding and scaling, and clip to the image like postprocess
+                xyxy = (xyxy[order] - np.array([left, top, left, top], dtype=np.float32)) / gain
+                np.clip(xyxy[:, 0::2], 0, w, out=xyxy[:, 0::2])
+                np.clip(xyxy[:, 1::2], 0, h, out=xyxy[:, 1::2])
+                rows[i] = np.hstack([xyxy, conf[order, None], cls[order, None]]).astype(np.float32)
+        return rows
+
+    def draw_boxes(self, image: np.ndarray, boxes: Detections, in_place: bool = False) -> np.ndarray:
         """
         Draw detection boxes on the image
         Args:
             image: Input image
-            boxes: List of bounding boxes
+            boxes: Detections for the image
+            in_place: Draw directly on image instead of a copy, for callers that
+                      own the frame and no longer need it unannotated
         Returns:
             Image with drawn boxes
         """
         if image is None or len(boxes) == 0:
             return image
 
-        image_with_boxes = image.copy()
+        image_with_boxes = image if in_place else image.copy()
         
-        for box in boxes:
-            # Convert coordinates to integers
-            x1, y1, x2, y2 = map(int, box)
-            
+        # Tracked boxes are labelled with their persistent id
+        if boxes.ids is not None:
+            labels = [f'Target {i}' for i in boxes.ids.tolist()]
+        else:
+            labels = ['Target'] * len(boxes)
+
+        # Convert all coordinates to integers at once
+        for (x1, y1, x2, y2), label in zip(boxes.to_int_boxes().tolist(), labels):
             # Draw rectangle
             cv2.rectangle(image_with_boxes, 
                          (x1, y1), 
@@ -99,7 +268,7 @@ class TargetDetector:
             
             # Add label
             cv2.putText(image_with_boxes, 
-                       'Target', 
+                       label, 
                        (x1, y1 - 10), 
                        self.FONT, 
                        self.FONT_SCALE, 
@@ -117,15 +286,38 @@ def process_image(image_path: str, detector: TargetDetector) -> np.ndarray:
     Returns:
         Processed image with detection boxes
     """
-    try:
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError(f"Failed to load image from {image_path}")
-            
-        boxes = detector.detect(image)
-        image_with_boxes = detector.draw_boxes(image, boxes)
-        return image_with_boxes
-        
-    except Exception as e:
-        print(f"Error processing image {image_path}: {str(e)}")
-        return None
+    return next(process_images([image_path], detector))
+
+def process_images(image_paths: Iterable[str], detector: TargetDetector) -> Iterator[Optional[np.ndarray]]:
+    """
+    Process several image files, sending them to the detector in batches.
+    Only one max_batch_size chunk of images is read and held at a time.
+    Args:
+        image_paths: Paths to the image files
+        detector: TargetDetector instance
+    Yields:
+        Processed images with detection boxes, in the same order as image_paths.
+        Entries for images that failed to load are None.
+    """
+    paths = iter(image_paths)
+    batch_size = detector.max_batch_size
+    while True:
+        chunk = list(itertools.islice(paths, batch_size))
+        if not chunk:
+            return
+        images = []
+        for image_path in chunk:
+            image = cv2.imread(image_path)
+            if image is None:
+                print(f"Error processing image {image_path}: Failed to load image")
+            images.append(image)
+
+        processed = [None] * len(images)
+        try:
+            batch_boxes = detector.detect_batch(images)
+            for offset, (image, boxes) in enumerate(zip(images, batch_boxes)):
+                if image is not None:
+                    processed[offset] = detector.draw_boxes(image, boxes, in_place=True)
+        except Exception as e:
+            print(f"Error processing images {chunk}: {str(e)}")
+        yield from processed
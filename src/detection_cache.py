@@ -0,0 +1,206 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional
+from detections import Detections
+from backends import file_hash
+
+
+def frame_hash(frame: np.ndarray, salt: str = '') -> str:
+    """Content hash of a frame's pixels, shape and dtype, mixed with salt"""
+    frame = np.ascontiguousarray(frame)
+    # SHA-256 is hardware accelerated on current CPUs, faster here than BLAKE2
+    digest = hashlib.sha256()
+    digest.update(f'{salt}|{frame.shape}{frame.dtype}'.encode())
+    digest.update(memoryview(frame).cast('B'))
+    return digest.hexdigest()[:32]
+
+
+def encode(detections: Detections) -> bytes:
+    """Pack detections as a count followed by raw xyxy/conf/cls arrays"""
+    return (struct.pack('<I', len(detections)) + detections.xyxy.astype('<f4').tobytes()
+            + detections.conf.astype('<f4').tobytes() + detections.cls.astype('<i4').tobytes())
+
+
+def decode(blob: bytes) -> Detections:
+    (n,) = struct.unpack_from('<I', blob)
+    xyxy = np.frombuffer(blob, dtype='<f4', count=n * 4, offset=4).reshape(n, 4)
+    conf = np.frombuffer(blob, dtype='<f4', count=n, offset=4 + 16 * n)
+    cls = np.frombuffer(blob, dtype='<i4', count=n, offset=4 + 20 * n)
+    return Detections(xyxy.astype(np.float32), conf.astype(np.float32), cls.astype(np.int32))
+
+
+class DetectionCache:
+    """
+    Persistent SQLite store of encoded detections with LRU eviction once the
+    stored results exceed max_bytes. Safe to share between threads.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            max_bytes: Upper bound on the size of the stored results
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS detections ('
+                         'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'size INTEGER NOT NULL, last_used REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS detections_lru ON detections (last_used)')
+        self._db.commit()
+        self.total_bytes = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM detections').fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, Detections]:
+        """Look up keys, returning the cached detections of those that are present"""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM detections WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                found.update((key, decode(value)) for key, value in rows)
+            now = time.time()
+            self._db.executemany('UPDATE detections SET last_used = ? WHERE key = ?',
+                                 [(now, key) for key in found])
+            self._db.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, Detections]):
+        """Store detections by key and evict least recently used entries if over the bound"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, encode(detections), now) for key, detections in items.items()]
+        with self._lock:
+            for key, blob, used in rows:
+                previous = self._db.execute('SELECT size FROM detections WHERE key = ?',
+                                            (key,)).fetchone()
+                self.total_bytes += len(blob) - (previous[0] if previous else 0)
+                self._db.execute('INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?)',
+                                 (key, blob, len(blob), used))
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until 90% of max_bytes is free to grow into"""
+        target = self.max_bytes * 0.9
+        while self.total_bytes > target:
+            rows = self._db.execute('SELECT key, size FROM detections ORDER BY last_used LIMIT 256').fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            dropped = []
+            for key, size in rows:
+                dropped.append((key,))
+                self.total_bytes -= size
+                if self.total_bytes <= target:
+                    break
+            self._db.executemany('DELETE FROM detections WHERE key = ?', dropped)
+            self.evictions += len(dropped)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM detections').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': self.total_bytes,
+            'evictions': self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CachedDetector:
+    """
+    Wraps a TargetDetector so frames it has already seen are answered from a
+    DetectionCache. Keys combine the frame's content hash with the model file
+    hash, backend, input size and the current conf/iou thresholds, so any
+    change to what the model would output misses the cache.
+    Exposes the same detect/detect_batch interface; everything else is
+    delegated to the wrapped detector.
+    """
+
+    def __init__(self, detector, cache: DetectionCache):
+        self.detector = detector
+        self.cache = cache
+        self.model_hash = file_hash(detector.model_path)
+
+    def __getattr__(self, name):
+        if name == 'detector':
+            raise AttributeError(name)
+        return getattr(self.detector, name)
+
+    def _settings(self) -> str:
+        d = self.detector
+        input_size = None if d.preprocessor is None else (d.preprocessor.width, d.preprocessor.height)
+        return (f'{self.model_hash}|{d.backend_name}|{d.imgsz}|{input_size}'
+                f'|{d.conf_threshold!r}|{d.iou_threshold!r}')
+
+    def detect(self, image: np.ndarray, timing=None) -> Detections:
+        if image is None or image.size == 0:
+            return Detections.empty()
+        return self.detect_batch([image], timing)[0]
+
+    def detect_batch(self, frames: List[np.ndarray], timing=None) -> List[Detections]:
+        """Cached equivalent of detector.detect_batch(frames); only misses reach the model"""
+        settings = self._settings()
+        keys = [None if frame is None or frame.size == 0 else frame_hash(frame, settings)
+                for frame in frames]
+        cached = self.cache.get_many(sorted({key for key in keys if key is not None}))
+        if timing is not None:
+            timing.lap('preprocess')
+
+        # Duplicate frames within the batch are only detected once
+        missing = {}
+        for i, key in enumerate(keys):
+            if key is not None and key not in cached and key not in missing:
+                missing[key] = i
+        if missing:
+            errors = self.detector.errors
+            results = self.detector.detect_batch([frames[i] for i in missing.values()], timing)
+            detected = dict(zip(missing, results))
+            # Never cache the empty results of a failed model call
+            if self.detector.errors == errors:
+                self.cache.put_many(detected)
+            cached.update(detected)
+
+        return [Detections.empty() if key is None else cached[key] for key in keys]
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+def from_config(config) -> Optional[DetectionCache]:
+    """DetectionCache configured from config.py, or None if DETECTION_CACHE_PATH is None"""
+    if config.DETECTION_CACHE_PATH is None:
+        return None
+    return DetectionCache(config.DETECTION_CACHE_PATH, int(config.DETECTION_CACHE_MAX_MB * 1024 * 1024))
@@ -0,0 +1,257 @@
+import numpy as np
+from typing import Optional, Tuple
+
+
+class Detections:
+    """
+    Detection results for a single frame stored as contiguous arrays:
+    xyxy (N x 4, float32), conf (N, float32), cls (N, int32) and optional
+    track ids (N, int32). All helpers are vectorized over the N boxes.
+    """
+
+    __slots__ = ('xyxy', 'conf', 'cls', 'ids')
+
+    def __init__(self, xyxy=None, conf=None, cls=None, ids=None):
+        """
+        Args:
+            xyxy: Box coordinates in [x1,y1,x2,y2] format, shape (N, 4)
+            conf: Confidence scores, shape (N,). Defaults to 1.0 for every box
+            cls: Class ids, shape (N,). Defaults to 0 for every box
+            ids: Optional persistent track ids, shape (N,)
+        """
+        if xyxy is None:
+            xyxy = np.zeros((0, 4), dtype=np.float32)
+        self.xyxy = np.ascontiguousarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        n = len(self.xyxy)
+        self.conf = (np.ones(n, dtype=np.float32) if conf is None
+                     else np.ascontiguousarray(conf, dtype=np.float32).reshape(n))
+        self.cls = (np.zeros(n, dtype=np.int32) if cls is None
+                    else np.ascontiguousarray(cls, dtype=np.int32).reshape(n))
+        self.ids = (None if ids is None
+                    else np.ascontiguousarray(ids, dtype=np.int32).reshape(n))
+
+    @classmethod
+    def empty(cls) -> 'Detections':
+        return cls()
+
+    @classmethod
+    def from_boxes(cls, boxes) -> 'Detections':
+        """
+        Build from an ultralytics Boxes object (torch or numpy backed)
+        Args:
+            boxes: Results.boxes from an ultralytics prediction
+        """
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        boxes = boxes.cpu().numpy()
+        return cls(boxes.xyxy, boxes.conf, boxes.cls)
+
+    @classmethod
+    def concatenate(cls, parts) -> 'Detections':
+        parts = [p for p in parts if len(p) > 0]
+        if not parts:
+            return cls.empty()
+        ids = None
+        if all(p.ids is not None for p in parts):
+            ids = np.concatenate([p.ids for p in parts])
+        return cls(np.concatenate([p.xyxy for p in parts]),
+                   np.concatenate([p.conf for p in parts]),
+                   np.concatenate([p.cls for p in parts]),
+                   ids)
+
+    def __len__(self) -> int:
+        return len(self.xyxy)
+
+    def __getitem__(self, index) -> 'Detections':
+        """Select boxes with an integer array, slice or boolean mask"""
+        if isinstance(index, (int, np.integer)):
+            index = [index]
+        return Detections(self.xyxy[index], self.conf[index], self.cls[index],
+                          None if self.ids is None else self.ids[index])
+
+    def __repr__(self) -> str:
+        return f"Detections(n={len(self)})"
+
+    @property
+    def widths(self) -> np.ndarray:
+        return self.xyxy[:, 2] - self.xyxy[:, 0]
+
+    @property
+    def heights(self) -> np.ndarray:
+        return self.xyxy[:, 3] - self.xyxy[:, 1]
+
+    def centers(self) -> np.ndarray:
+        """Box centers, shape (N, 2)"""
+        return (self.xyxy[:, :2] + self.xyxy[:, 2:]) * 0.5
+
+    def areas(self) -> np.ndarray:
+        return np.clip(self.widths, 0, None) * np.clip(self.heights, 0, None)
+
+    def distances_to(self, x: float, y: float) -> np.ndarray:
+        """Euclidean distance from each box center to (x, y)"""
+        centers = self.centers()
+        return np.hypot(centers[:, 0] - x, centers[:, 1] - y)
+
+    def closest_to(self, x: float, y: float) -> Optional[int]:
+        """Index of the box whose center is closest to (x, y), or None if empty"""
+        if len(self) == 0:
+            return None
+        return int(np.argmin(self.distances_to(x, y)))
+
+    def filter(self, mask: np.ndarray) -> 'Detections':
+        """Keep boxes where mask is True"""
+        return self[np.asarray(mask, dtype=bool)]
+
+    def filter_conf(self, min_conf: float) -> 'Detections':
+        return self.filter(self.conf >= min_conf)
+
+    def filter_classes(self, classes) -> 'Detections':
+        return self.filter(np.isin(self.cls, np.asarray(classes, dtype=np.int32)))
+
+    def filter_area(self, min_area: float = 0.0, max_area: float = np.inf) -> 'Detections':
+        areas = self.areas()
+        return self.filter((areas >= min_area) & (areas <= max_area))
+
+    def offset(self, dx: float, dy: float) -> 'Detections':
+        """Return a copy with every box translated by (dx, dy)"""
+        shift = np.array([dx, dy, dx, dy], dtype=np.float32)
+        return Detections(self.xyxy + shift, self.conf, self.cls, self.ids)
+
+    def scale(self, sx: float, sy: Optional[float] = None) -> 'Detections':
+        """Return a copy with every box scaled by (sx, sy)"""
+        sy = sx if sy is None else sy
+        factor = np.array([sx, sy, sx, sy], dtype=np.float32)
+        return Detections(self.xyxy * factor, self.conf, self.cls, self.ids)
+
+    def clip(self, width: int, height: int) -> 'Detections':
+        """Return a copy with boxes clipped to an image of the given size"""
+        xyxy = self.xyxy.copy()
+        np.clip(xyxy[:, 0::2], 0, width, out=xyxy[:, 0::2])
+        np.clip(xyxy[:, 1::2], 0, height, out=xyxy[:, 1::2])
+        return Detections(xyxy, self.conf, self.cls, self.ids)
+
+    def to_int_boxes(self) -> np.ndarray:
+        """Box coordinates truncated to int32 for drawing"""
+        return self.xyxy.astype(np.int32)
+
+    def tolist(self):
+        """Boxes as a list of [x1,y1,x2,y2] lists"""
+        return self.xyxy.tolist()
+
+    def to_dict(self):
+        """JSON-serializable representation"""
+        data = {'xyxy': self.xyxy.tolist(), 'conf': self.conf.tolist(), 'cls': self.cls.tolist()}
+        if self.ids is not None:
+            data['ids'] = self.ids.tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data) -> 'Detections':
+        return cls(data.get('xyxy'), data.get('conf'), data.get('cls'), data.get('ids'))
+
+
+def _intersections(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pairwise intersection areas (N, M) and the areas of a (N,) and b (M,)"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    wh = np.clip(rb - lt, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return wh[..., 0] * wh[..., 1], area_a, area_b
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of boxes
+    Args:
+        a: Boxes in [x1,y1,x2,y2] format, shape (N, 4)
+        b: Boxes in [x1,y1,x2,y2] format, shape (M, 4)
+    Returns:
+        IoU matrix, shape (N, M)
+    """
+    inter, area_a, area_b = _intersections(a, b)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def box_ios(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise intersection over the smaller box's area. Unlike IoU this stays
+    high when one box is a truncated part of the other (e.g. cut by a tile edge)
+    Args:
+        a: Boxes in [x1,y1,x2,y2] format, shape (N, 4)
+        b: Boxes in [x1,y1,x2,y2] format, shape (M, 4)
+    Returns:
+        IoS matrix, shape (N, M)
+    """
+    inter, area_a, area_b = _intersections(a, b)
+    return inter / np.maximum(np.minimum(area_a[:, None], area_b[None, :]), 1e-9)
+
+
+# Per-class box offset used by class-aware NMS, same value as ultralytics
+MAX_WH = 7680
+
+
+def nms(xyxy: np.ndarray, scores: np.ndarray, iou_threshold: float,
+        classes: Optional[np.ndarray] = None, max_det: int = 300) -> np.ndarray:
+    """
+    Greedy non-maximum suppression with vectorized IoU
+    Args:
+        xyxy: Boxes in [x1,y1,x2,y2] format, shape (N, 4)
+        scores: Box scores, shape (N,)
+        iou_threshold: Boxes overlapping a kept box above this IoU are dropped
+        classes: Optional class ids; boxes of different classes never suppress each other
+        max_det: Maximum number of boxes to keep
+    Returns:
+        Indices of kept boxes, sorted by descending score
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    if len(xyxy) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if classes is not None:
+        # Shift each class into its own region so that classes never overlap
+        xyxy = xyxy + np.asarray(classes, dtype=np.float32)[:, None] * MAX_WH
+
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    keep = []
+    while order.size > 0 and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        ious = box_iou(xyxy[i], xyxy[order[1:]])[0]
+        order = order[1:][ious <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def match_detections(a: Detections, b: Detections, iou_threshold: float = 0.5,
+                     class_aware: bool = True) -> np.ndarray:
+    """
+    Greedily match boxes of a to boxes of b by descending confidence of a
+    Args:
+        a: First set of detections
+        b: Second set of detections
+        iou_threshold: Minimum IoU for a match
+        class_aware: Only match boxes of the same class
+    Returns:
+        Array of (index in a, index in b, iou) rows, shape (K, 3)
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((0, 3), dtype=np.float32)
+
+    ious = box_iou(a.xyxy, b.xyxy)
+    if class_aware:
+        ious[a.cls[:, None] != b.cls[None, :]] = 0.0
+
+    matches = []
+    taken = np.zeros(len(b), dtype=bool)
+    for i in np.argsort(-a.conf, kind='stable'):
+        candidates = np.where(taken, -1.0, ious[i])
+        j = int(np.argmax(candidates))
+        if candidates[j] >= iou_threshold:
+            taken[j] = True
+            matches.append((i, j, candidates[j]))
+    return np.asarray(matches, dtype=np.float32).reshape(-1, 3)
@@ -0,0 +1,272 @@
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+from backends import BACKENDS
+from detections import Detections, box_iou
+
+# IoU thresholds of mAP@0.5:0.95
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def default_label_dir(image_dir: str) -> str:
+    """YOLO layout: <split>/images/x.jpg is labelled by <split>/labels/x.txt"""
+    parent, name = os.path.split(os.path.normpath(image_dir))
+    return os.path.join(parent, 'labels') if name == 'images' else image_dir
+
+
+def read_labels(path: str, width: int, height: int) -> Detections:
+    """
+    Read a YOLO label file of "class cx cy w h" rows (normalized coordinates)
+    Returns:
+        Ground-truth boxes in pixels; empty if the file is missing (a background image)
+    """
+    if not os.path.exists(path):
+        return Detections.empty()
+    rows = np.loadtxt(path, dtype=np.float32, ndmin=2)
+    if rows.size == 0:
+        return Detections.empty()
+    cls, boxes = rows[:, 0], rows[:, 1:5] * np.array([width, height, width, height], dtype=np.float32)
+    xyxy = np.concatenate([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, :2] + boxes[:, 2:] / 2], axis=1)
+    return Detections(xyxy, cls=cls.astype(np.int32))
+
+
+def load_sample(image_path: str, label_dir: str) -> Tuple[Optional[np.ndarray], Detections]:
+    image = cv2.imread(image_path)
+    if image is None:
+        return None, Detections.empty()
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    height, width = image.shape[:2]
+    return image, read_labels(os.path.join(label_dir, stem + '.txt'), width, height)
+
+
+def prefetch(paths: List[str], label_dir: str, workers: int, depth: int) -> Iterator[tuple]:
+    """
+    Decode images and read labels on a thread pool, at most depth samples
+    ahead of the consumer (cv2 releases the GIL while decoding)
+    Yields:
+        (path, image, labels) in path order
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for path in paths:
+            pending.append((path, pool.submit(load_sample, path, label_dir)))
+            if len(pending) >= depth:
+                path, future = pending.popleft()
+                yield (path,) + future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield (path,) + future.result()
+
+
+def match_predictions(predictions: Detections, labels: Detections) -> np.ndarray:
+    """
+    Mark each prediction as a true positive at every IoU threshold. At each
+    threshold, candidate (prediction, label) pairs of the same class are taken
+    by descending IoU, each prediction and each label at most once.
+    Returns:
+        Boolean array, shape (num_predictions, len(IOU_THRESHOLDS))
+    """
+    correct = np.zeros((len(predictions), len(IOU_THRESHOLDS)), dtype=bool)
+    if len(predictions) == 0 or len(labels) == 0:
+        return correct
+
+    ious = box_iou(labels.xyxy, predictions.xyxy)
+    ious[labels.cls[:, None] != predictions.cls[None, :]] = 0.0
+    for t, threshold in enumerate(IOU_THRESHOLDS):
+        label_index, pred_index = np.nonzero(ious >= threshold)
+        if len(label_index) == 0:
+            continue
+        order = np.argsort(-ious[label_index, pred_index], kind='stable')
+        label_index, pred_index = label_index[order], pred_index[order]
+        # Highest-IoU pair first: keep the first occurrence of each prediction, then of each label
+        _, first = np.unique(pred_index, return_index=True)
+        label_index, pred_index = label_index[first], pred_index[first]
+        order = np.argsort(-ious[label_index, pred_index], kind='stable')
+        label_index, pred_index = label_index[order], pred_index[order]
+        _, first = np.unique(label_index, return_index=True)
+        correct[pred_index[first], t] = True
+    return correct
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> np.ndarray:
+    """
+    COCO-style 101-point interpolated AP
+    Args:
+        recall: Cumulative recall by descending confidence, shape (N, T)
+        precision: Cumulative precision, shape (N, T)
+    Returns:
+        AP per threshold, shape (T,)
+    """
+    # Precision envelope: best precision at this recall or higher
+    envelope = np.flip(np.maximum.accumulate(np.flip(precision, axis=0), axis=0), axis=0)
+    points = np.linspace(0, 1, 101)
+    ap = np.empty(recall.shape[1])
+    for t in range(recall.shape[1]):
+        # Precision at the first point reaching each recall level, 0 if never reached
+        index = np.searchsorted(recall[:, t], points, side='left')
+        reached = index < len(recall)
+        ap[t] = np.where(reached, envelope[np.minimum(index, len(recall) - 1), t], 0.0).mean()
+    return ap
+
+
+def compute_metrics(correct: np.ndarray, conf: np.ndarray, pred_cls: np.ndarray,
+                    label_cls: np.ndarray, conf_threshold: float) -> dict:
+    """
+    Dataset-level accuracy from every image's matched predictions
+    Args:
+        correct: True-positive flags per prediction and IoU threshold
+        conf: Prediction confidences
+        pred_cls: Prediction classes
+        label_cls: Classes of every ground-truth box
+        conf_threshold: Operating confidence for the precision/recall figures
+    Returns:
+        mAP@0.5, mAP@0.5:0.95 (means over classes with labels), and
+        precision/recall at IoU 0.5 and conf_threshold
+    """
+    classes = np.unique(label_cls)
+    ap = np.zeros((len(classes), len(IOU_THRESHOLDS)))
+    order = np.argsort(-conf, kind='stable')
+    correct, conf, pred_cls = correct[order], conf[order], pred_cls[order]
+    for k, c in enumerate(classes):
+        mask = pred_cls == c
+        if not mask.any():
+            continue
+        tp = np.cumsum(correct[mask], axis=0)
+        fp = np.cumsum(~correct[mask], axis=0)
+        ap[k] = average_precision(tp / (label_cls == c).sum(), tp / (tp + fp))
+
+    operating = conf > conf_threshold
+    true_positives = int(correct[operating, 0].sum())
+    return {
+        'map50': float(ap[:, 0].mean()) if len(classes) else 0.0,
+        'map50_95': float(ap.mean()) if len(classes) else 0.0,
+        'precision': true_positives / int(operating.sum()) if operating.any() else 0.0,
+        'recall': true_positives / len(label_cls) if len(label_cls) else 0.0,
+    }
+
+
+def evaluate(detector, image_paths: List[str], label_dir: str, conf_threshold: float,
+             workers: int = 4) -> dict:
+    """
+    Evaluate a detector on a labelled image set
+    Args:
+        detector: TargetDetector, with a low conf_threshold so the PR curve is complete
+        image_paths: Images to evaluate
+        label_dir: Directory of YOLO label files named after the images
+        conf_threshold: Operating confidence for precision/recall
+        workers: Threads decoding images ahead of inference
+    Returns:
+        Accuracy metrics with images/sec overall and for inference alone
+    """
+    batch_size = detector.max_batch_size
+    corrects, confs, pred_classes, label_classes = [], [], [], []
+    images = 0
+    inference_time = 0.0
+    batch, batch_labels = [], []
+
+    def run_batch():
+        nonlocal inference_time
+        start = time.perf_counter()
+        results = detector.detect_batch(batch)
+        inference_time += time.perf_counter() - start
+        for predictions, labels in zip(results, batch_labels):
+            corrects.append(match_predictions(predictions, labels))
+            confs.append(predictions.conf)
+            pred_classes.append(predictions.cls)
+            label_classes.append(labels.cls)
+
+    start = time.perf_counter()
+    for path, image, labels in prefetch(image_paths, label_dir, workers, 4 * batch_size):
+        if image is None:
+            print(f"Skipping unreadable image: {path}")
+            continue
+        images += 1
+        batch.append(image)
+        batch_labels.append(labels)
+        if len(batch) == batch_size:
+            run_batch()
+            batch, batch_labels = [], []
+    if batch:
+        run_batch()
+    elapsed = time.perf_counter() - start
+
+    if not images:
+        raise RuntimeError("No readable images to evaluate")
+    metrics = compute_metrics(np.concatenate(corrects), np.concatenate(confs),
+                              np.concatenate(pred_classes), np.concatenate(label_classes),
+                              conf_threshold)
+    metrics.update({
+        'images': images,
+        'instances': int(sum(len(c) for c in label_classes)),
+        'images_per_sec': images / elapsed,
+        'inference_images_per_sec': images / inference_time if inference_time else 0.0,
+        'errors': detector.errors,
+    })
+    return metrics
+
+
+def print_report(rows):
+    header = (f"{'model':<28} {'backend':<10} {'images':>6} {'labels':>6} {'P':>5} {'R':>5} "
+              f"{'mAP50':>6} {'mAP50-95':>8} {'img/s':>7} {'infer img/s':>11}")
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        print(f"{r['model']:<28} {r['backend']:<10} {r['images']:>6} {r['instances']:>6} "
+              f"{r['precision']:>5.3f} {r['recall']:>5.3f} {r['map50']:>6.3f} {r['map50_95']:>8.3f} "
+              f"{r['images_per_sec']:>7.1f} {r['inference_images_per_sec']:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evaluate models on a YOLO-format labelled image set: mAP@0.5, mAP@0.5:0.95, "
+                    "precision/recall at CONF_THRESHOLD, and images/sec")
+    parser.add_argument('images', help="Image directory, e.g. dataset/valid/images")
+    parser.add_argument('--labels', default=None,
+                        help="Label directory (default: the 'labels' sibling of an 'images' directory)")
+    parser.add_argument('--models', nargs='+', default=config.AVAILABLE_MODELS)
+    parser.add_argument('--backend', choices=BACKENDS, default=config.BACKEND)
+    parser.add_argument('--imgsz', type=int, default=config.IMGSZ)
+    parser.add_argument('--batch-size', type=int, default=config.BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=4, help="Image decoding threads")
+    parser.add_argument('--min-conf', type=float, default=0.001,
+                        help="Inference confidence threshold for the PR curve")
+    parser.add_argument('--json', help="Also write the report rows to this JSON file")
+    args = parser.parse_args()
+
+    label_dir = args.labels or default_label_dir(args.images)
+    image_paths = sorted(os.path.join(args.images, name) for name in os.listdir(args.images)
+                         if name.lower().endswith(config.IMAGE_EXTENSIONS))
+    if not image_paths:
+        print(f"No images found in {args.images}")
+        sys.exit(1)
+
+    from detect_targets import TargetDetector
+    rows = []
+    for model_path in args.models:
+        detector = TargetDetector(model_path, args.min_conf, config.IOU_THRESHOLD,
+                                  args.batch_size, args.backend, args.imgsz, config.INPUT_SIZE)
+        # Warm up so one-time runtime setup is not counted in the throughput
+        detector.warmup()
+        row = {'model': os.path.basename(model_path), 'backend': args.backend}
+        row.update(evaluate(detector, image_paths, label_dir, config.CONF_THRESHOLD,
+                            max(1, args.workers)))
+        rows.append(row)
+
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
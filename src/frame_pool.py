@@ -0,0 +1,158 @@
+import collections
+import threading
+import numpy as np
+from typing import Optional, Tuple
+
+
+class FrameBuffer:
+    """
+    Handle to one preallocated frame. Exactly one stage owns a handle at a
+    time; whoever holds it last (normally the GUI after displaying it) must
+    call release() so capture can reuse the memory.
+    """
+
+    __slots__ = ('pool', 'array', 'in_use')
+
+    def __init__(self, pool: 'FramePool'):
+        self.pool = pool
+        self.array = None
+        self.in_use = False
+
+    def release(self):
+        self.pool.release(self)
+
+
+class FramePool:
+    """
+    Small ring of reusable frame buffers shared between capture, detect, draw
+    and emit. Buffers are only (re)allocated when the requested frame shape
+    changes, e.g. after the capture window is resized.
+    """
+
+    def __init__(self, capacity: int = 3):
+        """
+        Args:
+            capacity: Number of frames that can be in flight at once
+        """
+        self.capacity = max(1, int(capacity))
+        self._free = [FrameBuffer(self) for _ in range(self.capacity)]
+        self._cond = threading.Condition()
+        self.allocations = 0
+        self.acquired = 0
+        self.exhausted = 0
+
+    def acquire(self, shape: Tuple[int, ...], timeout: Optional[float] = None) -> Optional[FrameBuffer]:
+        """
+        Take a free buffer of the given shape
+        Args:
+            shape: Frame shape, e.g. (height, width, 3)
+            timeout: Seconds to wait for a buffer to be released (None waits forever)
+        Returns:
+            FrameBuffer owned by the caller, or None if every buffer stayed in use
+        """
+        shape = tuple(shape)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free, timeout):
+                self.exhausted += 1
+                return None
+            buffer = self._free.pop()
+            buffer.in_use = True
+            self.acquired += 1
+            if buffer.array is None or buffer.array.shape != shape:
+                buffer.array = np.empty(shape, dtype=np.uint8)
+                self.allocations += 1
+        return buffer
+
+    def release(self, buffer: FrameBuffer):
+        """Return a buffer to the pool; releasing twice is an ownership bug"""
+        with self._cond:
+            if not buffer.in_use:
+                raise RuntimeError("Frame buffer released twice")
+            buffer.in_use = False
+            self._free.append(buffer)
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'in_use': self.capacity - len(self._free),
+                'acquired': self.acquired,
+                'allocations': self.allocations,
+                'exhausted': self.exhausted,
+            }
+
+
+class LatestFrameQueue:
+    """
+    Bounded hand-off of FrameBuffers from a producer thread to a slower
+    consumer (the GUI). When the queue is full the oldest frame is dropped and
+    released, so the newest frame always gets through and neither memory nor
+    display latency grows when the consumer falls behind.
+
+    put() returns True only when the consumer has to be woken up, so at most
+    one notification is outstanding; the consumer answers it with
+    take_latest(), which re-arms the notification.
+    """
+
+    def __init__(self, capacity: int = 1):
+        """
+        Args:
+            capacity: Frames waiting for the consumer before the oldest is dropped
+        """
+        self.capacity = max(1, int(capacity))
+        self._frames = collections.deque()
+        self._lock = threading.Lock()
+        self._notified = False
+        self.delivered = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, handle: FrameBuffer) -> bool:
+        """
+        Queue a frame; ownership passes to the queue
+        Returns:
+            True if the consumer must be notified of it
+        """
+        with self._lock:
+            if len(self._frames) == self.capacity:
+                self._frames.popleft().release()
+                self.dropped += 1
+            self._frames.append(handle)
+            self.max_depth = max(self.max_depth, len(self._frames))
+            notify = not self._notified
+            self._notified = True
+        return notify
+
+    def take_latest(self) -> Optional[FrameBuffer]:
+        """
+        Newest queued frame, owned by the caller, or None if the queue is
+        empty. Older frames are dropped and the next put() notifies again,
+        so each notification is answered with one frame.
+        """
+        with self._lock:
+            self._notified = False
+            if not self._frames:
+                return None
+            while len(self._frames) > 1:
+                self._frames.popleft().release()
+                self.dropped += 1
+            self.delivered += 1
+            return self._frames.popleft()
+
+    def clear(self):
+        """Release every queued frame"""
+        with self._lock:
+            while self._frames:
+                self._frames.popleft().release()
+            self._notified = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'depth': len(self._frames),
+                'max_depth': self.max_depth,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+            }
@@ -0,0 +1,282 @@
+import multiprocessing as mp
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+
+
+def load_worker_detector(threads: int):
+    """Default worker detector: the config.py settings with a share of the cores"""
+    from detect_targets import TargetDetector
+    import tiling
+    detector = TargetDetector(config.MODEL_PATH, config.CONF_THRESHOLD, config.IOU_THRESHOLD,
+                              config.BATCH_SIZE, config.BACKEND, config.IMGSZ, config.INPUT_SIZE,
+                              threads=threads)
+    return tiling.from_config(config, detector)
+
+
+def _worker(worker_id: int, shm_name: str, shape: Tuple[int, ...], slots: int,
+            loader: Callable, threads: int, tasks, results):
+    """
+    Worker process: detect on frames in shared-memory slots, up to
+    max_batch_size queued frames at a time, and send back their detections
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((slots,) + shape, dtype=np.uint8, buffer=shm.buf)
+    try:
+        try:
+            detector = loader(threads)
+        except Exception as e:
+            results.put(('failed', worker_id, str(e)))
+            return
+        results.put(('ready', worker_id, None))
+
+        stopping = False
+        while not stopping:
+            task = tasks.get()
+            if task is None:
+                break
+            batch = [task]
+            while len(batch) < detector.max_batch_size:
+                try:
+                    task = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if task is None:
+                    stopping = True
+                    break
+                batch.append(task)
+
+            detections = detector.detect_batch([frames[slot] for _, slot in batch])
+            for (seq, slot), result in zip(batch, detections):
+                results.put((seq, slot, worker_id, result))
+    finally:
+        del frames
+        shm.close()
+
+
+class InferencePool:
+    """
+    N worker processes, each with its own detector, fed through a ring of
+    shared-memory frame slots: the producer writes a frame into a free slot
+    and only the (sequence, slot) pair is queued, so frames are never pickled.
+    Results come back out of order and are reassembled by sequence number;
+    the number of slots bounds both the frames in flight and the reorder window.
+    """
+
+    def __init__(self, frame_shape: Tuple[int, ...], workers: int = 2,
+                 slots: Optional[int] = None, loader: Callable = load_worker_detector,
+                 threads: Optional[int] = None):
+        """
+        Args:
+            frame_shape: Shape of every frame, e.g. (height, width, 3)
+            workers: Number of worker processes
+            slots: Shared-memory frames in flight (default 2 * workers * BATCH_SIZE)
+            loader: Picklable loader(threads) -> detector run in each worker
+            threads: CPU threads per worker (default: the cores split evenly)
+        """
+        self.frame_shape = tuple(frame_shape)
+        self.workers = max(1, int(workers))
+        self.slots = max(1, int(slots or 2 * self.workers * config.BATCH_SIZE))
+        threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+
+        frame_bytes = int(np.prod(self.frame_shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * frame_bytes)
+        self.frames = np.ndarray((self.slots,) + self.frame_shape, dtype=np.uint8, buffer=self._shm.buf)
+
+        context = mp.get_context('spawn')
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(target=_worker, daemon=True,
+                            args=(i, self._shm.name, self.frame_shape, self.slots,
+                                  loader, threads, self._tasks, self._results))
+            for i in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        self.free = list(range(self.slots))
+        self._in_flight = {}   # sequence -> slot
+        self._done = {}        # sequence -> detections, waiting for earlier frames
+        self.submitted = 0
+        self.emitted = 0
+        self.max_reorder = 0
+        self.worker_frames = [0] * self.workers
+        self._wait_ready()
+
+    def _wait_ready(self):
+        ready = 0
+        while ready < self.workers:
+            kind, worker_id, error = self._get()
+            if kind == 'failed':
+                self.close()
+                raise RuntimeError(f"Inference worker {worker_id} failed to load: {error}")
+            ready += 1
+
+    def _get(self):
+        """Next message from the workers, failing if one of them died"""
+        while True:
+            try:
+                return self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.exitcode for p in self._processes if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Inference worker exited with code {dead[0]}")
+
+    def acquire(self) -> Optional[int]:
+        """A free slot to write the next frame into, or None if the window is full"""
+        return self.free.pop() if self.free else None
+
+    def submit(self, slot: int):
+        """Queue the frame written into slot as the next frame in sequence"""
+        self._in_flight[self.submitted] = slot
+        self._tasks.put((self.submitted, slot))
+        self.submitted += 1
+
+    def pending(self) -> int:
+        return self.submitted - self.emitted
+
+    def next_result(self) -> Tuple[int, int, object]:
+        """
+        Block until the oldest frame in flight is detected
+        Returns:
+            (sequence, slot, detections); the caller releases the slot once
+            it is done with self.frames[slot]
+        """
+        while self.emitted not in self._done:
+            seq, slot, worker_id, detections = self._get()
+            self._done[seq] = detections
+            self.worker_frames[worker_id] += 1
+            self.max_reorder = max(self.max_reorder, len(self._done))
+        seq = self.emitted
+        self.emitted += 1
+        return seq, self._in_flight.pop(seq), self._done.pop(seq)
+
+    def release(self, slot: int):
+        self.free.append(slot)
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'slots': self.slots,
+            'frames': self.emitted,
+            'max_reorder': self.max_reorder,
+            'worker_frames': list(self.worker_frames),
+        }
+
+    def close(self):
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A caller still holds a frame view; the mapping goes away with it
+            pass
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def process_video(video_path: str, detector, workers: int, headless: bool = False,
+                  slots: Optional[int] = None, loader: Callable = load_worker_detector,
+                  sink: Optional[Callable] = None) -> Optional[dict]:
+    """
+    Run detection on every frame of one video across an InferencePool.
+    Frames are decoded straight into shared-memory slots and drawn/shown in order.
+    Args:
+        video_path: Path to the video file
+        detector: Detector used for drawing boxes
+        workers: Number of worker processes
+        headless: Skip cv2.imshow/waitKey and process as fast as possible
+        slots: Frames in flight, which bounds the reorder window
+        loader: Picklable loader(threads) -> detector run in each worker
+        sink: Optional callback sink(frame_index, frame_with_boxes, detections),
+              called in frame order. The display is then not throttled to
+              playback speed
+    Returns:
+        Dict with frames processed, elapsed seconds, fps and pool statistics,
+        or None if the video could not be opened
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video file {video_path}")
+        return None
+    ret, first = cap.read()
+    if not ret:
+        cap.release()
+        return None
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_delay = 1 if sink is not None else (int(1000/fps) if fps > 0 else 30)
+    pool = InferencePool(first.shape, workers, slots, loader)
+    start_time = time.perf_counter()
+    stopped = False
+    frame_count = 0
+    try:
+        slot = pool.acquire()
+        pool.frames[slot] = first
+        pool.submit(slot)
+        eof = False
+        while not stopped:
+            # Keep every free slot decoding, then emit the next frame in order
+            while not eof and pool.free:
+                slot = pool.acquire()
+                view = pool.frames[slot]
+                ret, frame = cap.read(view)
+                if not ret:
+                    pool.release(slot)
+                    eof = True
+                    break
+                if frame is not view:
+                    if frame.shape != view.shape:
+                        print(f"Frame size changed to {frame.shape[1]}x{frame.shape[0]}, stopping")
+                        pool.release(slot)
+                        eof = True
+                        break
+                    view[...] = frame
+                pool.submit(slot)
+            if pool.pending() == 0:
+                break
+
+            seq, slot, detections = pool.next_result()
+            frame_with_boxes = detector.draw_boxes(pool.frames[slot], detections, in_place=True)
+            if sink is not None:
+                sink(seq, frame_with_boxes, detections)
+            frame_count += 1
+            if not headless:
+                cv2.imshow('Detection', frame_with_boxes)
+                if cv2.waitKey(frame_delay) & 0xFF == ord('q'):
+                    stopped = True
+            pool.release(slot)
+    finally:
+        cap.release()
+        pool.close()
+        if not headless:
+            cv2.destroyAllWindows()
+
+    elapsed = time.perf_counter() - start_time
+    stats = {
+        'frames': frame_count,
+        'elapsed': elapsed,
+        'fps': frame_count / elapsed if elapsed > 0 else 0.0,
+        'pool': pool.stats(),
+    }
+    print(f"Processed {frame_count} frames in {elapsed:.1f}s ({stats['fps']:.1f} FPS) "
+          f"on {pool.workers} workers, reorder window peaked at {pool.max_reorder}/{pool.slots}")
+    return stats
@@ -0,0 +1,183 @@
+import collections
+import time
+import numpy as np
+from typing import Callable, List, Optional, Tuple
+from detections import Detections
+
+
+class BudgetedDetector:
+    """
+    Keeps detection within a per-frame latency budget by moving along a
+    ladder of operating points, from best quality to cheapest:
+    every input size on the primary model, then on each fallback model, then
+    detecting only every 2nd, 3rd, ... frame on the cheapest one (skipped
+    frames reuse the previous detections).
+
+    The measured cost is the time spent in detect_batch per frame, so skipped
+    frames count as (nearly) free. Hysteresis: a point is only judged after
+    `window` frames at it, it steps down when the median cost exceeds the
+    target by more than `tolerance`, and steps back up only when the median
+    is below `upgrade_fraction` of the target and the better point was not
+    already measured to be over budget recently.
+
+    Wraps a detector and exposes detect/detect_batch like it (everything
+    else is delegated to the active detector).
+    """
+
+    def __init__(self, detector, target_ms: float, input_sizes: List[Tuple[int, int]],
+                 max_stride: int = 3, models: Optional[List[str]] = None,
+                 loader: Optional[Callable] = None, window: int = 30,
+                 tolerance: float = 0.15, upgrade_fraction: float = 0.6):
+        """
+        Args:
+            detector: Detector for the primary model
+            target_ms: Per-frame detection budget in milliseconds
+            input_sizes: Fixed (width, height) input sizes, largest first
+            max_stride: Largest frame stride used once everything else is exhausted
+            models: Fallback model paths, most accurate first
+            loader: loader(model_path) -> detector, required when models is given
+            window: Frames measured at an operating point before it is judged
+            tolerance: Allowed overshoot of the target before stepping down
+            upgrade_fraction: Step up only when the cost is below this fraction of the target
+        """
+        self.detectors = {None: detector}
+        self.loader = loader
+        self.target_ms = target_ms
+        self.window = max(1, int(window))
+        self.tolerance = tolerance
+        self.upgrade_fraction = upgrade_fraction
+
+        keys = [None] + list(models or [])
+        sizes = [tuple(size) for size in input_sizes]
+        self.points = [(key, size, 1) for key in keys for size in sizes]
+        self.points += [(keys[-1], sizes[-1], stride) for stride in range(2, max(1, max_stride) + 1)]
+
+        self.samples = collections.deque(maxlen=self.window)
+        # Point index -> (median cost, frame count when measured)
+        self.costs = {}
+        self.frames = 0
+        self.detected_frames = 0
+        self.switches = 0
+        self._since_change = 0
+        self._previous = None
+        self._previous_shape = None
+        self._apply(0)
+
+    def __getattr__(self, name):
+        if name in ('detector', 'detectors'):
+            raise AttributeError(name)
+        return getattr(self.detector, name)
+
+    def _apply(self, index: int):
+        key, size, stride = self.points[index]
+        if key not in self.detectors:
+            self.detectors[key] = self.loader(key)
+        self.detector = self.detectors[key]
+        self.detector.set_input_size(size)
+        self.stride = stride
+        self.index = index
+        self.samples.clear()
+        self._since_change = 0
+
+    def operating_point(self) -> dict:
+        key, (width, height), stride = self.points[self.index]
+        return {'model': key or 'primary', 'input_size': [width, height], 'stride': stride}
+
+    def _move(self, index: int, cost: float):
+        self._apply(index)
+        self.switches += 1
+        point = self.operating_point()
+        print(f"Latency budget: {cost:.1f} ms/frame vs {self.target_ms:.1f} ms target, "
+              f"switching to {point['model']} at {point['input_size'][0]}x{point['input_size'][1]}, "
+              f"stride {point['stride']}")
+
+    def _update(self):
+        if self._since_change < self.window:
+            return
+        cost = float(np.median(self.samples))
+        self.costs[self.index] = (cost, self.frames)
+        self._since_change = 0
+
+        if cost > self.target_ms * (1 + self.tolerance) and self.index < len(self.points) - 1:
+            self._move(self.index + 1, cost)
+        elif self.index > 0 and cost < self.target_ms * self.upgrade_fraction:
+            # Don't retry a better point that was over budget, unless that was long ago
+            known = self.costs.get(self.index - 1)
+            if known is None or known[0] <= self.target_ms or self.frames - known[1] > 10 * self.window:
+                self._move(self.index - 1, cost)
+
+    def detect(self, image: np.ndarray, timing=None) -> Detections:
+        if image is None or image.size == 0:
+            return Detections.empty()
+        return self.detect_batch([image], timing)[0]
+
+    def detect_batch(self, frames: List[np.ndarray], timing=None) -> List[Detections]:
+        """
+        Budgeted equivalent of detector.detect_batch(frames). With a stride
+        above 1, frames in between reuse the last detections, as long as the
+        frame shape is unchanged (e.g. not a ChangeGate region crop).
+        """
+        start = time.perf_counter()
+        decisions = []
+        inputs = []
+        shape = self._previous_shape
+        for frame in frames:
+            if frame is None or frame.size == 0:
+                decisions.append(None)
+                continue
+            self.frames += 1
+            reuse = (self.stride > 1 and self.frames % self.stride != 0
+                     and self._previous is not None and frame.shape == shape)
+            decisions.append(-1 if reuse else len(inputs))
+            if not reuse:
+                inputs.append(frame)
+            shape = frame.shape
+
+        results = self.detector.detect_batch(inputs, timing) if inputs else []
+        self.detected_frames += len(inputs)
+
+        outputs = []
+        for decision in decisions:
+            if decision is None:
+                outputs.append(Detections.empty())
+                continue
+            if decision >= 0:
+                self._previous = results[decision]
+            outputs.append(self._previous)
+        self._previous_shape = shape
+
+        valid = sum(decision is not None for decision in decisions)
+        if valid:
+            per_frame = (time.perf_counter() - start) * 1000 / valid
+            self.samples.extend([per_frame] * valid)
+            self._since_change += valid
+            self._update()
+        return outputs
+
+    def stats(self) -> dict:
+        """Chosen operating point, recent cost and how often the controller switched"""
+        return {
+            'target_ms': self.target_ms,
+            'operating_point': self.operating_point(),
+            'median_ms': float(np.median(self.samples)) if self.samples else None,
+            'frames': self.frames,
+            'detected_frames': self.detected_frames,
+            'switches': self.switches,
+        }
+
+
+def from_config(config, detector, loader: Optional[Callable] = None):
+    """
+    detector wrapped in a BudgetedDetector configured from config.py, or
+    detector itself if LATENCY_BUDGET_MS is None
+    Args:
+        config: config module
+        detector: Detector for config.MODEL_PATH
+        loader: loader(model_path) -> detector for BUDGET_MODELS
+    """
+    if config.LATENCY_BUDGET_MS is None:
+        return detector
+    # Detect-every-N tracking already strides over frames
+    max_stride = config.BUDGET_MAX_STRIDE if config.DETECT_EVERY_N <= 1 else 1
+    return BudgetedDetector(detector, config.LATENCY_BUDGET_MS, config.BUDGET_INPUT_SIZES,
+                            max_stride, config.BUDGET_MODELS, loader, config.BUDGET_WINDOW)
@@ -1,54 +1,219 @@
+import os
+import time
 import cv2
-from detect_targets import TargetDetector, process_image
+from detect_targets import TargetDetector, process_images
+from video_pipeline import VideoPipeline
+from stage_timer import StageTimer
+import autotune
+import cascade
+import change_gate
+import detection_cache
+import inference_pool
+import latency_budget
+import tiling
+import tracker
+import video_export
 import config
 
-def process_video(video_path, detector):
+def collect_image_paths(image_path):
+    """Return image_path itself, or the sorted images inside it if it is a directory"""
+    if os.path.isdir(image_path):
+        return sorted(os.path.join(image_path, name) for name in os.listdir(image_path)
+                      if name.lower().endswith(config.IMAGE_EXTENSIONS))
+    return [image_path]
+
+def process_video(video_path, detector, pipelined=False, headless=False, timer=None,
+                  gate=None, keyframe_tracker=None, sink=None):
+    """
+    Run detection on every frame of a video
+    Args:
+        video_path: Path to the video file
+        detector: TargetDetector instance
+        pipelined: Overlap decoding, inference and rendering on separate threads
+        headless: Skip cv2.imshow/waitKey and process as fast as possible
+        timer: Optional StageTimer; one is created from config if not given
+        gate: Optional ChangeGate that skips inference on unchanged frames
+        keyframe_tracker: Optional KeyframeTracker that runs the detector only on
+                          keyframes; takes precedence over gate
+        sink: Optional callback sink(frame_index, frame_with_boxes, detections),
+              e.g. VideoExporter.write, called for every frame in order. The
+              display is then not throttled to playback speed
+    Returns:
+        Dict with frames processed, elapsed seconds, fps, per-stage timing
+        percentiles and gating/tracking statistics, or None if the video could
+        not be opened
+    """
+    if timer is None:
+        timer = StageTimer(config.TIMING_WINDOW, config.TIMING_DUMP_PATH,
+                           config.TIMING_DUMP_INTERVAL)
+
+    if pipelined:
+        stats = VideoPipeline(detector, config.PIPELINE_QUEUE_SIZE, headless,
+                              timer=timer, gate=gate,
+                              keyframe_tracker=keyframe_tracker).run(video_path, sink)
+        if stats is not None:
+            print(f"Processed {stats['frames']} frames in {stats['elapsed']:.1f}s ({stats['fps']:.1f} FPS)")
+        return stats
+
     cap = cv2.VideoCapture(video_path)
     
     if not cap.isOpened():
         print(f"Error: Could not open video file {video_path}")
-        return
+        return None
 
     # Add FPS calculation
     fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_delay = int(1000/fps) if fps > 0 else 30
+    frame_delay = 1 if sink is not None else (int(1000/fps) if fps > 0 else 30)
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
+    # Frames are accumulated and sent to the detector in batches
+    batch_size = detector.max_batch_size
+    runner = keyframe_tracker if keyframe_tracker is not None else gate
+    stopped = False
+    frame_count = 0
+    start_time = time.perf_counter()
+    while not stopped:
+        timing = timer.begin()
+        frames = []
+        while len(frames) < batch_size:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            # Optional: Resize frame for faster processing
+            # frame = cv2.resize(frame, (640, 480))
+            frames.append(frame)
+
+        if not frames:
             break
+        timing.lap('capture')
+
+        if runner is not None:
+            batch_results = runner.detect_batch(detector, frames, timing)
+        else:
+            batch_results = detector.detect_batch(frames, timing)
 
-        # Optional: Resize frame for faster processing
-        # frame = cv2.resize(frame, (640, 480))
-        
-        results = detector.detect(frame)
-        frame_with_boxes = detector.draw_boxes(frame, results)
-        
-        cv2.imshow('Detection', frame_with_boxes)
-        if cv2.waitKey(frame_delay) & 0xFF == ord('q'):
+        for frame, results in zip(frames, batch_results):
+            frame_with_boxes = detector.draw_boxes(frame, results, in_place=True)
+            timing.lap('draw')
+            if sink is not None:
+                sink(frame_count, frame_with_boxes, results)
+                timing.lap('emit')
+            frame_count += 1
+            if headless:
+                continue
+
+            cv2.imshow('Detection', frame_with_boxes)
+            key = cv2.waitKey(frame_delay)
+            timing.lap('emit')
+            if key & 0xFF == ord('q'):
+                stopped = True
+                break
+
+        timer.commit(timing, len(frames))
+
+        if len(frames) < batch_size:
             break
 
     cap.release()
-    cv2.destroyAllWindows()
+    if not headless:
+        cv2.destroyAllWindows()
+
+    elapsed = time.perf_counter() - start_time
+    stats = {
+        'frames': frame_count,
+        'elapsed': elapsed,
+        'fps': frame_count / elapsed if elapsed > 0 else 0.0,
+        'stages': timer.percentiles(),
+    }
+    if keyframe_tracker is not None:
+        stats['tracking'] = keyframe_tracker.stats()
+        print(f"Tracking: {stats['tracking']['keyframes']} keyframes, "
+              f"{stats['tracking']['unique_objects']} unique objects")
+    elif gate is not None:
+        stats['gating'] = gate.stats()
+    print(f"Processed {stats['frames']} frames in {stats['elapsed']:.1f}s ({stats['fps']:.1f} FPS)")
+    return stats
+
+def load_detector(model_path, cache=None):
+    """
+    TargetDetector for model_path with the settings from config.py, answering
+    repeated frames from cache if given and tiled if TILING is on
+    """
+    detector = TargetDetector(model_path, config.CONF_THRESHOLD, config.IOU_THRESHOLD,
+                              input_size=config.INPUT_SIZE, **autotune.detector_settings(config))
+    if cache is not None:
+        detector = detection_cache.CachedDetector(detector, cache)
+    # Optionally split high-resolution frames into tiles
+    return tiling.from_config(config, detector)
 
 def main():
-    detector = TargetDetector(config.MODEL_PATH, config.CONF_THRESHOLD, config.IOU_THRESHOLD)
+    cache = detection_cache.from_config(config)
+    load = lambda model_path: load_detector(model_path, cache)
+    # Optionally escalate ambiguous frames/regions to CASCADE_MODEL
+    detector = cascade.from_config(config, load(config.MODEL_PATH), load)
+    # Optionally adapt input size, model and frame stride to a latency budget
+    detector = latency_budget.from_config(config, detector, load)
 
     # 处理图片
     if config.PROCESS_IMAGE:
         print("Processing image...")
-        image_with_boxes = process_image(config.IMAGE_PATH, detector)
-        cv2.imshow('Image Detection', image_with_boxes)
-        print("Press 'q' to quit image detection and move to video detection (if enabled)...")
-        while True:
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        image_paths = collect_image_paths(config.IMAGE_PATH)
+        for image_path, image_with_boxes in zip(image_paths, process_images(image_paths, detector)):
+            if image_with_boxes is None:
+                continue
+            cv2.imshow('Image Detection', image_with_boxes)
+            print(f"{image_path}: press 'q' to continue...")
+            while True:
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
         cv2.destroyAllWindows()
 
     # 处理视频
     if config.PROCESS_VIDEO:
         print("Processing video...")
-        process_video(config.VIDEO_PATH, detector)
+        exporter = video_export.from_config(config, config.VIDEO_PATH)
+        sink = exporter.write if exporter is not None else None
+        try:
+            if config.INFERENCE_WORKERS > 1:
+                inference_pool.process_video(config.VIDEO_PATH, detector, config.INFERENCE_WORKERS,
+                                             config.HEADLESS, config.INFERENCE_POOL_SLOTS, sink=sink)
+            else:
+                process_video(config.VIDEO_PATH, detector, config.PIPELINE_VIDEO, config.HEADLESS,
+                              gate=change_gate.from_config(config),
+                              keyframe_tracker=tracker.from_config(config), sink=sink)
+        finally:
+            if exporter is not None:
+                stats = exporter.close()
+                print(f"Exported {stats['frames_written']} of {stats['frames_seen']} frames "
+                      f"({len(stats['segments'])} segments) to {stats['path']}, "
+                      f"{stats['encode_ms_per_frame']:.1f} ms/frame encoding")
+
+    if isinstance(detector, latency_budget.BudgetedDetector):
+        stats = detector.stats()
+        point = stats['operating_point']
+        print(f"Latency budget: ran {point['model']} at {point['input_size'][0]}x{point['input_size'][1]}, "
+              f"stride {point['stride']} ({stats['switches']} switches, target {stats['target_ms']} ms)")
+        detector = detector.detector
+    if isinstance(detector, cascade.CascadeDetector):
+        stats = detector.stats()
+        reasons = stats['reasons']
+        print(f"Cascade: escalated {stats['escalated_frames']} of {stats['frames']} frames "
+              f"({stats['escalation_rate']:.0%}; {reasons['ambiguous']} near-threshold, "
+              f"{reasons['crowded']} crowded), {stats['full_frame_escalations']} whole frames and "
+              f"{stats['escalated_regions']} regions, {stats['accurate_pixel_fraction']:.0%} of pixels "
+              f"through the accurate model")
+        detector = detector.fast
+    if isinstance(detector, tiling.TiledDetector):
+        stats = detector.stats()
+        print(f"Tiling: {stats['tiles_run']} tiles run over {stats['tiled_frames']} tiled frames, "
+              f"{stats['tiles_skipped']} skipped by the coarse pass")
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Detection cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries, "
+              f"{stats['bytes'] / 1e6:.1f} MB")
+        cache.close()
 
     print("Detection completed.")
 
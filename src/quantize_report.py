@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import random
+import time
+from typing import Optional
+import cv2
+import numpy as np
+
+import config
+from backends import QUANTIZED_BACKENDS, export_model
+from detect_targets import TargetDetector
+from detections import match_detections
+
+
+def list_images(image_dir: str):
+    return sorted(os.path.join(image_dir, name) for name in os.listdir(image_dir)
+                  if name.lower().endswith(config.IMAGE_EXTENSIONS))
+
+
+def split_images(paths, calibration_fraction: float, seed: int = 0):
+    """
+    Split image paths into a calibration set and a held-out evaluation set,
+    so agreement is never measured on the images the INT8 model was calibrated on
+    Args:
+        paths: Image paths
+        calibration_fraction: Share of the images used for calibration
+        seed: Seed of the shuffle, fixed so repeated runs reuse the cached model
+    Returns:
+        (calibration paths, evaluation paths), both sorted
+    """
+    shuffled = sorted(paths)
+    random.Random(seed).shuffle(shuffled)
+    count = int(round(len(shuffled) * calibration_fraction))
+    count = min(max(count, 1), len(shuffled) - 1)
+    if count < 1:
+        raise RuntimeError("Need at least two images to hold out an evaluation split")
+    return sorted(shuffled[:count]), sorted(shuffled[count:])
+
+
+def load_images(paths):
+    images = [cv2.imread(path) for path in paths]
+    return [image for image in images if image is not None]
+
+
+def measure(detector: TargetDetector, images, repeats: int):
+    """
+    Time single-image detect calls over all images
+    Returns:
+        Latencies in milliseconds and the detections of the last repeat
+    """
+    # Warm up so one-time runtime setup is not counted
+    detector.detect(images[0])
+
+    latencies = []
+    detections = []
+    for _ in range(repeats):
+        detections = []
+        for image in images:
+            start = time.perf_counter()
+            detections.append(detector.detect(image))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return np.asarray(latencies), detections
+
+
+def agreement(reference, candidate, iou_threshold: float = 0.5) -> dict:
+    """
+    Compare two lists of per-image detections
+    Returns:
+        Precision and recall of candidate against reference, F1, and the mean
+        IoU of matched boxes
+    """
+    matched = total_ref = total_cand = 0
+    ious = []
+    for ref, cand in zip(reference, candidate):
+        matches = match_detections(ref, cand, iou_threshold)
+        matched += len(matches)
+        total_ref += len(ref)
+        total_cand += len(cand)
+        ious.extend(matches[:, 2].tolist())
+
+    precision = matched / total_cand if total_cand else 1.0
+    recall = matched / total_ref if total_ref else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'mean_iou': float(np.mean(ious)) if ious else 0.0,
+    }
+
+
+def report(model_paths, backends, image_dir: str, repeats: int, imgsz: int,
+           conf: float, iou: float, calibration_dir: Optional[str] = None,
+           calibration_fraction: float = 0.5) -> list:
+    """
+    Build INT8 models and compare them against the FP32 ONNX model
+    Args:
+        image_dir: Evaluation images. Without calibration_dir it is split, and
+                   only the held-out part is used for evaluation
+        calibration_dir: Separate directory of calibration images
+        calibration_fraction: Share of image_dir used for calibration when it is split
+    Returns:
+        One row per (model, backend) with latency and agreement numbers
+    """
+    paths = list_images(image_dir)
+    if calibration_dir is not None:
+        calibration_paths, eval_paths = list_images(calibration_dir), paths
+        if not calibration_paths:
+            raise RuntimeError(f"No images found in {calibration_dir}")
+    elif not paths:
+        raise RuntimeError(f"No images found in {image_dir}")
+    else:
+        calibration_paths, eval_paths = split_images(paths, calibration_fraction)
+    images = load_images(eval_paths)
+    if not images:
+        raise RuntimeError(f"No readable evaluation images in {image_dir}")
+    print(f"Calibrating on {len(calibration_paths)} images, evaluating on {len(images)} held-out images")
+
+    rows = []
+    for model_path in model_paths:
+        # Build the quantized models first, calibrating static ones on the calibration split
+        for backend in backends:
+            if backend in QUANTIZED_BACKENDS:
+                export_model(model_path, backend, imgsz, calibration_paths)
+
+        reference = None
+        reference_latency = None
+        for backend in ['onnx'] + [b for b in backends if b != 'onnx']:
+            detector = TargetDetector(model_path, conf, iou, 1, backend, imgsz,
+                                      calibration_path=calibration_paths)
+            latencies, detections = measure(detector, images, repeats)
+            if reference is None:
+                reference, reference_latency = detections, float(np.mean(latencies))
+
+            row = {
+                'model': os.path.basename(model_path),
+                'backend': backend,
+                'size_mb': _artifact_size(model_path, backend, imgsz, calibration_paths) / 1e6,
+                'mean_ms': float(np.mean(latencies)),
+                'p50_ms': float(np.percentile(latencies, 50)),
+                'p95_ms': float(np.percentile(latencies, 95)),
+                'speedup': reference_latency / float(np.mean(latencies)),
+            }
+            row.update(agreement(reference, detections))
+            rows.append(row)
+    return rows
+
+
+def _artifact_size(model_path: str, backend: str, imgsz: int, calibration_paths) -> int:
+    path = export_model(model_path, backend, imgsz, calibration_paths)
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def print_report(rows):
+    header = (f"{'model':<28} {'backend':<18} {'MB':>6} {'mean ms':>8} {'p50 ms':>8} "
+              f"{'p95 ms':>8} {'speedup':>7} {'prec':>5} {'recall':>6} {'F1':>5} {'mIoU':>5}")
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        print(f"{r['model']:<28} {r['backend']:<18} {r['size_mb']:>6.1f} {r['mean_ms']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['speedup']:>6.2f}x "
+              f"{r['precision']:>5.2f} {r['recall']:>6.2f} {r['f1']:>5.2f} {r['mean_iou']:>5.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build INT8 quantized models and report latency and detection "
+                    "agreement against the FP32 ONNX model")
+    parser.add_argument('--models', nargs='+', default=config.AVAILABLE_MODELS)
+    parser.add_argument('--backends', nargs='+', choices=['onnx'] + list(QUANTIZED_BACKENDS),
+                        default=list(QUANTIZED_BACKENDS))
+    parser.add_argument('--images', default='data/ForTest/Pic',
+                        help="Evaluation images; split into calibration and held-out "
+                             "evaluation images unless --calibration-images is given")
+    parser.add_argument('--calibration-images',
+                        help="Separate directory of calibration images")
+    parser.add_argument('--calibration-fraction', type=float, default=0.5,
+                        help="Share of --images used for calibration when it is split")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--imgsz', type=int, default=config.IMGSZ)
+    parser.add_argument('--json', help="Also write the report rows to this JSON file")
+    args = parser.parse_args()
+
+    rows = report(args.models, args.backends, args.images, args.repeats, args.imgsz,
+                  config.CONF_THRESHOLD, config.IOU_THRESHOLD, args.calibration_images,
+                  args.calibration_fraction)
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,385 @@
+import ctypes
+import ctypes.util
+import os
+import sys
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+
+class _OwnBuffer:
+    """Mixin for a backend's reused BGR buffer, used when the caller passes none"""
+
+    buffer = None
+
+    def _destination(self, out: Optional[np.ndarray], size: Tuple[int, int]) -> np.ndarray:
+        """out if it fits the captured (height, width), else the backend's own buffer"""
+        shape = size + (3,)
+        if out is not None and out.shape == shape:
+            return out
+        if self.buffer is None or self.buffer.shape != shape:
+            self.buffer = np.empty(shape, dtype=np.uint8)
+        return self.buffer
+
+
+class PyAutoGuiCapture(_OwnBuffer):
+    """Fallback capture through pyautogui/PIL. Converts into a reused BGR buffer."""
+
+    name = 'pyautogui'
+
+    def __init__(self):
+        import pyautogui
+        self.pyautogui = pyautogui
+
+    def grab(self, x: int, y: int, width: int, height: int,
+             out: Optional[np.ndarray] = None) -> np.ndarray:
+        screenshot = self.pyautogui.screenshot(region=(x, y, width, height))
+        rgb = np.asarray(screenshot)
+        dst = self._destination(out, rgb.shape[:2])
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=dst)
+
+    def close(self):
+        pass
+
+
+class MssCapture(_OwnBuffer):
+    """Capture with mss; its BGRA pixels are converted into a reused BGR buffer"""
+
+    name = 'mss'
+
+    def __init__(self):
+        import mss
+        self.sct = mss.mss()
+
+    def grab(self, x: int, y: int, width: int, height: int,
+             out: Optional[np.ndarray] = None) -> np.ndarray:
+        shot = self.sct.grab({'left': x, 'top': y, 'width': width, 'height': height})
+        # View over mss' pixel bytes, no copy
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        dst = self._destination(out, bgra.shape[:2])
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=dst)
+
+    def close(self):
+        self.sct.close()
+
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; only these are accessed
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('resourceid', ctypes.c_ulong),
+        ('serial', ctypes.c_ulong),
+        ('error_code', ctypes.c_ubyte),
+        ('request_code', ctypes.c_ubyte),
+        ('minor_code', ctypes.c_ubyte),
+    ]
+
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+# Error code of the last X protocol error, reset by X11ShmCapture before each
+# request it checks. Xlib's default handler exit()s the process instead.
+_x_errors = []
+
+
+@_XErrorHandler
+def _record_x_error(display, event):
+    _x_errors.append(event.contents.error_code)
+    return 0
+
+
+def clip_region(x: int, y: int, width: int, height: int,
+                screen_width: int, screen_height: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Part of a region that lies on the screen
+    Returns:
+        (x, y, width, height) of the visible part, or None if none of it is
+    """
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + width, screen_width), min(y + height, screen_height)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2 - x1, y2 - y1
+
+
+_Z_PIXMAP = 2
+_ALL_PLANES = ctypes.c_ulong(-1).value
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+
+
+class X11ShmCapture(_OwnBuffer):
+    """
+    Capture through the X11 MIT-SHM extension. The X server writes the region
+    straight into a shared-memory segment that is mapped once as a NumPy view
+    and converted into a reused BGR buffer; nothing is allocated per frame.
+    Works under Xvfb. X errors are caught by a non-fatal handler and raised
+    as RuntimeError; the parts of a region outside the screen come out black.
+    """
+
+    name = 'x11shm'
+
+    def __init__(self):
+        if not sys.platform.startswith('linux') or not os.environ.get('DISPLAY'):
+            raise RuntimeError("X11 shared-memory capture needs Linux with DISPLAY set")
+        self.xlib = self._load('X11')
+        self.xext = self._load('Xext')
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._declare()
+
+        # Errors like BadMatch/BadAccess would otherwise exit() the process
+        self.xlib.XSetErrorHandler(_record_x_error)
+        self.display = self.xlib.XOpenDisplay(None)
+        if not self.display:
+            raise RuntimeError("Cannot open X display")
+        if not self.xext.XShmQueryExtension(self.display):
+            self.xlib.XCloseDisplay(self.display)
+            raise RuntimeError("X server does not support MIT-SHM")
+
+        screen = self.xlib.XDefaultScreen(self.display)
+        self.root = self.xlib.XRootWindow(self.display, screen)
+        self.visual = self.xlib.XDefaultVisual(self.display, screen)
+        self.depth = self.xlib.XDefaultDepth(self.display, screen)
+        self.screen_size = (self.xlib.XDisplayWidth(self.display, screen),
+                            self.xlib.XDisplayHeight(self.display, screen))
+        self.image = None
+        self.shminfo = None
+        self.size = None
+        self.view = None
+
+    @staticmethod
+    def _load(name: str):
+        path = ctypes.util.find_library(name)
+        if path is None:
+            raise RuntimeError(f"lib{name} not found")
+        return ctypes.CDLL(path)
+
+    def _declare(self):
+        x, ext, libc = self.xlib, self.xext, self.libc
+        x.XOpenDisplay.restype = ctypes.c_void_p
+        x.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x.XRootWindow.restype = ctypes.c_ulong
+        x.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x.XDefaultVisual.restype = ctypes.c_void_p
+        x.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x.XFree.argtypes = [ctypes.c_void_p]
+        x.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x.XSetErrorHandler.restype = ctypes.c_void_p
+        x.XSetErrorHandler.argtypes = [_XErrorHandler]
+
+        ext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        ext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        ext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint,
+                                        ctypes.c_int, ctypes.c_char_p,
+                                        ctypes.POINTER(_XShmSegmentInfo),
+                                        ctypes.c_uint, ctypes.c_uint]
+        ext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        ext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        ext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                                     ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+
+        libc.shmget.restype = ctypes.c_int
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    def _allocate(self, width: int, height: int):
+        """(Re)create the shared image for a new region size"""
+        self._release()
+        shminfo = _XShmSegmentInfo()
+        image = self.xext.XShmCreateImage(self.display, self.visual, self.depth, _Z_PIXMAP,
+                                          None, ctypes.byref(shminfo), width, height)
+        if not image:
+            raise RuntimeError("XShmCreateImage failed")
+        if image.contents.bits_per_pixel != 32:
+            self.xlib.XFree(image)
+            raise RuntimeError("X11 shared-memory capture needs a 32 bpp visual")
+
+        stride = image.contents.bytes_per_line
+        size = stride * height
+        shmid = self.libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if shmid < 0:
+            self.xlib.XFree(image)
+            raise RuntimeError(f"shmget failed: errno {ctypes.get_errno()}")
+        address = self.libc.shmat(shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            errno = ctypes.get_errno()
+            self.libc.shmctl(shmid, _IPC_RMID, None)
+            self.xlib.XFree(image)
+            raise RuntimeError(f"shmat failed: errno {errno}")
+        shminfo.shmid = shmid
+        shminfo.shmaddr = address
+        shminfo.readOnly = 0
+        image.contents.data = address
+        _x_errors.clear()
+        self.xext.XShmAttach(self.display, ctypes.byref(shminfo))
+        self.xlib.XSync(self.display, 0)
+        # The segment is freed automatically once both sides have detached
+        self.libc.shmctl(shmid, _IPC_RMID, None)
+        if _x_errors:
+            # E.g. a remote display that can't map our segment
+            self.libc.shmdt(address)
+            image.contents.data = None
+            self.xlib.XFree(image)
+            raise RuntimeError(f"XShmAttach failed: X error {_x_errors[-1]}")
+
+        raw = np.ctypeslib.as_array((ctypes.c_uint8 * size).from_address(address))
+        self.view = raw.reshape(height, stride)[:, :width * 4].reshape(height, width, 4)
+        self.image, self.shminfo, self.size = image, shminfo, (width, height)
+
+    def _release(self):
+        if self.image is None:
+            return
+        self.xext.XShmDetach(self.display, ctypes.byref(self.shminfo))
+        self.xlib.XSync(self.display, 0)
+        self.libc.shmdt(self.shminfo.shmaddr)
+        # The pixel data lives in the shm segment, so only free the struct
+        self.image.contents.data = None
+        self.xlib.XFree(self.image)
+        self.image = self.shminfo = self.size = self.view = None
+
+    def grab(self, x: int, y: int, width: int, height: int,
+             out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        visible = clip_region(x, y, width, height, *self.screen_size)
+        if visible is None:
+            return None
+        vx, vy, vw, vh = visible
+        if self.size != (vw, vh):
+            self._allocate(vw, vh)
+        _x_errors.clear()
+        if not self.xext.XShmGetImage(self.display, self.root, self.image, vx, vy, _ALL_PLANES):
+            raise RuntimeError(f"XShmGetImage failed: X error {_x_errors[-1] if _x_errors else 'unknown'}")
+        dst = self._destination(out, (height, width))
+        if (vw, vh) == (width, height):
+            return cv2.cvtColor(self.view, cv2.COLOR_BGRA2BGR, dst=dst)
+        # Partly off-screen: black outside the visible part
+        dst[...] = 0
+        dst[vy - y:vy - y + vh, vx - x:vx - x + vw] = self.view[..., :3]
+        return dst
+
+    def close(self):
+        self._release()
+        if self.display:
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+CAPTURE_BACKENDS = {
+    'x11shm': X11ShmCapture,
+    'mss': MssCapture,
+    'pyautogui': PyAutoGuiCapture,
+}
+
+
+class AutoCapture:
+    """
+    Uses the first backend of CAPTURE_BACKENDS that can be created, and moves
+    on to the next one when grabs keep failing, e.g. an X server whose MIT-SHM
+    segments can't be attached. A single failed grab is passed on to the
+    caller, which skips that frame; the current backend is only replaced once
+    the next one has been created.
+    """
+
+    def __init__(self, backends=None, max_failures: int = 3):
+        """
+        Args:
+            backends: Capture classes to try in order (default CAPTURE_BACKENDS)
+            max_failures: Consecutive failed grabs before falling back to the next backend
+        """
+        self.backends = list(backends or CAPTURE_BACKENDS.values())
+        self.max_failures = max(1, int(max_failures))
+        self.failures = 0
+        self.capture = self._open_next()
+        if self.capture is None:
+            raise RuntimeError("No screen capture backend available")
+
+    @property
+    def name(self) -> str:
+        return self.capture.name
+
+    def _open_next(self):
+        """Create the next backend that works, or None if none is left"""
+        while self.backends:
+            backend = self.backends.pop(0)
+            try:
+                return backend()
+            except Exception as e:
+                print(f"Capture backend {backend.name} unavailable: {str(e)}")
+        return None
+
+    def grab(self, x: int, y: int, width: int, height: int,
+             out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        try:
+            frame = self.capture.grab(x, y, width, height, out=out)
+        except Exception as e:
+            self.failures += 1
+            if self.failures < self.max_failures:
+                raise
+            name = self.capture.name
+            print(f"Capture backend {name} failed {self.failures} times in a row: {str(e)}")
+            self.failures = 0
+            replacement = self._open_next()
+            if replacement is None:
+                # Keep the last backend; it may recover
+                raise RuntimeError(f"Screen capture with {name} keeps failing and no other "
+                                   f"backend is available: {str(e)}") from e
+            self.capture.close()
+            self.capture = replacement
+            print(f"Screen capture backend: {self.capture.name}")
+            return self.grab(x, y, width, height, out=out)
+        self.failures = 0
+        return frame
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+
+
+def create_capture(name: str = 'auto'):
+    """
+    Create a screen capture backend. Every backend's grab(x, y, width, height, out=None)
+    returns a BGR frame written into out when it has the captured shape, or into
+    a buffer of its own that is reused on the next grab.
+    Args:
+        name: 'x11shm', 'mss', 'pyautogui', or 'auto' to use the first one that
+              works in that order, falling back to the next when grabs keep failing
+    """
+    if name != 'auto':
+        return CAPTURE_BACKENDS[name]()
+    return AutoCapture()
@@ -1,75 +1,206 @@
+import time
+# Measured before the other imports so startup times include them
+_PROCESS_START = time.perf_counter()
+
 import cv2
 import numpy as np
-import pyautogui
-from detect_targets import TargetDetector
+from stage_timer import StageTimer
+from screen_capture import create_capture
+from capture_replay import RecordingCapture
+from frame_pool import FramePool, LatestFrameQueue
+import cascade
+import change_gate
+import latency_budget
 import config
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QPushButton, QVBoxLayout
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QPoint
 import sys
-import time
-from pynput import keyboard, mouse
+
+# torch/ultralytics (via detect_targets) and pyautogui are imported on
+# background threads so the window shows up immediately; pynput and
+# pyautogui are only needed interactively, not when replaying a recording
+
+
+def startup_ms() -> float:
+    """Milliseconds since the process started importing this module"""
+    return (time.perf_counter() - _PROCESS_START) * 1000
+
+
+def resident_memory_mb():
+    """Resident memory of this process in MB, or None without psutil"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 1e6
+
+
+class ModelLoader(QThread):
+    """Builds and warms up the TargetDetector off the GUI thread"""
+    ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, startup):
+        super().__init__()
+        self.startup = startup
+
+    @staticmethod
+    def load(model_path):
+        import autotune
+        from detect_targets import TargetDetector
+        return TargetDetector(model_path, config.CONF_THRESHOLD, config.IOU_THRESHOLD,
+                              input_size=config.SCREEN_INPUT_SIZE,
+                              **autotune.detector_settings(config))
+
+    def run(self):
+        try:
+            detector = cascade.from_config(config, self.load(config.MODEL_PATH), self.load)
+            self.startup['model_loaded_ms'] = startup_ms()
+            if config.WARMUP_ITERATIONS > 0:
+                self.startup['warmup_ms'] = detector.warmup(config.WARMUP_ITERATIONS,
+                                                            config.WARMUP_SIZE)
+            self.startup['model_ready_ms'] = startup_ms()
+            # Fallback models are loaded when the latency budget first needs them
+            self.ready.emit(latency_budget.from_config(config, detector, self.load))
+        except Exception as e:
+            self.failed.emit(str(e))
 
 class CaptureThread(QThread):
-    frame_ready = pyqtSignal(np.ndarray)
+    # A frame is waiting in self.frames; the receiver take_latest()s and release()s it
+    frame_ready = pyqtSignal()
     
-    def __init__(self, window, detector):
+    def __init__(self, window, detector, startup=None, capture=None, interactive=True):
+        """
+        Args:
+            window: Overlay window whose region is captured
+            detector: Detector run on every captured frame
+            startup: Startup milestones to extend with the first detection
+            capture: Capture backend to use instead of CAPTURE_BACKEND, e.g. a
+                     capture_replay.ReplayCapture
+            interactive: Listen for the aim key and move the mouse; off for
+                         headless replays
+        """
         super().__init__()
         self.window = window
         self.detector = detector
+        self.interactive = interactive
         self.is_running = False
         self.is_capturing = True
-        self.last_time = time.time()
         self.fps = 0
+
+        # Startup milestones (ms since process start); first detection is added here
+        self.startup = startup if startup is not None else {}
+        self.started_at = None  # perf_counter() when detection was first started
+
+        # Per-stage timings with rolling percentiles
+        self.timer = StageTimer(config.TIMING_WINDOW, config.TIMING_DUMP_PATH,
+                                config.TIMING_DUMP_INTERVAL)
+
+        # Optional change-detection gating (None runs the model on every frame)
+        self.gate = change_gate.from_config(config)
+
+        # Screen capture backend, created on the capture thread (mss handles are per-thread)
+        self.capture = capture
+
+        # Frames travel capture -> detect -> draw -> GUI in pooled buffers; the GUI
+        # gets the latest GUI_QUEUE_SIZE of them, older ones are dropped. The pool
+        # covers the queue plus the frames being captured and displayed
+        self.frames = LatestFrameQueue(config.GUI_QUEUE_SIZE)
+        self.frame_pool = FramePool(max(config.FRAME_POOL_SIZE, config.GUI_QUEUE_SIZE + 2))
+        self._frame_shape = None
         
         # Simplified auto-aim settings
         self.should_aim = False  # Flag for single click aim
         
-        # Initialize mouse control
-        pyautogui.PAUSE = 0.005
-        pyautogui.FAILSAFE = False
-        
         # Initialize keyboard listener with both press and release handlers
-        self.keyboard_listener = keyboard.Listener(
-            on_press=self.on_key_press,
-            on_release=self.on_key_release,  # Add release handler
-            suppress=False
-        )
-        self.keyboard_listener.start()
+        self.keyboard_listener = None
+        if interactive:
+            from pynput import keyboard
+            self.keyboard_listener = keyboard.Listener(
+                on_press=self.on_key_press,
+                on_release=self.on_key_release,  # Add release handler
+                suppress=False
+            )
+            self.keyboard_listener.start()
         
         # Add detection window size
-        self.detection_window_size = (640, 416)  # Default size matching your model's input
+        self.detection_window_size = config.SCREEN_INPUT_SIZE or (640, 416)  # Default size matching your model's input
 
     def run(self):
+        if self.interactive:
+            import pyautogui
+            # Initialize mouse control
+            pyautogui.PAUSE = 0.005
+            pyautogui.FAILSAFE = False
+
+        if self.capture is None:
+            try:
+                self.capture = create_capture(config.CAPTURE_BACKEND)
+                if config.CAPTURE_RECORD_PATH is not None:
+                    # Save captured frames for capture_replay.py
+                    self.capture = RecordingCapture(self.capture, config.CAPTURE_RECORD_PATH)
+                print(f"Screen capture backend: {self.capture.name}")
+            except Exception as e:
+                print(f"Capture backend error: {e}")
+                return
+
         while self.is_capturing:
             try:
                 if self.is_running:
-                    # Calculate FPS
-                    current_time = time.time()
-                    self.fps = 1 / (current_time - self.last_time)
-                    self.last_time = current_time
-
-                    frame = self.capture_screen()
-                    if frame is not None:
-                        # Detect targets - now returns box coordinates directly
-                        boxes = self.detector.detect(frame)
-                        
-                        # Handle auto-aim if enabled
-                        if self.should_aim and boxes:
-                            self.handle_auto_aim(boxes)
-                        
-                        # Draw interface
-                        frame = self.draw_interface(frame, boxes)
-                        self.frame_ready.emit(frame)
+                    timing = self.timer.begin()
+                    handle = self.capture_screen()
+                    timing.lap('capture')
+                    if handle is not None:
+                        try:
+                            frame = handle.array
+                            # Detect targets - returns a Detections array bundle
+                            if self.gate is not None:
+                                boxes = self.gate.detect(self.detector, frame, timing)
+                            else:
+                                boxes = self.detector.detect(frame, timing)
+
+                            # Handle auto-aim if enabled
+                            if self.should_aim and len(boxes) > 0:
+                                self.handle_auto_aim(boxes)
+                            timing.lap('aim')
+
+                            # Draw interface directly on the pooled frame
+                            self.draw_interface(frame, boxes)
+                            timing.lap('draw')
+                            # Ownership passes to the GUI thread
+                            if self.frames.put(handle):
+                                self.frame_ready.emit()
+                            handle = None
+                            timing.lap('emit')
+                        finally:
+                            if handle is not None:
+                                handle.release()
+
+                        # FPS averaged over the timing window
+                        self.timer.commit(timing)
+                        self.fps = self.timer.fps()
+                        if 'first_detection_ms' not in self.startup:
+                            self.record_first_detection()
                     
                 time.sleep(0.001)
             except Exception as e:
                 print(f"Processing error: {e}")
                 continue
 
+        self.capture.close()
+
+    def record_first_detection(self):
+        """Record time-to-first-detection, from process start and from pressing Start"""
+        self.startup['first_detection_ms'] = startup_ms()
+        if self.started_at is not None:
+            self.startup['first_detection_after_start_ms'] = (time.perf_counter() - self.started_at) * 1000
+        print("Startup: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.startup.items()))
+
     def handle_auto_aim(self, results):
         """Move mouse to detected target position"""
+        import pyautogui
         try:
-            if not self.should_aim or not results:
+            if not self.should_aim or len(results) == 0:
                 return
 
             # Get window position
@@ -78,7 +209,7 @@ class CaptureThread(QThread):
 
             # Get the closest target to center
             target = self.find_best_target(results)
-            if not target:
+            if target is None:
                 return
                 
             # Calculate target position with vertical offset
@@ -116,38 +247,21 @@ class CaptureThread(QThread):
             self.should_aim = False
 
     def find_best_target(self, results):
-        """Find the target closest to center of the frame"""
-        if not results:
-            return None
-
+        """Find the target closest to center of the frame, as an [x1,y1,x2,y2] array"""
         # Get frame center
         center_x = self.detection_window_size[0] / 2
         center_y = self.detection_window_size[1] / 2
 
         # Find closest target to center
-        closest_target = None
-        min_distance = float('inf')
-
-        for box in results:
-            if len(box) < 4:  # Ensure box has enough coordinates
-                continue
-                
-            box_center_x = (box[0] + box[2]) / 2
-            box_center_y = (box[1] + box[3]) / 2
-            
-            distance = ((box_center_x - center_x) ** 2 + 
-                       (box_center_y - center_y) ** 2) ** 0.5
-            
-            if distance < min_distance:
-                min_distance = distance
-                closest_target = box
-
-        return closest_target
+        index = results.closest_to(center_x, center_y)
+        if index is None:
+            return None
+        return results.xyxy[index]
 
     def draw_interface(self, frame, results):
-        """Draw detection boxes and interface elements"""
+        """Draw detection boxes and interface elements onto frame in place"""
         # Draw original boxes
-        frame = self.detector.draw_boxes(frame, results)
+        self.detector.draw_boxes(frame, results, in_place=True)
         
         # Draw FPS
         cv2.putText(frame, f'FPS: {int(self.fps)}', (10, 30), 
@@ -158,8 +272,12 @@ class CaptureThread(QThread):
         cv2.putText(frame, status, (10, 60), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
+        # Draw per-stage timing panel
+        if config.SHOW_TIMING_OVERLAY:
+            self.timer.draw_overlay(frame, (10, 120))
+
         # Draw target indicator if auto-aim is enabled
-        if self.should_aim and results:
+        if self.should_aim and len(results) > 0:
             target = self.find_best_target(results)
             if target is not None:
                 center_x = int((target[0] + target[2]) / 2)
@@ -170,6 +288,23 @@ class CaptureThread(QThread):
 
         return frame
 
+    def timing_stats(self):
+        """Rolling per-stage timing percentiles and FPS, plus pipeline, memory and startup statistics"""
+        stats = self.timer.summary()
+        stats['startup'] = dict(self.startup)
+        stats['frame_pool'] = self.frame_pool.stats()
+        stats['gui_queue'] = self.frames.stats()
+        stats['rss_mb'] = resident_memory_mb()
+        detector = self.detector
+        if isinstance(detector, latency_budget.BudgetedDetector):
+            stats['latency_budget'] = detector.stats()
+            detector = detector.detector
+        if isinstance(detector, cascade.CascadeDetector):
+            stats['cascade'] = detector.stats()
+        if self.gate is not None:
+            stats['gating'] = self.gate.stats()
+        return stats
+
     def on_key_press(self, key):
         """Handle keyboard press events"""
         try:
@@ -191,6 +326,7 @@ class CaptureThread(QThread):
         return True
 
     def capture_screen(self):
+        """Grab the window region into a pooled buffer. Returns a FrameBuffer or None."""
         try:
             x = self.window.x()
             y = self.window.y()
@@ -203,26 +339,56 @@ class CaptureThread(QThread):
             if width <= 0 or height <= 0:
                 return None
                 
-            screenshot = pyautogui.screenshot(region=(x, y, width, height))
-            frame = np.array(screenshot)
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-            return frame
+            # Captured shape for this region (differs from it on HiDPI screens)
+            region = (width, height)
+            if self._frame_shape is not None and self._frame_shape[0] == region:
+                shape = self._frame_shape[1]
+            else:
+                shape = (height, width, 3)
+
+            # Skip the frame if the GUI still holds every buffer
+            handle = self.frame_pool.acquire(shape, timeout=0.05)
+            if handle is None:
+                return None
         except Exception as e:
             print(f"Screenshot error: {e}")
             return None
 
+        try:
+            frame = self.capture.grab(x, y, width, height, out=handle.array)
+            if frame is not None and frame is not handle.array:
+                # Wrong guess at the captured shape: resize the pooled buffer,
+                # later grabs of this region write into it directly
+                self._frame_shape = (region, frame.shape)
+                handle.release()
+                handle = self.frame_pool.acquire(frame.shape, timeout=0.05)
+                if handle is not None:
+                    np.copyto(handle.array, frame)
+                return handle
+        except Exception as e:
+            print(f"Screenshot error: {e}")
+            frame = None
+
+        if frame is None:
+            handle.release()
+            return None
+        return handle
+
 class ResizableTransparentWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.initUI()
-        
-        # Initialize detector
-        self.detector = TargetDetector(config.MODEL_PATH, config.CONF_THRESHOLD, config.IOU_THRESHOLD)
-        
-        # Create capture thread
-        self.capture_thread = CaptureThread(self, self.detector)
-        self.capture_thread.frame_ready.connect(self.show_frame)
-        self.capture_thread.start()
+
+        # Load the detector in the background; Start is enabled once it is ready
+        self.startup = {}
+        self.detector = None
+        self.capture_thread = None
+        self.toggle_btn.setEnabled(False)
+        self.toggle_btn.setText('Loading model...')
+        self.loader = ModelLoader(self.startup)
+        self.loader.ready.connect(self.on_model_ready)
+        self.loader.failed.connect(self.on_model_failed)
+        self.loader.start()
         
         # Create result window
         cv2.namedWindow('Detection Results', cv2.WINDOW_NORMAL)
@@ -412,8 +578,28 @@ class ResizableTransparentWindow(QMainWindow):
             return 'bottom'
         return None
 
+    def on_model_ready(self, detector):
+        self.detector = detector
+
+        # Create capture thread
+        self.capture_thread = CaptureThread(self, self.detector, self.startup)
+        self.capture_thread.frame_ready.connect(self.show_frame)
+        self.capture_thread.start()
+
+        self.toggle_btn.setEnabled(True)
+        self.toggle_btn.setText('Start Detection')
+        print(f"Model ready after {self.startup['model_ready_ms']:.0f} ms")
+
+    def on_model_failed(self, message):
+        self.toggle_btn.setText('Model failed to load')
+        print(f"Model loading error: {message}")
+
     def toggle_detection(self):
+        if self.capture_thread.started_at is None:
+            self.capture_thread.started_at = time.perf_counter()
         self.capture_thread.is_running = not self.capture_thread.is_running
+        # Don't count the paused time as one long frame
+        self.capture_thread.timer.reset_interval()
         btn_text = "Stop Detection" if self.capture_thread.is_running else "Start Detection"
         btn_color = 'red' if self.capture_thread.is_running else 'green'
         self.toggle_btn.setText(btn_text)
@@ -427,13 +613,23 @@ class ResizableTransparentWindow(QMainWindow):
             }}
         ''')
 
-    def show_frame(self, frame):
-        cv2.imshow('Detection Results', frame)
-        cv2.waitKey(1)
+    def show_frame(self):
+        # One frame per notification, so the event loop stays responsive
+        handle = self.capture_thread.frames.take_latest()
+        if handle is None:
+            return
+        try:
+            cv2.imshow('Detection Results', handle.array)
+            cv2.waitKey(1)
+        finally:
+            handle.release()
 
     def closeEvent(self, event):
-        self.capture_thread.is_capturing = False
-        self.capture_thread.wait()
+        self.loader.wait()
+        if self.capture_thread is not None:
+            self.capture_thread.is_capturing = False
+            self.capture_thread.wait()
+            self.capture_thread.frames.clear()
         cv2.destroyAllWindows()
         event.accept()
 
@@ -441,6 +637,7 @@ def main():
     app = QApplication(sys.argv)
     window = ResizableTransparentWindow()
     window.show()
+    window.startup['window_shown_ms'] = startup_ms()
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
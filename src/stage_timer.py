@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from typing import Optional
+
+# Pipeline stages timed for every frame. 'aim' covers CaptureThread's
+# auto-aim mouse movement, which would otherwise distort the other stages.
+STAGES = ('capture', 'preprocess', 'inference', 'postprocess', 'aim', 'draw', 'emit')
+
+
+class StageSample:
+    """
+    Per-frame (or per-batch) stage durations. A sample is owned by one thread
+    at a time and handed from stage to stage along with the frame it times.
+    """
+
+    __slots__ = ('durations', '_mark')
+
+    def __init__(self):
+        self.durations = np.zeros(len(STAGES), dtype=np.float64)
+        self._mark = time.perf_counter()
+
+    def mark(self):
+        """Start timing from now, e.g. after waiting on a queue"""
+        self._mark = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the last mark or lap"""
+        return (time.perf_counter() - self._mark) * 1000
+
+    def lap(self, stage: str):
+        """Charge the time since the last mark or lap to stage"""
+        now = time.perf_counter()
+        self.durations[STAGES.index(stage)] += (now - self._mark) * 1000
+        self._mark = now
+
+    def add(self, stage: str, ms: float):
+        """Charge an externally measured duration to stage"""
+        self.durations[STAGES.index(stage)] += ms
+
+
+class StageTimer:
+    """
+    Fixed-size ring buffer of per-frame stage timings with rolling percentiles.
+    Columns are STAGES followed by 'frame', the wall time between commits.
+    """
+
+    def __init__(self, capacity: int = 512, dump_path: Optional[str] = None,
+                 dump_interval: float = 10.0):
+        """
+        Args:
+            capacity: Number of most recent frames kept
+            dump_path: Optional JSON file the summary is written to periodically
+            dump_interval: Seconds between dumps
+        """
+        self.columns = STAGES + ('frame',)
+        self.buffer = np.zeros((capacity, len(self.columns)), dtype=np.float64)
+        self.capacity = capacity
+        self.count = 0
+        self.total_frames = 0
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self._index = 0
+        self._last_commit = None
+        self._last_dump = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def begin(self) -> StageSample:
+        return StageSample()
+
+    def commit(self, sample: StageSample, frames: int = 1):
+        """
+        Store a finished sample
+        Args:
+            sample: Stage durations for the frame(s)
+            frames: Number of frames the sample covers; durations are divided by it
+        """
+        now = time.perf_counter()
+        frames = max(1, frames)
+        with self._lock:
+            row = self.buffer[self._index]
+            row[:len(STAGES)] = sample.durations / frames
+            row[-1] = ((now - self._last_commit) * 1000 / frames
+                       if self._last_commit is not None else row[:len(STAGES)].sum())
+            self._last_commit = now
+            self._index = (self._index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.total_frames += frames
+
+        if self.dump_path and now - self._last_dump >= self.dump_interval:
+            self._last_dump = now
+            self.dump(self.dump_path)
+
+    def reset_interval(self):
+        """Forget the last commit time, e.g. after capture was paused"""
+        with self._lock:
+            self._last_commit = None
+
+    def window(self) -> np.ndarray:
+        """Copy of the rows currently held in the ring buffer"""
+        with self._lock:
+            return self.buffer[:self.count].copy()
+
+    def percentiles(self, q=(50, 95, 99)) -> dict:
+        """
+        Returns:
+            {column: {'mean': ms, 'p50': ms, ...}} over the current window
+        """
+        rows = self.window()
+        if len(rows) == 0:
+            return {}
+        values = np.percentile(rows, q, axis=0)
+        means = rows.mean(axis=0)
+        summary = {}
+        for i, column in enumerate(self.columns):
+            stats = {'mean': float(means[i])}
+            stats.update({f'p{p}': float(values[j, i]) for j, p in enumerate(q)})
+            summary[column] = stats
+        return summary
+
+    def fps(self) -> float:
+        """Frames per second averaged over the window"""
+        rows = self.window()
+        if len(rows) == 0:
+            return 0.0
+        mean_frame = rows[:, -1].mean()
+        return 1000 / mean_frame if mean_frame > 0 else 0.0
+
+    def summary(self) -> dict:
+        return {
+            'frames': self.total_frames,
+            'window': self.count,
+            'fps': self.fps(),
+            'stages': self.percentiles(),
+        }
+
+    def dump(self, path: str):
+        """Write the summary as JSON, replacing the file atomically"""
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.summary(), f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Timing dump error: {str(e)}")
+
+    def draw_overlay(self, frame: np.ndarray, origin=(10, 120)) -> np.ndarray:
+        """Draw a small p50/p95 panel per stage onto frame in place"""
+        stats = self.percentiles((50, 95))
+        x, y = origin
+        for column in self.columns:
+            if column not in stats:
+                continue
+            text = f"{column}: {stats[column]['p50']:.1f}/{stats[column]['p95']:.1f} ms"
+            cv2.putText(frame, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            y += 18
+        return frame
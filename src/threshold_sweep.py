@@ -0,0 +1,293 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+import config
+from backends import BACKENDS, file_hash
+from detections import MAX_WH, Detections, box_iou, nms
+
+# Columns of a stored candidate row
+ROW_WIDTH = 6  # x1, y1, x2, y2, conf, cls
+
+
+class RawPredictionWriter:
+    """
+    Appends per-frame pre-NMS candidates (see TargetDetector.detect_raw) to a
+    directory: candidates.f32 holds every row back to back, offsets.npy the
+    row range of each frame and shapes.npy each frame's (height, width).
+    """
+
+    def __init__(self, directory: str, info: dict):
+        """
+        Args:
+            directory: Output directory, created if missing
+            info: Settings the candidates were produced with, saved as info.json
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.info = dict(info)
+        self.offsets = [0]
+        self.shapes = []
+        self._file = open(os.path.join(directory, 'candidates.f32'), 'wb')
+
+    def write(self, rows: np.ndarray, shape):
+        rows = np.ascontiguousarray(rows, dtype=np.float32).reshape(-1, ROW_WIDTH)
+        self._file.write(rows.tobytes())
+        self.offsets.append(self.offsets[-1] + len(rows))
+        self.shapes.append(shape[:2])
+
+    def close(self):
+        self._file.close()
+        np.save(os.path.join(self.directory, 'offsets.npy'), np.asarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(self.directory, 'shapes.npy'), np.asarray(self.shapes, dtype=np.int32).reshape(-1, 2))
+        self.info['frames'] = len(self.shapes)
+        self.info['candidates'] = self.offsets[-1]
+        with open(os.path.join(self.directory, 'info.json'), 'w') as f:
+            json.dump(self.info, f, indent=2)
+
+
+class RawPredictions:
+    """Memory-mapped view of a directory written by RawPredictionWriter"""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, 'info.json')) as f:
+            self.info = json.load(f)
+        self.offsets = np.load(os.path.join(directory, 'offsets.npy'))
+        self.shapes = np.load(os.path.join(directory, 'shapes.npy'))
+        path = os.path.join(directory, 'candidates.f32')
+        if os.path.getsize(path) == 0:
+            self.rows = np.zeros((0, ROW_WIDTH), dtype=np.float32)
+        else:
+            self.rows = np.memmap(path, dtype=np.float32, mode='r').reshape(-1, ROW_WIDTH)
+
+    @property
+    def min_conf(self) -> float:
+        return self.info['min_conf']
+
+    def __len__(self) -> int:
+        return len(self.shapes)
+
+    def frame(self, index: int) -> np.ndarray:
+        """Candidate rows of one frame, sorted by descending conf"""
+        return self.rows[self.offsets[index]:self.offsets[index + 1]]
+
+    def detections(self, index: int, conf_threshold: float, iou_threshold: float,
+                   max_det: int = 300) -> Detections:
+        """What the detector would have returned for a frame at these thresholds"""
+        rows = self.frame(index)
+        rows = rows[rows[:, 4] > conf_threshold]
+        keep = nms(rows[:, :4], rows[:, 4], iou_threshold, rows[:, 5], max_det)
+        h, w = self.shapes[index]
+        return Detections(rows[keep, :4], rows[keep, 4], rows[keep, 5]).clip(w, h)
+
+
+def sweep_frame(rows: np.ndarray, conf_values: np.ndarray, iou_values: np.ndarray,
+                max_det: int = 300) -> np.ndarray:
+    """
+    Number of detections a frame produces at every conf/iou pair, matching
+    backends.postprocess (class-aware greedy NMS, max_det boxes).
+
+    Greedy NMS visits boxes by descending score and a box's fate depends only
+    on higher-scoring boxes, so raising the conf threshold just truncates the
+    result: one NMS pass per IoU value answers every conf value. The passes
+    for all IoU values run together on one IoU matrix.
+    Args:
+        rows: Candidate rows sorted by descending conf
+        conf_values: Confidence thresholds, shape (C,)
+        iou_values: NMS IoU thresholds, shape (I,)
+        max_det: Maximum detections per frame
+    Returns:
+        Detection counts, shape (I, C)
+    """
+    rows = rows[rows[:, 4] > conf_values.min()]
+    n = len(rows)
+    if n == 0:
+        return np.zeros((len(iou_values), len(conf_values)), dtype=np.int32)
+
+    # Shift each class into its own region so that classes never overlap
+    ious = box_iou(rows[:, :4] + rows[:, 5:6] * MAX_WH, rows[:, :4] + rows[:, 5:6] * MAX_WH)
+    suppressed = np.zeros((len(iou_values), n), dtype=bool)
+    keep = np.zeros((len(iou_values), n), dtype=bool)
+    for i in range(n):
+        alive = ~suppressed[:, i]
+        if not alive.any():
+            continue
+        keep[alive, i] = True
+        suppressed[alive, i + 1:] |= ious[i, i + 1:] > iou_values[alive, None]
+
+    # Rows above each conf threshold form a prefix of the sorted candidates
+    prefix = np.searchsorted(-rows[:, 4], -conf_values, side='left')
+    kept = np.concatenate([np.zeros((len(iou_values), 1), dtype=np.int32),
+                           np.cumsum(keep, axis=1, dtype=np.int32)], axis=1)
+    return np.minimum(kept[:, prefix], max_det)
+
+
+def sweep(predictions: RawPredictions, conf_values: List[float], iou_values: List[float],
+          max_det: int = 300) -> List[dict]:
+    """
+    Re-threshold a whole clip at every conf/iou pair without running the model
+    Args:
+        predictions: Stored candidates of the clip
+        conf_values: Confidence thresholds, none below predictions.min_conf
+        iou_values: NMS IoU thresholds
+        max_det: Maximum detections per frame
+    Returns:
+        Per pair: mean detections per frame, fraction of frames with a
+        detection and flicker (mean change in count between consecutive frames)
+    """
+    conf_array = np.asarray(conf_values, dtype=np.float32)
+    iou_array = np.asarray(iou_values, dtype=np.float32)
+    counts = np.zeros((len(predictions), len(iou_array), len(conf_array)), dtype=np.int32)
+    for index in range(len(predictions)):
+        counts[index] = sweep_frame(predictions.frame(index), conf_array, iou_array, max_det)
+
+    frames = max(1, len(predictions))
+    flicker = (np.abs(np.diff(counts, axis=0)).mean(axis=0) if len(predictions) > 1
+               else np.zeros(counts.shape[1:]))
+    results = []
+    for i, iou in enumerate(iou_values):
+        for c, conf in enumerate(conf_values):
+            results.append({
+                'conf': conf,
+                'iou': iou,
+                'detections_per_frame': float(counts[:, i, c].sum() / frames),
+                'frames_with_detections': float((counts[:, i, c] > 0).sum() / frames),
+                'flicker': float(flicker[i, c]),
+            })
+    return results
+
+
+def read_frames(source: str) -> Iterator[np.ndarray]:
+    """Frames of a video file, or the images of a directory in name order"""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(config.IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(source, name))
+                if image is not None:
+                    yield image
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"Cannot open video: {source}")
+        return
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def record(detector, source: str, directory: str, min_conf: float,
+           max_frames: Optional[int] = None) -> dict:
+    """
+    Run the model once over a clip and store every frame's pre-NMS candidates
+    Args:
+        detector: TargetDetector
+        source: Video file or image directory
+        directory: Output directory for RawPredictions
+        min_conf: Lowest confidence that later sweeps can use
+        max_frames: Stop after this many frames
+    Returns:
+        The saved info.json contents
+    """
+    writer = RawPredictionWriter(directory, {
+        'source': source,
+        'model_path': detector.model_path,
+        'model_hash': file_hash(detector.model_path),
+        'backend': detector.backend_name,
+        'imgsz': detector.imgsz,
+        'input_size': (None if detector.preprocessor is None
+                       else [detector.preprocessor.width, detector.preprocessor.height]),
+        'min_conf': min_conf,
+    })
+    start = time.perf_counter()
+    batch = []
+    try:
+        for count, frame in enumerate(read_frames(source)):
+            if max_frames is not None and count >= max_frames:
+                break
+            batch.append(frame)
+            if len(batch) == detector.max_batch_size:
+                for frame_rows, image in zip(detector.detect_raw(batch, min_conf), batch):
+                    writer.write(frame_rows, image.shape)
+                batch = []
+        if batch:
+            for frame_rows, image in zip(detector.detect_raw(batch, min_conf), batch):
+                writer.write(frame_rows, image.shape)
+    finally:
+        writer.close()
+    writer.info['elapsed'] = time.perf_counter() - start
+    return writer.info
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Tune CONF_THRESHOLD/IOU_THRESHOLD without re-running the model: 'record' stores "
+                    "the raw pre-NMS candidates of a clip once, 'sweep' re-thresholds them over a "
+                    "grid of conf/iou values.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help="Run the model on a clip and store its candidates")
+    record_parser.add_argument('source', nargs='?', default=config.VIDEO_PATH,
+                               help="Video file or image directory")
+    record_parser.add_argument('-o', '--output', default='sweeps/clip')
+    record_parser.add_argument('--model', default=config.MODEL_PATH)
+    record_parser.add_argument('--backend', choices=BACKENDS, default=config.BACKEND)
+    record_parser.add_argument('--imgsz', type=int, default=config.IMGSZ)
+    record_parser.add_argument('--batch-size', type=int, default=config.BATCH_SIZE)
+    record_parser.add_argument('--min-conf', type=float, default=config.SWEEP_MIN_CONF)
+    record_parser.add_argument('--max-frames', type=int, default=None)
+
+    sweep_parser = commands.add_parser('sweep', help="Re-threshold stored candidates over a grid")
+    sweep_parser.add_argument('directory', nargs='?', default='sweeps/clip')
+    sweep_parser.add_argument('--conf', nargs='+', type=float, default=config.SWEEP_CONF_VALUES)
+    sweep_parser.add_argument('--iou', nargs='+', type=float, default=config.SWEEP_IOU_VALUES)
+    sweep_parser.add_argument('--output', default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from detect_targets import TargetDetector
+        detector = TargetDetector(args.model, config.CONF_THRESHOLD, config.IOU_THRESHOLD,
+                                  args.batch_size, args.backend, args.imgsz, config.INPUT_SIZE)
+        info = record(detector, args.source, args.output, args.min_conf, args.max_frames)
+        print(f"Stored {info['candidates']} candidates for {info['frames']} frames "
+              f"in {info['elapsed']:.1f}s to {args.output}")
+        return
+
+    predictions = RawPredictions(args.directory)
+    conf_values = sorted(c for c in args.conf if c >= predictions.min_conf)
+    if len(conf_values) < len(args.conf):
+        print(f"Skipping conf values below the recorded minimum of {predictions.min_conf}")
+    if not conf_values:
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = sweep(predictions, conf_values, sorted(args.iou))
+    elapsed = time.perf_counter() - start
+
+    print(f"{'conf':>6} {'iou':>6} {'det/frame':>10} {'hit rate':>9} {'flicker':>8}")
+    for row in results:
+        current = (np.isclose(row['conf'], config.CONF_THRESHOLD)
+                   and np.isclose(row['iou'], config.IOU_THRESHOLD))
+        print(f"{row['conf']:>6.2f} {row['iou']:>6.2f} {row['detections_per_frame']:>10.2f} "
+              f"{row['frames_with_detections']:>9.1%} {row['flicker']:>8.3f}"
+              + ("  <- config" if current else ""))
+    print(f"Swept {len(results)} settings over {len(predictions)} frames in {elapsed:.2f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'info': predictions.info, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
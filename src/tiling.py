@@ -0,0 +1,213 @@
+import numpy as np
+from typing import List
+from detections import Detections, box_ios
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: float) -> np.ndarray:
+    """
+    Overlapping tiles covering a frame; the last row/column is aligned to the
+    frame edge so every tile has the full size
+    Args:
+        width: Frame width
+        height: Frame height
+        tile_size: Tile side in pixels
+        overlap: Fraction of tile_size shared by neighbouring tiles
+    Returns:
+        Tiles in [x1,y1,x2,y2] format, shape (T, 4)
+    """
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        return sorted(set(range(0, length - tile_size, step)) | {length - tile_size})
+
+    xs, ys = starts(width), starts(height)
+    x1, y1 = np.meshgrid(xs, ys)
+    x1, y1 = x1.ravel(), y1.ravel()
+    return np.stack([x1, y1, np.minimum(x1 + tile_size, width),
+                     np.minimum(y1 + tile_size, height)], axis=1)
+
+
+def merge_detections(parts: List[Detections], match_threshold: float = 0.5) -> Detections:
+    """
+    Vectorized cross-tile NMS. Boxes from different parts (tiles or the full
+    frame) of the same class whose intersection over the smaller box exceeds
+    match_threshold are duplicates: the highest-scoring one is kept and grown
+    to the union of the boxes it suppresses, so objects cut by a tile edge come
+    out whole. Suppression is decided in one pass over the overlap matrix
+    (Fast NMS), with no per-box loop.
+    Args:
+        parts: Detections per tile/full frame, already in frame coordinates
+        match_threshold: Intersection-over-smaller above which boxes are merged
+    Returns:
+        Merged detections, sorted by descending confidence
+    """
+    detections = Detections.concatenate(parts)
+    if len(detections) < 2:
+        return detections
+    source = np.repeat(np.arange(len(parts)), [len(p) for p in parts])
+
+    order = np.argsort(-detections.conf, kind='stable')
+    detections, source = detections[order], source[order]
+
+    overlap = box_ios(detections.xyxy, detections.xyxy)
+    # Each part was already NMS'd by the model; only merge across parts
+    overlap[source[:, None] == source[None, :]] = 0.0
+    overlap[detections.cls[:, None] != detections.cls[None, :]] = 0.0
+    # matches[i, j]: higher-scoring box i suppresses box j
+    matches = np.triu(overlap > match_threshold, k=1)
+    suppressed = matches.any(axis=0)
+
+    # Grow each kept box to cover the boxes it directly suppressed
+    suppressor = matches.argmax(axis=0)
+    merged = suppressed & ~suppressed[suppressor]
+    xyxy = detections.xyxy.copy()
+    np.minimum.at(xyxy[:, :2], suppressor[merged], detections.xyxy[merged, :2])
+    np.maximum.at(xyxy[:, 2:], suppressor[merged], detections.xyxy[merged, 2:])
+
+    keep = ~suppressed
+    return Detections(xyxy[keep], detections.conf[keep], detections.cls[keep],
+                      None if detections.ids is None else detections.ids[keep])
+
+
+class TiledDetector:
+    """
+    Sliced inference for high-resolution frames. Large frames are split into
+    overlapping tiles that go through the wrapped detector as one batch, so
+    small objects are seen near native resolution instead of being shrunk to
+    the model input size. Frames that fit in one tile are passed through.
+
+    Wraps a TargetDetector and exposes the same detect/detect_batch interface
+    (everything else, e.g. draw_boxes, is delegated), so it can be used
+    anywhere a detector is, including under ChangeGate and KeyframeTracker.
+    """
+
+    def __init__(self, detector, tile_size: int = 640, overlap: float = 0.2,
+                 match_threshold: float = 0.5, full_frame: bool = True,
+                 coarse: bool = False, coarse_conf: float = 0.1):
+        """
+        Args:
+            detector: TargetDetector to run on tiles
+            tile_size: Tile side in pixels
+            overlap: Fraction of tile_size shared by neighbouring tiles
+            match_threshold: Intersection-over-smaller for merging boxes across tiles
+            full_frame: Also detect on the whole (downscaled) frame, for objects
+                        larger than a tile
+            coarse: Run the full-frame pass first at coarse_conf and only run
+                    tiles that overlap something it found. Much cheaper on
+                    sparse scenes, but objects invisible at full-frame scale
+                    are missed.
+            coarse_conf: Confidence threshold of the coarse pass
+        """
+        self.detector = detector
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.match_threshold = match_threshold
+        self.full_frame = full_frame
+        self.coarse = coarse
+        self.coarse_conf = coarse_conf
+        self.frames = 0
+        self.tiled_frames = 0
+        self.tiles_run = 0
+        self.tiles_skipped = 0
+
+    def __getattr__(self, name):
+        if name == 'detector':
+            raise AttributeError(name)
+        return getattr(self.detector, name)
+
+    def _needs_tiling(self, frame: np.ndarray) -> bool:
+        h, w = frame.shape[:2]
+        return w > self.tile_size or h > self.tile_size
+
+    def _coarse_pass(self, frames: List[np.ndarray], timing=None) -> List[Detections]:
+        """Full-frame detection at the (lower) coarse confidence threshold"""
+        with self.detector.conf_threshold_override(min(self.coarse_conf, self.detector.conf_threshold)):
+            return self.detector.detect_batch(frames, timing)
+
+    def detect(self, image: np.ndarray, timing=None) -> Detections:
+        if image is None or image.size == 0:
+            return Detections.empty()
+        return self.detect_batch([image], timing)[0]
+
+    def detect_batch(self, frames: List[np.ndarray], timing=None) -> List[Detections]:
+        """
+        Tiled equivalent of detector.detect_batch(frames). Tiles (and full-frame
+        passes) of every frame are sent to the model together.
+        """
+        outputs = [Detections.empty() for _ in frames]
+        tiled = [i for i, frame in enumerate(frames)
+                 if frame is not None and frame.size > 0 and self._needs_tiling(frame)]
+
+        coarse = {}
+        if self.coarse and tiled:
+            coarse = dict(zip(tiled, self._coarse_pass([frames[i] for i in tiled], timing)))
+
+        # Model inputs and, for each, (frame index, x offset, y offset)
+        inputs, owners = [], []
+        for i, frame in enumerate(frames):
+            if frame is None or frame.size == 0:
+                continue
+            self.frames += 1
+            if i not in tiled:
+                inputs.append(frame)
+                owners.append((i, 0, 0))
+                continue
+
+            self.tiled_frames += 1
+            h, w = frame.shape[:2]
+            tiles = tile_grid(w, h, self.tile_size, self.overlap)
+            if i in coarse:
+                # Keep tiles that intersect any coarse box
+                boxes = coarse[i].xyxy
+                selected = ((tiles[:, None, 0] < boxes[None, :, 2]) & (tiles[:, None, 2] > boxes[None, :, 0])
+                            & (tiles[:, None, 1] < boxes[None, :, 3]) & (tiles[:, None, 3] > boxes[None, :, 1]))
+                selected = selected.any(axis=1)
+                self.tiles_skipped += int((~selected).sum())
+                tiles = tiles[selected]
+            elif self.full_frame:
+                inputs.append(frame)
+                owners.append((i, 0, 0))
+
+            for x1, y1, x2, y2 in tiles.tolist():
+                inputs.append(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+                owners.append((i, x1, y1))
+            self.tiles_run += len(tiles)
+        if timing is not None:
+            timing.lap('preprocess')
+
+        results = self.detector.detect_batch(inputs, timing) if inputs else []
+
+        parts = {}
+        for (i, x, y), detections in zip(owners, results):
+            parts.setdefault(i, []).append(detections.offset(x, y) if x or y else detections)
+        for i, detections in coarse.items():
+            parts.setdefault(i, []).append(detections.filter_conf(self.detector.conf_threshold))
+        for i, frame_parts in parts.items():
+            if len(frame_parts) == 1:
+                outputs[i] = frame_parts[0]
+            else:
+                h, w = frames[i].shape[:2]
+                outputs[i] = merge_detections(frame_parts, self.match_threshold).clip(w, h)
+        if timing is not None:
+            timing.lap('postprocess')
+        return outputs
+
+    def stats(self) -> dict:
+        return {
+            'frames': self.frames,
+            'tiled_frames': self.tiled_frames,
+            'tiles_run': self.tiles_run,
+            'tiles_skipped': self.tiles_skipped,
+            'tiles_per_tiled_frame': self.tiles_run / self.tiled_frames if self.tiled_frames else 0.0,
+        }
+
+
+def from_config(config, detector):
+    """detector wrapped in a TiledDetector configured from config.py, or detector itself if TILING is off"""
+    if not config.TILING:
+        return detector
+    return TiledDetector(detector, config.TILE_SIZE, config.TILE_OVERLAP,
+                         config.TILE_MATCH_THRESHOLD, config.TILE_FULL_FRAME,
+                         config.TILE_COARSE, config.TILE_COARSE_CONF)
@@ -0,0 +1,242 @@
+import numpy as np
+from typing import List
+from detections import Detections, box_iou
+
+# Constant-velocity model over (cx, cy, w, h) and their velocities
+_F = np.eye(8, dtype=np.float64)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8, dtype=np.float64)
+
+# Noise relative to box height, as in SORT/DeepSORT
+_STD_POSITION = 1.0 / 20
+_STD_VELOCITY = 1.0 / 160
+
+
+def _xyxy_to_cxcywh(xyxy: np.ndarray) -> np.ndarray:
+    wh = xyxy[:, 2:] - xyxy[:, :2]
+    return np.hstack([xyxy[:, :2] + wh / 2, wh])
+
+
+def _cxcywh_to_xyxy(cxcywh: np.ndarray) -> np.ndarray:
+    half = cxcywh[:, 2:] / 2
+    return np.hstack([cxcywh[:, :2] - half, cxcywh[:, :2] + half])
+
+
+class MultiObjectTracker:
+    """
+    IoU-associated Kalman tracker. All tracks are stored as arrays and
+    predicted/updated together: state (T, 8), covariance (T, 8, 8).
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 2, min_hits: int = 2):
+        """
+        Args:
+            iou_threshold: Minimum IoU between a predicted track and a detection to match
+            max_misses: Keyframes a track may go unmatched before it is dropped
+            min_hits: Matches needed before a track counts as a unique object
+        """
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.next_id = 1
+        self.confirmed_ids = set()
+        self.state = np.zeros((0, 8))
+        self.covariance = np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, dtype=np.int32)
+        self.conf = np.zeros(0, dtype=np.float32)
+        self.cls = np.zeros(0, dtype=np.int32)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.misses = np.zeros(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _process_noise(self) -> np.ndarray:
+        h = self.state[:, 3:4]
+        std = np.hstack([np.repeat(_STD_POSITION * h, 4, axis=1),
+                         np.repeat(_STD_VELOCITY * h, 4, axis=1)])
+        q = np.zeros((len(h), 8, 8))
+        idx = np.arange(8)
+        q[:, idx, idx] = std ** 2
+        return q
+
+    def predict(self):
+        """Advance every track by one frame"""
+        if len(self) == 0:
+            return
+        q = self._process_noise()
+        self.state = self.state @ _F.T
+        self.covariance = _F @ self.covariance @ _F.T + q
+        # Keep sizes positive when a shrinking box is extrapolated
+        np.maximum(self.state[:, 2:4], 1.0, out=self.state[:, 2:4])
+
+    def update(self, detections: Detections):
+        """
+        Associate detections with the predicted tracks and correct them
+        Args:
+            detections: Detections from the full detector on this frame
+        """
+        matched_tracks = np.zeros(len(self), dtype=bool)
+        matched_dets = np.zeros(len(detections), dtype=bool)
+
+        if len(self) > 0 and len(detections) > 0:
+            ious = box_iou(self.boxes_xyxy(), detections.xyxy)
+            ious[self.cls[:, None] != detections.cls[None, :]] = 0.0
+            # Greedy assignment, highest IoU first
+            pairs = np.argwhere(ious >= self.iou_threshold)
+            order = np.argsort(-ious[pairs[:, 0], pairs[:, 1]], kind='stable')
+            track_idx, det_idx = [], []
+            for t, d in pairs[order]:
+                if not matched_tracks[t] and not matched_dets[d]:
+                    matched_tracks[t] = matched_dets[d] = True
+                    track_idx.append(t)
+                    det_idx.append(d)
+            if track_idx:
+                self._correct(np.asarray(track_idx), detections[np.asarray(det_idx)])
+
+        self.misses[~matched_tracks] += 1
+        self.misses[matched_tracks] = 0
+        self._drop(self.misses <= self.max_misses)
+        self._spawn(detections.filter(~matched_dets))
+
+    def _correct(self, index: np.ndarray, detections: Detections):
+        z = _xyxy_to_cxcywh(detections.xyxy.astype(np.float64))
+        x, p = self.state[index], self.covariance[index]
+        h = x[:, 3:4]
+        r = np.zeros((len(index), 4, 4))
+        r[:, np.arange(4), np.arange(4)] = np.repeat((_STD_POSITION * h) ** 2, 4, axis=1)
+
+        s = _H @ p @ _H.T + r
+        k = p @ _H.T @ np.linalg.inv(s)
+        innovation = z - x @ _H.T
+        self.state[index] = x + (k @ innovation[:, :, None])[:, :, 0]
+        self.covariance[index] = (np.eye(8) - k @ _H) @ p
+
+        self.conf[index] = detections.conf
+        self.hits[index] += 1
+        self.confirmed_ids.update(self.ids[index][self.hits[index] >= self.min_hits].tolist())
+
+    def _drop(self, keep: np.ndarray):
+        self.state, self.covariance = self.state[keep], self.covariance[keep]
+        self.ids, self.conf, self.cls = self.ids[keep], self.conf[keep], self.cls[keep]
+        self.hits, self.misses = self.hits[keep], self.misses[keep]
+
+    def _spawn(self, detections: Detections):
+        n = len(detections)
+        if n == 0:
+            return
+        state = np.zeros((n, 8))
+        state[:, :4] = _xyxy_to_cxcywh(detections.xyxy.astype(np.float64))
+        h = state[:, 3:4]
+        std = np.hstack([np.repeat(2 * _STD_POSITION * h, 4, axis=1),
+                         np.repeat(10 * _STD_VELOCITY * h, 4, axis=1)])
+        covariance = np.zeros((n, 8, 8))
+        covariance[:, np.arange(8), np.arange(8)] = std ** 2
+
+        ids = np.arange(self.next_id, self.next_id + n, dtype=np.int32)
+        self.next_id += n
+        self.state = np.vstack([self.state, state])
+        self.covariance = np.concatenate([self.covariance, covariance])
+        self.ids = np.concatenate([self.ids, ids])
+        self.conf = np.concatenate([self.conf, detections.conf])
+        self.cls = np.concatenate([self.cls, detections.cls])
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int32)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int32)])
+        if self.min_hits <= 1:
+            self.confirmed_ids.update(ids.tolist())
+
+    def boxes_xyxy(self) -> np.ndarray:
+        return _cxcywh_to_xyxy(self.state[:, :4])
+
+    def track_confidence(self) -> np.ndarray:
+        """
+        Per-track confidence: the last detection confidence discounted by how
+        uncertain the predicted center has become relative to the box size
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.float32)
+        position_std = np.sqrt(self.covariance[:, 0, 0] + self.covariance[:, 1, 1])
+        size = np.sqrt(np.maximum(self.state[:, 2] * self.state[:, 3], 1.0))
+        return (self.conf / (1.0 + position_std / size)).astype(np.float32)
+
+    def confidence(self) -> float:
+        """Lowest track confidence, or 1.0 when there is nothing to track"""
+        scores = self.track_confidence()
+        return float(scores.min()) if len(scores) else 1.0
+
+    def detections(self) -> Detections:
+        """Current track boxes with tracker confidences and ids"""
+        return Detections(self.boxes_xyxy(), self.track_confidence(), self.cls, self.ids)
+
+
+class KeyframeTracker:
+    """
+    Runs the full detector only on keyframes (every N frames, or earlier when
+    tracker confidence drops) and propagates boxes with MultiObjectTracker in
+    between. Exposes the same detect/detect_batch interface as ChangeGate.
+    """
+
+    def __init__(self, every: int = 5, min_confidence: float = 0.3,
+                 iou_threshold: float = 0.3, max_misses: int = 2):
+        """
+        Args:
+            every: Run the detector at least every this many frames
+            min_confidence: Re-run the detector early when the lowest track
+                            confidence falls below this
+            iou_threshold: Track/detection association threshold
+            max_misses: Keyframes a track may go unmatched before it is dropped
+        """
+        self.every = max(1, int(every))
+        self.min_confidence = min_confidence
+        self.tracker = MultiObjectTracker(iou_threshold, max_misses)
+        self._since_keyframe = None
+        self.frames = 0
+        self.keyframes = 0
+        self.early_keyframes = 0
+
+    def _is_keyframe(self) -> bool:
+        if self._since_keyframe is None or self._since_keyframe >= self.every:
+            return True
+        if self.tracker.confidence() < self.min_confidence:
+            self.early_keyframes += 1
+            return True
+        return False
+
+    def detect(self, detector, frame: np.ndarray, timing=None) -> Detections:
+        if frame is None or frame.size == 0:
+            return Detections.empty()
+
+        self.frames += 1
+        self.tracker.predict()
+        if self._is_keyframe():
+            self.tracker.update(detector.detect(frame, timing))
+            self.keyframes += 1
+            self._since_keyframe = 0
+        self._since_keyframe += 1
+
+        h, w = frame.shape[:2]
+        detections = self.tracker.detections().clip(w, h)
+        if timing is not None:
+            timing.lap('postprocess')
+        return detections
+
+    def detect_batch(self, detector, frames: List[np.ndarray], timing=None) -> List[Detections]:
+        """Frames are tracked in order; keyframes are detected one at a time"""
+        return [self.detect(detector, frame, timing) for frame in frames]
+
+    def stats(self) -> dict:
+        return {
+            'frames': self.frames,
+            'keyframes': self.keyframes,
+            'early_keyframes': self.early_keyframes,
+            'model_call_ratio': self.keyframes / self.frames if self.frames else 0.0,
+            'unique_objects': len(self.tracker.confirmed_ids),
+        }
+
+
+def from_config(config):
+    """KeyframeTracker configured from config.py, or None if DETECT_EVERY_N is 1"""
+    if config.DETECT_EVERY_N <= 1:
+        return None
+    return KeyframeTracker(config.DETECT_EVERY_N, config.TRACKER_MIN_CONFIDENCE,
+                           config.TRACKER_IOU_THRESHOLD, config.TRACKER_MAX_MISSES)
@@ -0,0 +1,174 @@
+import collections
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from frame_pool import FramePool
+
+# Marks the end of the stream in the encoder queue
+_END = object()
+
+# Codec per container extension
+FOURCC_BY_EXTENSION = {'.mp4': 'mp4v', '.avi': 'MJPG', '.mkv': 'XVID', '.mov': 'mp4v'}
+
+
+def video_fps(video_path: str, default: float = 30.0) -> float:
+    """Frame rate of a video file, or default if it can't be read"""
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0
+    cap.release()
+    return fps if fps > 0 else default
+
+
+class VideoExporter:
+    """
+    Writes annotated frames to a video file on a dedicated encoder thread, so
+    encoding overlaps detection instead of adding to it. Frames are copied
+    into a FramePool and passed through a bounded queue; when the encoder
+    falls behind, write() blocks rather than dropping frames.
+
+    With detections_only, only segments around frames that have detections
+    are written: up to pre_roll frames before the first detection and
+    post_roll frames after the last one, so a segment shows what led up to
+    and followed the targets. Close segments merge into one.
+
+    write() has the sink(frame_index, frame_with_boxes, detections) signature
+    used by process_video, VideoPipeline and inference_pool.
+    """
+
+    def __init__(self, path: str, fps: float, queue_size: int = 8,
+                 detections_only: bool = False, pre_roll: int = 15, post_roll: int = 15,
+                 fourcc: Optional[str] = None):
+        """
+        Args:
+            path: Output video file, created along with its directory
+            fps: Output frame rate
+            queue_size: Frames buffered for the encoder
+            detections_only: Only write segments around frames with detections
+            pre_roll: Frames kept before the first detection of a segment
+            post_roll: Frames kept after the last detection of a segment
+            fourcc: Codec, by default chosen from the file extension
+        """
+        self.path = path
+        self.fps = fps
+        self.detections_only = detections_only
+        self.pre_roll = max(0, int(pre_roll)) if detections_only else 0
+        self.post_roll = max(0, int(post_roll))
+        self.fourcc = fourcc or FOURCC_BY_EXTENSION.get(os.path.splitext(path)[1].lower(), 'mp4v')
+
+        self.queue_size = max(1, int(queue_size))
+        # Buffers for the queue, the pre-roll, and the frames being copied and encoded
+        self.pool = FramePool(self.queue_size + self.pre_roll + 2)
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._pre = collections.deque()
+        self._post = 0
+        self.segments = []  # [first frame index, last frame index] of each written segment
+        self.frames_seen = 0
+        self.frames_written = 0
+        self.encode_ms = 0.0
+        self.max_queue_depth = 0
+        self._writer = None
+        self._error = None
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def _open(self, frame: np.ndarray):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        h, w = frame.shape[:2]
+        self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+        if not self._writer.isOpened():
+            raise RuntimeError(f"Cannot open {self.path} for writing with codec {self.fourcc}")
+
+    def _encode(self):
+        while True:
+            handle = self._queue.get()
+            if handle is _END:
+                break
+            try:
+                if self._error is None:
+                    start = time.perf_counter()
+                    if self._writer is None:
+                        self._open(handle.array)
+                    self._writer.write(handle.array)
+                    self.encode_ms += (time.perf_counter() - start) * 1000
+                    self.frames_written += 1
+            except Exception as e:
+                # Keep draining so producers never block on a dead encoder
+                print(f"Video export error: {str(e)}")
+                self._error = e
+            finally:
+                handle.release()
+
+    def _enqueue(self, index: int, handle):
+        if self.segments and self.segments[-1][1] == index - 1:
+            self.segments[-1][1] = index
+        else:
+            self.segments.append([index, index])
+        self._queue.put(handle)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def write(self, frame_index: int, frame: np.ndarray, detections=None):
+        """
+        Queue a frame for encoding. The frame is copied, so the caller may
+        reuse its buffer as soon as this returns.
+        """
+        if self._error is not None:
+            return
+        self.frames_seen += 1
+        has_detections = detections is not None and len(detections) > 0
+        if self.detections_only and not has_detections and self._post == 0:
+            if self.pre_roll == 0:
+                return
+            # Not (yet) part of a segment: keep it as pre-roll
+            if len(self._pre) == self.pre_roll:
+                self._pre.popleft()[1].release()
+        handle = self.pool.acquire(frame.shape)
+        np.copyto(handle.array, frame)
+
+        if not self.detections_only:
+            self._enqueue(frame_index, handle)
+        elif has_detections:
+            while self._pre:
+                self._enqueue(*self._pre.popleft())
+            self._enqueue(frame_index, handle)
+            self._post = self.post_roll
+        elif self._post > 0:
+            self._enqueue(frame_index, handle)
+            self._post -= 1
+        else:
+            self._pre.append((frame_index, handle))
+
+    def close(self) -> dict:
+        """Finish encoding, close the file and return the export statistics"""
+        while self._pre:
+            self._pre.popleft()[1].release()
+        self._queue.put(_END)
+        self._thread.join()
+        if self._writer is not None:
+            self._writer.release()
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            'path': self.path,
+            'frames_seen': self.frames_seen,
+            'frames_written': self.frames_written,
+            'segments': [tuple(segment) for segment in self.segments],
+            'encode_ms_per_frame': self.encode_ms / self.frames_written if self.frames_written else 0.0,
+            'max_queue_depth': self.max_queue_depth,
+        }
+
+
+def from_config(config, video_path: str) -> Optional[VideoExporter]:
+    """VideoExporter for video_path configured from config.py, or None if EXPORT_VIDEO_PATH is None"""
+    if config.EXPORT_VIDEO_PATH is None:
+        return None
+    return VideoExporter(config.EXPORT_VIDEO_PATH, video_fps(video_path), config.EXPORT_QUEUE_SIZE,
+                         config.EXPORT_DETECTIONS_ONLY, config.EXPORT_PRE_ROLL, config.EXPORT_POST_ROLL)
@@ -0,0 +1,194 @@
+import queue
+import threading
+import time
+import cv2
+from typing import Callable, Optional
+from stage_timer import StageTimer
+
+# Marks the end of the stream in the stage queues
+_END = object()
+
+
+class VideoPipeline:
+    """
+    Three-stage video pipeline: decode -> inference -> render.
+    Decode and inference run on their own threads connected by bounded queues,
+    rendering runs on the calling thread (cv2.imshow must stay on it).
+    Each stage is a single consumer of a FIFO queue, so frames come out in order.
+    """
+
+    def __init__(self, detector, queue_size: int = 4, headless: bool = False,
+                 window_name: str = 'Detection', timer: Optional[StageTimer] = None,
+                 gate=None, keyframe_tracker=None):
+        """
+        Args:
+            detector: TargetDetector instance
+            queue_size: Maximum number of batches buffered between two stages
+            headless: Skip cv2.imshow/waitKey and run as fast as possible
+            window_name: Name of the display window
+            timer: StageTimer receiving per-stage times; each batch carries its
+                   StageSample through the queues and is committed on render
+            gate: Optional ChangeGate that skips inference on unchanged frames
+            keyframe_tracker: Optional KeyframeTracker that runs the detector only
+                              on keyframes; takes precedence over gate
+        """
+        self.detector = detector
+        self.timer = timer if timer is not None else StageTimer()
+        self.gate = gate
+        self.keyframe_tracker = keyframe_tracker
+        self.runner = keyframe_tracker if keyframe_tracker is not None else gate
+        self.queue_size = max(1, int(queue_size))
+        self.headless = headless
+        self.window_name = window_name
+        self._stop = threading.Event()
+        self._error = None
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up when the pipeline is stopped"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        """Blocking get that returns _END when the pipeline is stopped"""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, stage: str, e: Exception):
+        print(f"Pipeline {stage} error: {str(e)}")
+        self._error = e
+        self._stop.set()
+
+    def _decode(self, cap, out_q: queue.Queue):
+        batch_size = self.detector.max_batch_size
+        index = 0
+        try:
+            while not self._stop.is_set():
+                timing = self.timer.begin()
+                frames = []
+                while len(frames) < batch_size:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    frames.append(frame)
+                timing.lap('capture')
+
+                if frames and not self._put(out_q, (index, frames, timing)):
+                    return
+                index += len(frames)
+
+                if len(frames) < batch_size:
+                    break
+        except Exception as e:
+            self._fail('decode', e)
+        finally:
+            self._put(out_q, _END)
+
+    def _infer(self, in_q: queue.Queue, out_q: queue.Queue):
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _END:
+                    break
+                index, frames, timing = item
+                timing.mark()
+                if self.runner is not None:
+                    results = self.runner.detect_batch(self.detector, frames, timing)
+                else:
+                    results = self.detector.detect_batch(frames, timing)
+                if not self._put(out_q, (index, frames, results, timing)):
+                    return
+        except Exception as e:
+            self._fail('inference', e)
+        finally:
+            self._put(out_q, _END)
+
+    def run(self, video_path: str,
+            sink: Optional[Callable[[int, object, object], None]] = None) -> Optional[dict]:
+        """
+        Process a video file through the pipeline
+        Args:
+            video_path: Path to the video file
+            sink: Optional callback sink(frame_index, frame_with_boxes, detections)
+                  called on the render thread for every frame, in order. The
+                  display is then not throttled to playback speed
+        Returns:
+            Dict with frames processed, elapsed seconds, fps, per-stage timing
+            percentiles and gating/tracking statistics, or None if the video could
+            not be opened
+        """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"Error: Could not open video file {video_path}")
+            return None
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_delay = 1 if sink is not None else (int(1000/fps) if fps > 0 else 30)
+
+        self._stop.clear()
+        self._error = None
+        decoded_q = queue.Queue(maxsize=self.queue_size)
+        detected_q = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._decode, args=(cap, decoded_q), daemon=True),
+            threading.Thread(target=self._infer, args=(decoded_q, detected_q), daemon=True),
+        ]
+
+        start_time = time.perf_counter()
+        frame_count = 0
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(detected_q)
+                if item is _END:
+                    break
+                index, frames, results, timing = item
+                timing.mark()
+                for offset, (frame, detections) in enumerate(zip(frames, results)):
+                    frame_with_boxes = self.detector.draw_boxes(frame, detections, in_place=True)
+                    timing.lap('draw')
+                    if sink is not None:
+                        sink(index + offset, frame_with_boxes, detections)
+                        timing.lap('emit')
+                    frame_count += 1
+
+                    if not self.headless:
+                        cv2.imshow(self.window_name, frame_with_boxes)
+                        key = cv2.waitKey(frame_delay)
+                        if key & 0xFF == ord('q'):
+                            self._stop.set()
+                            break
+                    timing.lap('emit')
+                self.timer.commit(timing, len(frames))
+                if self._stop.is_set():
+                    break
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            cap.release()
+            if not self.headless:
+                cv2.destroyAllWindows()
+
+        elapsed = time.perf_counter() - start_time
+        stats = {
+            'frames': frame_count,
+            'elapsed': elapsed,
+            'fps': frame_count / elapsed if elapsed > 0 else 0.0,
+            'stages': self.timer.percentiles(),
+        }
+        if self.keyframe_tracker is not None:
+            stats['tracking'] = self.keyframe_tracker.stats()
+        elif self.gate is not None:
+            stats['gating'] = self.gate.stats()
+        return stats
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+
+from detect_targets import TargetDetector
+from detections import Detections
+
+
+def no_boxes(frame):
+    return Detections.empty()
+
+
+class FakeDetector(TargetDetector):
+    """
+    TargetDetector without a model: boxes(frame) gives the detections of each
+    frame, filtered by conf_threshold. Records what it was asked to detect.
+    """
+
+    def __init__(self, boxes=no_boxes, conf_threshold=0.5, max_batch_size=8,
+                 model_path='fake.pt'):
+        self.model_path = model_path
+        self.backend_name = 'fake'
+        self.imgsz = 640
+        self.preprocessor = None
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = 0.45
+        self.max_batch_size = max_batch_size
+        self.errors = 0
+        self.boxes = boxes
+        self.inputs = []      # Shape of every frame, None for a missing one
+        self.batches = []     # Number of frames in each detect_batch call
+        self.thresholds = []  # conf_threshold of each detect_batch call
+
+    def detect_batch(self, frames, timing=None):
+        self.batches.append(len(frames))
+        self.thresholds.append(self.conf_threshold)
+        self.inputs.extend(None if frame is None else frame.shape for frame in frames)
+        return [Detections.empty() if frame is None or frame.size == 0
+                else self.boxes(frame).filter_conf(self.conf_threshold) for frame in frames]
+
+
+def pixel_box(frame):
+    """One box whose position is the frame's first pixel value, to tell frames apart"""
+    if frame[0, 0, 0] % 3 == 0:
+        # Slow frames, so that a worker finishes later frames first
+        time.sleep(0.05)
+    value = float(frame[0, 0, 0])
+    return Detections([[value, value, value + 1, value + 1]])
+
+
+def pixel_box_loader(threads):
+    """Picklable InferencePool loader: one frame per model call, boxes from pixel_box"""
+    return FakeDetector(pixel_box, max_batch_size=1)
+
+
+def failing_loader(threads):
+    raise RuntimeError("model file missing")
+
+
+def yolo_output(rows, num_classes=2):
+    """Raw (1, 4 + nc, N) output from (cx, cy, w, h, class, score) rows"""
+    pred = np.zeros((1, 4 + num_classes, len(rows)), dtype=np.float32)
+    for i, (cx, cy, w, h, cls, score) in enumerate(rows):
+        pred[0, :4, i] = cx, cy, w, h
+        pred[0, 4 + cls, i] = score
+    return pred
@@ -0,0 +1,108 @@
+import json
+import time
+
+import autotune
+import detect_targets
+
+
+def best(batch_size=1):
+    return {'backend': 'onnx', 'imgsz': 512, 'batch_size': batch_size, 'threads': 4,
+            'interop_threads': 1, 'batch_p50_ms': 10.0, 'images_per_sec': 100.0}
+
+
+def test_merge_profile_fills_only_unset_settings():
+    profile = {'backend': 'onnx', 'imgsz': 512, 'batch_size': 1, 'threads': 4, 'interop_threads': 2}
+    settings, used, kept = autotune.merge_profile(profile, backend=None, imgsz=640,
+                                                  batch_size=8, threads=None)
+    assert settings == {'backend': 'onnx', 'imgsz': 640, 'batch_size': 8, 'threads': 4,
+                        'interop_threads': 2}
+    assert used == ['backend onnx', 'threads 4', 'interop_threads 2']
+    assert kept == ['imgsz 640 (profile: 512)', 'batch_size 8 (profile: 1)']
+
+
+def test_merge_profile_skips_untuned_batch_size():
+    profile = {'backend': 'torch', 'imgsz': 640, 'batch_size': None, 'threads': 2, 'interop_threads': 1}
+    settings, _, kept = autotune.merge_profile(profile, backend=None, imgsz=None,
+                                               batch_size=None, threads=3)
+    assert settings['batch_size'] is None
+    # Explicit threads: the profile's inter-op count was tuned for other threads
+    assert settings['threads'] == 3 and settings['interop_threads'] is None
+    assert kept == ['threads 3 (profile: 2)']
+
+
+def test_latency_profile_leaves_batch_size_unset(tmp_path):
+    model = tmp_path / 'model.pt'
+    model.write_bytes(b'weights')
+    path = str(tmp_path / 'profile.json')
+    autotune.save_profile(path, str(model), best(), 'latency', None)
+    profile = autotune.load_profile(path, str(model), max_age_days=30)
+    assert profile['batch_size'] is None
+    assert profile['backend'] == 'onnx' and profile['threads'] == 4
+
+    autotune.save_profile(path, str(model), best(8), 'throughput', None)
+    assert autotune.load_profile(path, str(model), max_age_days=30)['batch_size'] == 8
+
+
+def test_profile_age_is_per_model(tmp_path):
+    old, new = tmp_path / 'old.pt', tmp_path / 'new.pt'
+    old.write_bytes(b'old weights')
+    new.write_bytes(b'new weights')
+    path = str(tmp_path / 'profile.json')
+    autotune.save_profile(path, str(old), best(), 'latency', None)
+    with open(path) as f:
+        data = json.load(f)
+    for entry in data['models'].values():
+        entry['created'] = time.time() - 40 * 86400
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+    # Re-tuning another model doesn't make the old entry fresh again
+    autotune.save_profile(path, str(new), best(), 'latency', None)
+    assert autotune.load_profile(path, str(old), max_age_days=30) is None
+    assert autotune.load_profile(path, str(new), max_age_days=30) is not None
+
+
+def make_config(profile_path):
+    class Config:
+        BACKEND, IMGSZ, BATCH_SIZE = 'onnx', 512, 4
+        TUNING_PROFILE_PATH = profile_path
+        TUNING_PROFILE_SETTINGS = ['backend', 'imgsz']
+    return Config
+
+
+def test_merge_profile_overrides_listed_settings():
+    profile = {'backend': 'openvino', 'imgsz': 640, 'batch_size': 1, 'threads': None,
+               'interop_threads': None}
+    settings, used, kept = autotune.merge_profile(profile, ['backend', 'imgsz'], backend='onnx',
+                                                  imgsz=640, batch_size=4, threads=None)
+    assert settings['backend'] == 'openvino' and settings['imgsz'] == 640
+    assert settings['batch_size'] == 4
+    assert used == ['backend openvino (instead of onnx)']
+    assert kept == ['batch_size 4 (profile: 1)']
+
+
+def test_config_settings_are_used_without_a_profile(tmp_path, monkeypatch):
+    loaded = []
+    monkeypatch.setattr(detect_targets, 'load_backend',
+                        lambda *args, **kwargs: loaded.append(args) or object())
+    config = make_config(str(tmp_path / 'missing.json'))
+    detector = detect_targets.TargetDetector('model.pt', **autotune.detector_settings(config))
+
+    assert loaded == [('onnx', 'model.pt', 512)]
+    assert detector.profile is None and detector.max_batch_size == 4
+
+
+def test_current_profile_replaces_only_listed_settings(tmp_path, monkeypatch):
+    loaded = []
+    monkeypatch.setattr(detect_targets, 'load_backend',
+                        lambda *args, **kwargs: loaded.append(args) or object())
+    model = tmp_path / 'model.pt'
+    model.write_bytes(b'weights')
+    config = make_config(str(tmp_path / 'profile.json'))
+    tuned = dict(best(8), backend='openvino', imgsz=320)
+    autotune.save_profile(config.TUNING_PROFILE_PATH, str(model), tuned, 'throughput', None)
+
+    detector = detect_targets.TargetDetector(str(model), **autotune.detector_settings(config))
+    assert loaded == [('openvino', str(model), 320)]
+    # batch_size is not in TUNING_PROFILE_SETTINGS, so config.py's value stays
+    assert detector.max_batch_size == 4
@@ -0,0 +1,107 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from backends import FixedShapePreprocessor, candidates, letterbox, postprocess, preprocess
+from fakes import yolo_output
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'data', 'ForTest', 'Pic', '1.jpg')
+
+
+@pytest.fixture
+def image():
+    """A non-square crop of a test image, upscaled so the letterbox resizes it"""
+    return cv2.resize(cv2.imread(FIXTURE)[:400], (1280, 800))
+
+
+def test_same_shape_batch_is_padded_to_a_stride_aligned_rectangle(image):
+    batch, meta = preprocess([image, image], 640)
+    # 1280x800 -> 640x400, padded to 640x416 as the torch backend does
+    assert batch.shape == (2, 3, 416, 640)
+    assert meta[0] == (0.5, (0, 8), (800, 1280))
+    assert batch.dtype == np.float32 and 0.0 <= batch.min() and batch.max() <= 1.0
+    np.testing.assert_allclose(batch[0, :, :8], 114 / 255.0, rtol=1e-6)
+
+
+def test_mixed_shape_batch_is_padded_to_a_square(image):
+    batch, meta = preprocess([image, image[:, :800]], 640)
+    assert batch.shape == (2, 3, 640, 640)
+    assert meta[0] == (0.5, (0, 120), (800, 1280))
+    assert meta[1] == (0.8, (0, 0), (800, 800))
+
+
+def test_letterbox_matches_ultralytics(image):
+    augment = pytest.importorskip('ultralytics.data.augment')
+    for stride, auto in ((32, True), (None, False)):
+        reference = augment.LetterBox((640, 640), auto=auto, stride=32)(image=image)
+        np.testing.assert_array_equal(letterbox(image, 640, stride)[0], reference)
+
+
+def test_candidates_decode_and_threshold():
+    pred = yolo_output([(100, 100, 40, 80, 0, 0.9), (300, 200, 20, 20, 1, 0.2)])[0]
+    xyxy, conf, cls = candidates(pred, 0.25)
+    assert xyxy.tolist() == [[80, 60, 120, 140]]
+    assert conf.tolist() == [np.float32(0.9)] and cls.tolist() == [0]
+
+
+def test_postprocess_runs_nms_and_undoes_letterbox():
+    pred = yolo_output([
+        (100, 100, 40, 80, 0, 0.9),
+        (102, 100, 40, 80, 0, 0.7),   # Duplicate of the first box
+        (104, 100, 40, 80, 1, 0.6),   # Same place, other class
+        (630, 400, 40, 40, 1, 0.8),   # Crosses the right and bottom edges of the image
+        (300, 200, 20, 20, 0, 0.1),   # Below the threshold
+    ])
+    # 1280x800 frame letterboxed to 640x416: gain 0.5, 8 pixels of padding on top
+    detections = postprocess(pred, [(0.5, (0, 8), (800, 1280))], 0.25, 0.45)[0]
+
+    assert detections.conf.tolist() == [np.float32(c) for c in (0.9, 0.8, 0.6)]
+    assert detections.cls.tolist() == [0, 1, 1]
+    np.testing.assert_allclose(detections.xyxy, [[160, 104, 240, 264],
+                                                 [1220, 744, 1280, 800],
+                                                 [168, 104, 248, 264]])
+    assert len(postprocess(yolo_output([(0, 0, 1, 1, 0, 0.1)]), [(1.0, (0, 0), (10, 10))],
+                           0.25, 0.45)[0]) == 0
+
+
+def test_fixed_shape_preprocessor_matches_preprocess(image):
+    preprocessor = FixedShapePreprocessor((640, 416), max_batch_size=2)
+    small = cv2.resize(image, (320, 200))
+    batch, meta = preprocessor([image, small])
+    expected, expected_meta = preprocess([image], 640)
+
+    assert batch.shape == (2, 3, 416, 640)
+    assert meta[0] == expected_meta[0] == (0.5, (0, 8), (800, 1280))
+    np.testing.assert_allclose(batch[0], expected[0], atol=1e-6)
+    # A smaller frame is scaled up into the same input
+    assert meta[1] == (2.0, (0, 8), (200, 320))
+    np.testing.assert_allclose(batch[1], preprocess([small], 640)[0][0], atol=1e-6)
+
+
+def test_fixed_shape_preprocessor_caches_geometry_per_slot(image):
+    preprocessor = FixedShapePreprocessor((640, 416), max_batch_size=2)
+    preprocessor([image, image])
+    first = preprocessor([image, image])[0].copy()
+    assert preprocessor.geometry_updates == 2
+
+    # A new shape in one slot recomputes only that slot, padding included
+    square = cv2.resize(image, (800, 800))
+    batch, meta = preprocessor([image, square])
+    assert preprocessor.geometry_updates == 3
+    np.testing.assert_array_equal(batch[0], first[0])
+    left, top = meta[1][1]
+    assert (left, top) == (112, 0)
+    np.testing.assert_allclose(batch[1, :, :, :left], 114 / 255.0, rtol=1e-6)
+    resized = cv2.resize(square, (416, 416), interpolation=cv2.INTER_LINEAR)
+    np.testing.assert_allclose(batch[1, :, :, 112:528], resized[..., ::-1].transpose(2, 0, 1) / 255.0,
+                               atol=1e-6)
+
+
+def test_fixed_shape_preprocessor_rejects_unaligned_sizes_and_large_batches(image):
+    with pytest.raises(ValueError):
+        FixedShapePreprocessor((640, 400))
+    with pytest.raises(ValueError):
+        FixedShapePreprocessor((640, 416), max_batch_size=1)([image, image])
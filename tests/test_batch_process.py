@@ -0,0 +1,42 @@
+import json
+
+from batch_process import JsonlWriter, load_manifest, truncate_partial_line
+
+
+def test_truncate_partial_line(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    path.write_bytes(b'{"a": 1}\n{"b": 2}\n{"c": ')
+    truncate_partial_line(str(path))
+    assert path.read_bytes() == b'{"a": 1}\n{"b": 2}\n'
+    truncate_partial_line(str(path))
+    assert path.read_bytes() == b'{"a": 1}\n{"b": 2}\n'
+
+    path.write_bytes(b'no newline at all')
+    truncate_partial_line(str(path))
+    assert path.read_bytes() == b''
+
+
+def test_manifest_ignores_torn_last_path(tmp_path):
+    manifest = tmp_path / 'out.jsonl.done'
+    manifest.write_text('a.jpg\nb.jpg\nvideo.m')
+    assert load_manifest(str(manifest)) == {'a.jpg', 'b.jpg'}
+    assert manifest.read_text() == 'a.jpg\nb.jpg\n'
+
+
+def test_resume_keeps_only_records_of_completed_inputs(tmp_path):
+    output = str(tmp_path / 'out.jsonl')
+    writer = JsonlWriter(output, resume=False)
+    writer.write('a.jpg', [{'file': 'a.jpg', 'frame': 0}])
+    writer.finish('a.jpg')
+    # Interrupted mid-video: some records written, never marked done
+    writer.write('v.mp4', [{'file': 'v.mp4', 'frame': 0}, {'file': 'v.mp4', 'frame': 1}])
+    writer.close()
+    with open(output, 'a') as f:
+        f.write('{"file": "v.mp4", "fra')
+
+    writer = JsonlWriter(output, resume=True, done={'a.jpg'})
+    writer.write('v.mp4', [{'file': 'v.mp4', 'frame': 0}])
+    writer.close()
+    with open(output) as f:
+        records = [json.loads(line) for line in f]
+    assert records == [{'file': 'a.jpg', 'frame': 0}, {'file': 'v.mp4', 'frame': 0}]
@@ -0,0 +1,40 @@
+from benchmark import compare, mismatches, run_key
+
+
+def _results(p50, **key):
+    results = {'model_load_ms': 100.0, 'detect': {'640x416': {'p50': p50, 'p95': p50, 'p99': p50}}}
+    results.update(key)
+    return results
+
+
+def test_run_key_identifies_model_backend_size_and_machine(tmp_path):
+    model = tmp_path / 'model.pt'
+    model.write_bytes(b'weights')
+    key = run_key(str(model), 'onnx', 640)
+
+    assert key['model'] == 'model.pt' and key['backend'] == 'onnx' and key['imgsz'] == 640
+    assert key['model_hash'] and key['machine']['cpu_count']
+
+    model.write_bytes(b'retrained')
+    assert run_key(str(model), 'onnx', 640)['model_hash'] != key['model_hash']
+
+
+def test_mismatches_reports_differing_conditions():
+    key = {'model': 'a.pt', 'model_hash': 'x', 'backend': 'torch', 'imgsz': 640,
+           'machine': {'host': 'h', 'cpu_count': 8}}
+    assert mismatches(dict(key), dict(key)) == []
+
+    other = dict(key, backend='onnx', machine={'host': 'h', 'cpu_count': 4})
+    assert mismatches(other, key) == ['backend: torch -> onnx', 'machine.cpu_count: 8 -> 4']
+
+    # Baselines saved before these fields were recorded are not comparable
+    assert len(mismatches(key, {})) == 6
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    rows = {row[0]: row for row in compare(_results(12.0), _results(10.0), 0.15)}
+    assert rows['detect_640x416_p50_ms'][4]
+    assert not rows['model_load_ms'][4]
+
+    rows = {row[0]: row for row in compare(_results(11.0), _results(10.0), 0.15)}
+    assert not rows['detect_640x416_p50_ms'][4]
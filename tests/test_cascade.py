@@ -0,0 +1,68 @@
+import numpy as np
+
+from cascade import CascadeDetector, merge_regions
+from detections import Detections
+from fakes import FakeDetector
+from tiling import TiledDetector
+
+
+def test_merge_regions_merges_chains_of_overlaps():
+    regions = np.array([[0, 0, 10, 10], [5, 5, 20, 20], [30, 30, 40, 40], [19, 0, 31, 31]])
+    assert merge_regions(regions).tolist() == [[0, 0, 40, 40]]
+
+
+def test_merge_regions_keeps_disjoint_and_touching_regions():
+    regions = np.array([[0, 0, 10, 10], [10, 0, 20, 10], [50, 50, 60, 60]])
+    assert len(merge_regions(regions)) == 3
+    assert merge_regions(np.zeros((0, 4))).shape == (0, 4)
+
+
+def confident(frame):
+    return Detections([[10, 10, 50, 50]], [0.9], [0])
+
+
+def near_threshold(frame):
+    return Detections([[10, 10, 50, 50], [500, 300, 540, 340]], [0.9, 0.5], [0, 1])
+
+
+def crowded(frame):
+    return Detections([[100, 100, 200, 200], [120, 110, 220, 210]], [0.9, 0.85], [0, 0])
+
+
+def centre_box(frame):
+    h, w = frame.shape[:2]
+    return Detections([[w / 2 - 20, h / 2 - 20, w / 2 + 20, h / 2 + 20]], [0.8], [1])
+
+
+def test_confident_frames_are_not_escalated():
+    accurate = FakeDetector(centre_box)
+    cascade = CascadeDetector(FakeDetector(confident, conf_threshold=0.55), accurate)
+    result = cascade.detect(np.zeros((416, 640, 3), dtype=np.uint8))
+    assert result.xyxy.tolist() == [[10, 10, 50, 50]]
+    assert accurate.inputs == []
+    assert cascade.stats()['escalation_rate'] == 0.0
+
+
+def test_near_threshold_region_is_replaced_by_accurate_model():
+    fast = FakeDetector(near_threshold, conf_threshold=0.55)
+    accurate = FakeDetector(centre_box)
+    # The fast pass must see the 0.5 box through the tiling wrapper
+    cascade = CascadeDetector(TiledDetector(fast, tile_size=4000), accurate)
+    result = cascade.detect(np.zeros((416, 640, 3), dtype=np.uint8))
+    assert fast.conf_threshold == 0.55
+    assert accurate.inputs == [(128, 128, 3)]
+    assert sorted(result.cls.tolist()) == [0, 1]
+    assert result.xyxy[result.cls == 1].tolist() == [[500, 300, 540, 340]]
+    stats = cascade.stats()
+    assert stats['reasons'] == {'ambiguous': 1, 'crowded': 0}
+    assert stats['escalated_regions'] == 1
+
+
+def test_crowded_frame_escalates_whole_frame_without_regions():
+    accurate = FakeDetector(centre_box)
+    cascade = CascadeDetector(FakeDetector(crowded, conf_threshold=0.55), accurate, regions=False)
+    result = cascade.detect(np.zeros((416, 640, 3), dtype=np.uint8))
+    assert accurate.inputs == [(416, 640, 3)]
+    assert result.xyxy.tolist() == [[300, 188, 340, 228]]
+    assert cascade.stats()['full_frame_escalations'] == 1
+    assert cascade.stats()['reasons']['crowded'] == 1
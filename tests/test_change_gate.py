@@ -0,0 +1,62 @@
+import numpy as np
+
+from change_gate import FULL, REGION, SKIP, ChangeGate
+from detections import Detections
+from fakes import FakeDetector
+
+
+def full_or_crop(frame):
+    """Two boxes on a full frame, one on a crop"""
+    if frame.shape[:2] == (480, 640):
+        return Detections([[10, 10, 30, 30], [100, 100, 140, 140]], cls=[0, 1])
+    return Detections([[5, 5, 20, 20]], cls=[2])
+
+
+def blank():
+    return np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+def with_patch():
+    frame = blank()
+    frame[100:140, 100:140] = 255
+    return frame
+
+
+def test_decisions_full_skip_region():
+    gate = ChangeGate()
+    assert gate.decide(blank()) == (FULL, None)
+    assert gate.decide(blank()) == (SKIP, None)
+
+    mode, region = gate.decide(with_patch())
+    assert mode == REGION
+    x1, y1, x2, y2 = region
+    assert x1 <= 100 and y1 <= 100 and x2 >= 140 and y2 >= 140
+    assert x2 - x1 >= gate.min_region and y2 - y1 >= gate.min_region
+    # The reference advanced over the region, so the patch is now static
+    assert gate.decide(with_patch())[0] == SKIP
+
+    assert gate.decide(np.full((480, 640, 3), 200, dtype=np.uint8))[0] == FULL
+    assert gate.decide(np.zeros((240, 320, 3), dtype=np.uint8))[0] == FULL
+    assert gate.stats()['frames'] == 6 and gate.stats()['skipped'] == 2
+
+
+def test_max_skip_forces_full_detection():
+    gate = ChangeGate(max_skip=2)
+    modes = [gate.decide(blank())[0] for _ in range(5)]
+    assert modes == [FULL, SKIP, SKIP, FULL, SKIP]
+
+
+def test_detect_batch_reuses_and_merges_detections():
+    gate = ChangeGate()
+    detector = FakeDetector(full_or_crop)
+    first, skipped, region = gate.detect_batch(detector, [blank(), blank(), with_patch()])
+
+    # One full frame and one crop in a single batch; the skipped frame runs nothing
+    assert detector.inputs[0] == (480, 640, 3) and detector.batches == [2]
+    assert skipped is first
+    # The box inside the dirty region is replaced by the crop's box, offset back
+    assert sorted(region.cls.tolist()) == [0, 2]
+    crop_box = region.xyxy[region.cls == 2][0]
+    assert (crop_box[:2] >= 5).all() and crop_box[0] < 140
+
+    assert len(gate.detect(detector, None)) == 0
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+import detect_targets
+from detect_targets import process_images
+from fakes import FakeDetector, yolo_output
+
+
+def test_process_images_reads_one_batch_at_a_time(tmp_path, monkeypatch):
+    paths = []
+    for i in range(5):
+        paths.append(str(tmp_path / f'{i}.png'))
+        cv2.imwrite(paths[-1], np.full((8, 8, 3), i, dtype=np.uint8))
+    paths.insert(2, str(tmp_path / 'missing.png'))
+
+    reads = []
+    imread = cv2.imread
+    monkeypatch.setattr(detect_targets.cv2, 'imread', lambda path: reads.append(path) or imread(path))
+
+    detector = FakeDetector(max_batch_size=2)
+    results = process_images(iter(paths), detector)
+    assert reads == []
+
+    first = next(results)
+    assert reads == paths[:2]
+    assert first[0, 0, 0] == 0
+
+    rest = list(results)
+    assert reads == paths
+    assert detector.batches == [2, 2, 2]
+    assert rest[1] is None
+    assert [image[0, 0, 0] for image in rest if image is not None] == [1, 2, 3, 4]
+
+
+class FixedOutputBackend:
+    """Backend whose network returns the same raw YOLO output for every frame"""
+
+    def __init__(self, pred):
+        self.pred = pred
+        self.batches = []
+
+    def infer(self, batch):
+        self.batches.append(batch.shape)
+        return np.repeat(self.pred, len(batch), axis=0)
+
+
+def test_detect_raw_skips_invalid_frames_and_clips_boxes():
+    detector = FakeDetector()
+    detector.backend = FixedOutputBackend(yolo_output([
+        (100, 100, 40, 80, 0, 0.9),
+        (630, 400, 40, 40, 1, 0.5),   # Crosses the right and bottom edges of the image
+        (300, 200, 20, 20, 0, 0.005),
+    ]))
+    frame = np.zeros((800, 1280, 3), dtype=np.uint8)
+    rows = detector.detect_raw([None, frame, np.zeros((0, 0, 3), dtype=np.uint8)], min_conf=0.01)
+
+    assert detector.backend.batches == [(1, 3, 416, 640)]
+    assert rows[0].shape == rows[2].shape == (0, 6) and rows[0].dtype == np.float32
+    np.testing.assert_allclose(rows[1], [[160, 104, 240, 264, 0.9, 0],
+                                         [1220, 744, 1280, 800, 0.5, 1]], rtol=1e-6)
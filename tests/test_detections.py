@@ -0,0 +1,73 @@
+import numpy as np
+
+from detections import Detections, box_iou, nms
+
+
+def test_detections_defaults_and_dtypes():
+    detections = Detections([[0, 0, 10, 20], [5, 5, 15, 15]])
+    assert len(detections) == 2
+    assert detections.xyxy.dtype == np.float32 and detections.xyxy.flags['C_CONTIGUOUS']
+    assert detections.conf.tolist() == [1.0, 1.0]
+    assert detections.cls.dtype == np.int32 and detections.cls.tolist() == [0, 0]
+    assert detections.ids is None
+    assert len(Detections.empty()) == 0 and Detections.empty().xyxy.shape == (0, 4)
+
+
+def test_detections_geometry():
+    detections = Detections([[0, 0, 10, 20], [20, 20, 30, 30]])
+    assert detections.widths.tolist() == [10, 10]
+    assert detections.heights.tolist() == [20, 10]
+    assert detections.areas().tolist() == [200, 100]
+    assert detections.centers().tolist() == [[5, 10], [25, 25]]
+    assert detections.closest_to(24, 24) == 1
+    assert Detections.empty().closest_to(0, 0) is None
+
+
+def test_detections_selection_keeps_arrays_aligned():
+    detections = Detections([[0, 0, 10, 10], [0, 0, 50, 50], [0, 0, 5, 5]],
+                            [0.9, 0.3, 0.6], [0, 1, 2], ids=[7, 8, 9])
+    kept = detections.filter_conf(0.5)
+    assert kept.conf.tolist() == [np.float32(0.9), np.float32(0.6)]
+    assert kept.cls.tolist() == [0, 2] and kept.ids.tolist() == [7, 9]
+    assert detections.filter_classes([1]).ids.tolist() == [8]
+    assert detections.filter_area(min_area=50, max_area=200).cls.tolist() == [0]
+    assert detections[1].xyxy.tolist() == [[0, 0, 50, 50]]
+
+
+def test_detections_transforms_and_round_trip():
+    detections = Detections([[10, 10, 20, 20]], [0.5], [3], ids=[4])
+    assert detections.offset(5, -5).tolist() == [[15, 5, 25, 15]]
+    assert detections.scale(2, 0.5).tolist() == [[20, 5, 40, 10]]
+    assert Detections([[-5, -5, 700, 500]]).clip(640, 480).tolist() == [[0, 0, 640, 480]]
+
+    restored = Detections.from_dict(detections.to_dict())
+    assert restored.tolist() == detections.tolist()
+    assert restored.cls.tolist() == [3] and restored.ids.tolist() == [4]
+
+    combined = Detections.concatenate([detections, Detections.empty(), detections])
+    assert len(combined) == 2 and combined.ids.tolist() == [4, 4]
+
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10], [0, 0, 20, 20]])
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [100, 100, 110, 110]])
+    ious = box_iou(a, b)
+    assert ious.shape == (2, 3)
+    np.testing.assert_allclose(ious[0], [1.0, 50 / 150, 0.0], rtol=1e-6)
+    np.testing.assert_allclose(ious[1], [0.25, 0.25, 0.0], rtol=1e-6)
+    assert box_iou(np.zeros((0, 4)), b).shape == (0, 3)
+
+
+def test_nms_keeps_best_of_overlapping_boxes():
+    xyxy = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60], [0, 0, 10, 9]])
+    scores = np.array([0.8, 0.9, 0.7, 0.6])
+    assert nms(xyxy, scores, 0.5).tolist() == [1, 2]
+    assert nms(xyxy, scores, 0.5, max_det=1).tolist() == [1]
+    assert nms(np.zeros((0, 4)), np.zeros(0), 0.5).shape == (0,)
+
+
+def test_nms_is_class_aware():
+    xyxy = np.array([[0, 0, 10, 10], [0, 0, 10, 10]])
+    scores = np.array([0.9, 0.8])
+    assert nms(xyxy, scores, 0.5).tolist() == [0]
+    assert nms(xyxy, scores, 0.5, classes=np.array([0, 1])).tolist() == [0, 1]
@@ -0,0 +1,62 @@
+import numpy as np
+
+from detections import Detections
+from evaluate import (IOU_THRESHOLDS, average_precision, compute_metrics, default_label_dir,
+                      match_predictions, read_labels)
+
+
+def test_read_labels_converts_yolo_rows_to_pixels(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_text('1 0.5 0.5 0.2 0.4\n')
+    labels = read_labels(str(path), 100, 50)
+    np.testing.assert_allclose(labels.xyxy, [[40, 15, 60, 35]], atol=1e-4)
+    assert labels.cls.tolist() == [1]
+    assert len(read_labels(str(tmp_path / 'missing.txt'), 100, 50)) == 0
+    assert default_label_dir('data/valid/images') == 'data/valid/labels'
+
+
+def test_match_predictions_per_iou_threshold():
+    labels = Detections([[0, 0, 10, 10]], cls=[0])
+    # IoU 0.62 with the label: a true positive only up to the 0.6 threshold
+    correct = match_predictions(Detections([[0, 0, 10, 6.2]], cls=[0]), labels)
+    assert correct[0].tolist() == [t <= 0.6 for t in IOU_THRESHOLDS]
+
+    # Other classes never match
+    assert not match_predictions(Detections([[0, 0, 10, 10]], cls=[1]), labels).any()
+
+
+def test_match_predictions_uses_each_label_once():
+    labels = Detections([[0, 0, 10, 10]], cls=[0])
+    predictions = Detections([[0, 0, 10, 8], [0, 0, 10, 10]], [0.9, 0.8], [0, 0])
+    correct = match_predictions(predictions, labels)
+    # The exact box takes the label at every threshold
+    assert correct[1].all()
+    assert not correct[0].any()
+
+
+def test_average_precision():
+    perfect = np.array([[0.5], [1.0]]), np.array([[1.0], [1.0]])
+    assert average_precision(*perfect).tolist() == [1.0]
+
+    # tp, fp, tp over two labels: precision 1 up to recall 0.5, then 2/3
+    recall = np.array([[0.5], [0.5], [1.0]])
+    precision = np.array([[1.0], [0.5], [2 / 3]])
+    np.testing.assert_allclose(average_precision(recall, precision), [(51 + 50 * 2 / 3) / 101])
+
+    # Recall never reaching 1 leaves the unreached points at zero
+    np.testing.assert_allclose(average_precision(np.array([[0.5]]), np.array([[1.0]])), [51 / 101])
+
+
+def test_compute_metrics():
+    correct = np.zeros((3, len(IOU_THRESHOLDS)), dtype=bool)
+    correct[0] = True
+    correct[2, :5] = True
+    metrics = compute_metrics(correct, np.array([0.9, 0.8, 0.3]), np.array([0, 0, 0]),
+                              np.array([0, 0]), conf_threshold=0.5)
+    np.testing.assert_allclose(metrics['map50'], (51 + 50 * 2 / 3) / 101)
+    assert metrics['map50_95'] < metrics['map50']
+    # Above the operating threshold: one of two predictions is right, one of two labels found
+    assert metrics['precision'] == 0.5 and metrics['recall'] == 0.5
+
+    empty = compute_metrics(np.zeros((0, 10), dtype=bool), np.zeros(0), np.zeros(0), np.zeros(0), 0.5)
+    assert empty == {'map50': 0.0, 'map50_95': 0.0, 'precision': 0.0, 'recall': 0.0}
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from frame_pool import FramePool, LatestFrameQueue
+
+
+def filled(pool, value):
+    handle = pool.acquire((2, 2, 3))
+    handle.array[...] = value
+    return handle
+
+
+def test_frame_pool_reuses_buffers_of_the_same_shape():
+    pool = FramePool(2)
+    first = pool.acquire((4, 4, 3))
+    array = first.array
+    first.release()
+    again = pool.acquire((4, 4, 3))
+    assert again.array is array
+    assert pool.stats()['allocations'] == 1
+
+    again.release()
+    resized = pool.acquire((8, 4, 3))
+    assert resized.array.shape == (8, 4, 3) and resized.array.dtype == np.uint8
+    assert pool.stats()['allocations'] == 2
+
+
+def test_frame_pool_exhaustion_and_release():
+    pool = FramePool(2)
+    handles = [pool.acquire((2, 2, 3)) for _ in range(2)]
+    assert pool.acquire((2, 2, 3), timeout=0.01) is None
+    stats = pool.stats()
+    assert stats['in_use'] == 2 and stats['exhausted'] == 1 and stats['acquired'] == 2
+
+    handles[0].release()
+    assert pool.acquire((2, 2, 3), timeout=0.01) is not None
+
+
+def test_frame_pool_rejects_double_release():
+    pool = FramePool(1)
+    handle = pool.acquire((2, 2, 3))
+    handle.release()
+    with pytest.raises(RuntimeError):
+        handle.release()
+
+
+def test_latest_frame_queue_notifies_once_until_taken():
+    pool = FramePool(4)
+    frames = LatestFrameQueue(2)
+    assert frames.put(filled(pool, 1))
+    assert not frames.put(filled(pool, 2))
+    handle = frames.take_latest()
+    assert handle.array[0, 0, 0] == 2
+    handle.release()
+    # Taking re-arms the notification
+    assert frames.put(filled(pool, 3))
+
+
+def test_latest_frame_queue_drops_oldest_when_full():
+    pool = FramePool(3)
+    frames = LatestFrameQueue(1)
+    for value in range(5):
+        frames.put(filled(pool, value))
+    assert pool.stats()['in_use'] == 1
+    handle = frames.take_latest()
+    assert handle.array[0, 0, 0] == 4
+    handle.release()
+    assert frames.take_latest() is None
+    assert frames.stats() == {'capacity': 1, 'depth': 0, 'max_depth': 1, 'delivered': 1, 'dropped': 4}
+
+
+def test_take_latest_releases_older_frames():
+    pool = FramePool(4)
+    frames = LatestFrameQueue(3)
+    for value in range(3):
+        frames.put(filled(pool, value))
+    handle = frames.take_latest()
+    assert handle.array[0, 0, 0] == 2
+    assert pool.stats()['in_use'] == 1
+    handle.release()
+    assert frames.stats()['dropped'] == 2
+
+
+def test_clear_releases_queued_frames():
+    pool = FramePool(2)
+    frames = LatestFrameQueue(2)
+    frames.put(filled(pool, 0))
+    frames.put(filled(pool, 1))
+    frames.clear()
+    assert pool.stats()['in_use'] == 0
+    assert frames.put(filled(pool, 2))
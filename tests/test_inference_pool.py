@@ -0,0 +1,37 @@
+import pytest
+
+from fakes import failing_loader, pixel_box_loader
+from inference_pool import InferencePool
+
+
+def test_results_come_back_in_order_through_recycled_slots():
+    frames = 20
+    with InferencePool((4, 4, 3), workers=2, slots=4, loader=pixel_box_loader) as pool:
+        submitted = results = 0
+        used_slots = set()
+        while results < frames:
+            while submitted < frames:
+                slot = pool.acquire()
+                if slot is None:
+                    break
+                used_slots.add(slot)
+                pool.frames[slot] = submitted
+                pool.submit(slot)
+                submitted += 1
+            assert pool.pending() <= 4
+            seq, slot, detections = pool.next_result()
+            assert seq == results
+            assert int(pool.frames[slot][0, 0, 0]) == seq
+            assert detections.xyxy[0, 0] == seq
+            pool.release(slot)
+            results += 1
+
+        stats = pool.stats()
+        assert sorted(pool.free) == [0, 1, 2, 3] and used_slots == {0, 1, 2, 3}
+        assert stats['frames'] == frames and sum(stats['worker_frames']) == frames
+        assert 1 <= stats['max_reorder'] <= 4
+
+
+def test_worker_load_failure_is_reported():
+    with pytest.raises(RuntimeError, match='model file missing'):
+        InferencePool((4, 4, 3), workers=1, slots=2, loader=failing_loader)
@@ -0,0 +1,83 @@
+import types
+
+import numpy as np
+import pytest
+
+import latency_budget
+from fakes import FakeDetector, no_boxes
+from latency_budget import BudgetedDetector
+
+SIZES = [(640, 416), (320, 224)]
+
+
+class Clock:
+    """perf_counter replacement that only moves when a fake model runs"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.scale = 1.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(latency_budget, 'time', types.SimpleNamespace(perf_counter=clock))
+    return clock
+
+
+def timed_detector(clock, model_path, costs_ms):
+    """FakeDetector taking costs_ms[input width] of fake time per frame"""
+    detector = FakeDetector(model_path=model_path)
+
+    def boxes(frame):
+        clock.now += costs_ms[detector.preprocessor.width] * clock.scale / 1000
+        return no_boxes(frame)
+    detector.boxes = boxes
+    return detector
+
+
+def run(budget, frames):
+    frame = np.zeros((416, 640, 3), dtype=np.uint8)
+    points = []
+    for _ in range(frames):
+        budget.detect(frame)
+        points.append(budget.index)
+    return points
+
+
+def test_steps_down_and_back_up_with_hysteresis(clock):
+    costs = {'primary.pt': {640: 20, 320: 14}, 'small.pt': {640: 12, 320: 8}}
+    budget = BudgetedDetector(timed_detector(clock, 'primary.pt', costs['primary.pt']), 10, SIZES,
+                              max_stride=1, models=['small.pt'], window=4,
+                              loader=lambda path: timed_detector(clock, path, costs[path]))
+
+    # Over budget: one step after each window until small.pt at 320x224 fits
+    assert run(budget, 16) == [0] * 3 + [1] * 4 + [2] * 4 + [3] * 5
+    assert budget.operating_point() == {'model': 'small.pt', 'input_size': [320, 224], 'stride': 1}
+    assert run(budget, 8) == [3] * 8
+
+    # Much cheaper now, but small.pt at 640x416 was over budget recently
+    clock.scale = 0.3
+    assert set(run(budget, 30)) == {3}
+    # Once that measurement is old, it is tried again, and then the next one up
+    points = run(budget, 20)
+    assert points[-1] < 3 and sorted(points, reverse=True) == points
+    assert budget.switches == 3 + (3 - points[-1])
+
+
+def test_strides_over_frames_once_sizes_and_models_are_exhausted(clock):
+    detector = timed_detector(clock, 'primary.pt', {640: 30, 320: 30})
+    budget = BudgetedDetector(detector, 10, SIZES, max_stride=3, window=6)
+
+    run(budget, 12)
+    assert budget.operating_point()['stride'] == 2
+    calls = len(detector.batches)
+    run(budget, 6)
+    # Every other frame reuses the previous detections
+    assert len(detector.batches) - calls == 3
+    run(budget, 6)
+    assert budget.operating_point()['stride'] == 3
+    assert budget.stats()['detected_frames'] < budget.stats()['frames']
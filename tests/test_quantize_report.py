@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+import backends
+from quantize_report import split_images
+
+
+def test_split_images_holds_out_evaluation_set():
+    paths = [f'{i}.jpg' for i in range(10)]
+    calibration, evaluation = split_images(paths, 0.5)
+
+    assert len(calibration) == 5 and len(evaluation) == 5
+    assert not set(calibration) & set(evaluation)
+    assert sorted(calibration + evaluation) == sorted(paths)
+    # Fixed seed, so the cached INT8 model is reused across runs
+    assert split_images(list(reversed(paths)), 0.5) == (calibration, evaluation)
+
+
+def test_split_images_keeps_both_sets_non_empty():
+    calibration, evaluation = split_images(['a.jpg', 'b.jpg'], 1.0)
+    assert len(calibration) == 1 and len(evaluation) == 1
+    with pytest.raises(RuntimeError):
+        split_images(['a.jpg'], 0.5)
+
+
+def test_static_int8_path_is_keyed_by_calibration_set(tmp_path):
+    model = tmp_path / 'model.pt'
+    model.write_bytes(b'weights')
+    images = []
+    for name in ('a.jpg', 'b.jpg'):
+        (tmp_path / name).write_bytes(name.encode())
+        images.append(str(tmp_path / name))
+
+    static = backends.exported_model_path(str(model), 'onnx-int8-static', 640, images)
+    assert static != backends.exported_model_path(str(model), 'onnx-int8-static', 640, images[:1])
+
+    (tmp_path / 'b.jpg').write_bytes(b'changed')
+    assert static != backends.exported_model_path(str(model), 'onnx-int8-static', 640, images)
+
+    # Only static models depend on calibration images
+    dynamic = backends.exported_model_path(str(model), 'onnx-int8-dynamic', 640, images)
+    assert dynamic == backends.exported_model_path(str(model), 'onnx-int8-dynamic', 640, images[:1])
+    assert os.path.dirname(static) == str(tmp_path)
@@ -0,0 +1,142 @@
+import os
+import shutil
+import subprocess
+import time
+
+import numpy as np
+import pytest
+
+import screen_capture
+from screen_capture import AutoCapture, X11ShmCapture, clip_region
+
+
+def test_clip_region_inside_partial_and_outside():
+    assert clip_region(10, 20, 100, 50, 1920, 1080) == (10, 20, 100, 50)
+    assert clip_region(-30, 1050, 100, 50, 1920, 1080) == (0, 1050, 70, 30)
+    assert clip_region(1900, -10, 100, 50, 1920, 1080) == (1900, 0, 20, 40)
+    assert clip_region(2000, 0, 100, 50, 1920, 1080) is None
+
+
+class Failing:
+    name = 'failing'
+
+    def grab(self, x, y, width, height, out=None):
+        raise RuntimeError("XShmGetImage failed")
+
+    def close(self):
+        pass
+
+
+class Unavailable:
+    name = 'unavailable'
+
+    def __init__(self):
+        raise RuntimeError("not here")
+
+
+class Working:
+    name = 'working'
+
+    def grab(self, x, y, width, height, out=None):
+        return np.zeros((height, width, 3), dtype=np.uint8)
+
+    def close(self):
+        pass
+
+
+def test_auto_capture_falls_back_when_grabs_keep_failing():
+    capture = AutoCapture([Unavailable, Failing, Working], max_failures=3)
+    assert capture.name == 'failing'
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match='XShmGetImage'):
+            capture.grab(0, 0, 8, 4)
+    assert capture.name == 'failing'
+    assert capture.grab(0, 0, 8, 4).shape == (4, 8, 3)
+    assert capture.name == 'working'
+    capture.close()
+
+
+class Flaky(Working):
+    """Fails every other grab"""
+    name = 'flaky'
+
+    def __init__(self):
+        self.grabs = 0
+
+    def grab(self, x, y, width, height, out=None):
+        self.grabs += 1
+        if self.grabs % 2:
+            raise RuntimeError("transient")
+        return super().grab(x, y, width, height, out)
+
+
+def test_auto_capture_keeps_backend_through_transient_failures():
+    capture = AutoCapture([Flaky, Working], max_failures=2)
+    for _ in range(4):
+        with pytest.raises(RuntimeError, match='transient'):
+            capture.grab(0, 0, 8, 4)
+        assert capture.grab(0, 0, 8, 4) is not None
+    assert capture.name == 'flaky'
+
+
+def test_auto_capture_keeps_last_backend_when_it_keeps_failing():
+    capture = AutoCapture([Failing], max_failures=2)
+    with pytest.raises(RuntimeError, match='XShmGetImage'):
+        capture.grab(0, 0, 8, 4)
+    with pytest.raises(RuntimeError, match='no other backend'):
+        capture.grab(0, 0, 8, 4)
+    # Still usable: later grabs report the backend's own error, not AttributeError
+    assert capture.name == 'failing'
+    with pytest.raises(RuntimeError, match='XShmGetImage'):
+        capture.grab(0, 0, 8, 4)
+
+
+def test_auto_capture_without_backends_raises():
+    with pytest.raises(RuntimeError):
+        AutoCapture([Unavailable])
+
+
+@pytest.fixture(scope='module')
+def display():
+    """An X display: the current one, or a private Xvfb server"""
+    if os.environ.get('DISPLAY'):
+        yield os.environ['DISPLAY']
+        return
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        pytest.skip("No X display and Xvfb is not installed")
+    server = subprocess.Popen([xvfb, ':97', '-screen', '0', '640x480x24', '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = ':97'
+    time.sleep(1.0)
+    try:
+        yield ':97'
+    finally:
+        del os.environ['DISPLAY']
+        server.terminate()
+        server.wait()
+
+
+def test_x11shm_grab_under_xvfb(display):
+    capture = X11ShmCapture()
+    try:
+        width, height = capture.screen_size
+        frame = capture.grab(0, 0, 64, 48)
+        assert frame.shape == (48, 64, 3) and frame.dtype == np.uint8
+
+        out = np.empty((48, 64, 3), dtype=np.uint8)
+        assert capture.grab(8, 8, 64, 48, out=out) is out
+
+        # Partly off-screen: no X error, the outside part is black
+        partial = capture.grab(width - 16, height - 16, 32, 32)
+        assert partial.shape == (32, 32, 3)
+        assert not partial[16:, :].any() and not partial[:, 16:].any()
+        assert capture.grab(width + 10, 0, 32, 32) is None
+    finally:
+        capture.close()
+
+
+def test_x11shm_unavailable_without_display(monkeypatch):
+    monkeypatch.delenv('DISPLAY', raising=False)
+    with pytest.raises(RuntimeError):
+        screen_capture.X11ShmCapture()
@@ -0,0 +1,35 @@
+import numpy as np
+
+from detections import nms
+from threshold_sweep import sweep_frame
+
+
+def candidate_rows(count, seed=0):
+    """Overlapping candidates of 3 classes as [x1, y1, x2, y2, conf, cls], by descending conf"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(50, 250, (4, 2))[rng.integers(0, 4, count)] + rng.normal(0, 8, (count, 2))
+    sizes = rng.uniform(20, 40, (count, 2))
+    rows = np.hstack([centers - sizes / 2, centers + sizes / 2,
+                      rng.uniform(0.01, 1.0, (count, 1)), rng.integers(0, 3, (count, 1))])
+    return rows[np.argsort(-rows[:, 4])].astype(np.float32)
+
+
+def test_sweep_frame_matches_nms_at_every_threshold():
+    conf_values = np.array([0.05, 0.25, 0.5, 0.75, 0.95], dtype=np.float32)
+    iou_values = np.array([0.3, 0.45, 0.6, 0.9], dtype=np.float32)
+    for seed in range(5):
+        rows = candidate_rows(120, seed)
+        counts = sweep_frame(rows, conf_values, iou_values)
+        for i, iou in enumerate(iou_values):
+            for c, conf in enumerate(conf_values):
+                above = rows[rows[:, 4] > conf]
+                expected = len(nms(above[:, :4], above[:, 4], iou, above[:, 5]))
+                assert counts[i, c] == expected, (seed, iou, conf)
+
+
+def test_sweep_frame_caps_at_max_det_and_handles_no_candidates():
+    rows = candidate_rows(120)
+    conf_values = np.array([0.05], dtype=np.float32)
+    iou_values = np.array([0.9], dtype=np.float32)
+    assert sweep_frame(rows, conf_values, iou_values, max_det=5)[0, 0] == 5
+    assert sweep_frame(rows[:0], conf_values, iou_values).tolist() == [[0]]
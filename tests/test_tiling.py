@@ -0,0 +1,56 @@
+import numpy as np
+
+from detection_cache import CachedDetector, DetectionCache
+from detections import Detections
+from fakes import FakeDetector
+from tiling import TiledDetector, merge_detections, tile_grid
+
+
+def test_tile_grid_covers_frame_with_full_size_tiles():
+    tiles = tile_grid(1000, 700, 640, 0.2)
+    assert tiles[:, 0].min() == 0 and tiles[:, 1].min() == 0
+    assert tiles[:, 2].max() == 1000 and tiles[:, 3].max() == 700
+    assert np.all(tiles[:, 2] - tiles[:, 0] == 640)
+    assert np.all(tiles[:, 3] - tiles[:, 1] == 640)
+
+
+def test_tile_grid_single_tile_for_small_frame():
+    assert tile_grid(320, 200, 640, 0.2).tolist() == [[0, 0, 320, 200]]
+
+
+def test_merge_detections_joins_box_cut_by_tile_edge():
+    left = Detections([[100, 100, 200, 180]], [0.9], [0])
+    right = Detections([[150, 100, 260, 180]], [0.6], [0])
+    merged = merge_detections([left, right], match_threshold=0.3)
+    assert len(merged) == 1
+    assert merged.xyxy.tolist() == [[100, 100, 260, 180]]
+    assert merged.conf.tolist() == [np.float32(0.9)]
+
+
+def test_merge_detections_keeps_same_part_and_other_class_boxes():
+    part = Detections([[0, 0, 100, 100], [10, 10, 110, 110]], [0.9, 0.8], [0, 0])
+    other = Detections([[0, 0, 100, 100]], [0.7], [1])
+    merged = merge_detections([part, other])
+    assert len(merged) == 3
+    assert merged.conf.tolist() == sorted(merged.conf.tolist(), reverse=True)
+
+
+def test_merge_detections_empty():
+    assert len(merge_detections([Detections.empty(), Detections.empty()])) == 0
+
+
+def test_coarse_pass_lowers_threshold_through_cache(tmp_path):
+    model = tmp_path / 'model.pt'
+    model.write_bytes(b'weights')
+    detections = Detections([[10, 10, 60, 60], [900, 600, 950, 650]], [0.9, 0.2], [0, 0])
+    base = FakeDetector(lambda frame: detections, model_path=str(model))
+    cached = CachedDetector(base, DetectionCache(str(tmp_path / 'cache.sqlite')))
+    tiled = TiledDetector(cached, tile_size=640, coarse=True, coarse_conf=0.1)
+
+    result = tiled.detect(np.zeros((700, 1000, 3), dtype=np.uint8))
+    assert base.thresholds[0] == 0.1
+    assert base.conf_threshold == 0.5
+    assert 'conf_threshold' not in vars(cached)
+    assert result.conf.min() >= 0.5
+    # Only tiles overlapping a coarse box run
+    assert tiled.tiles_skipped > 0
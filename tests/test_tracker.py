@@ -0,0 +1,61 @@
+import numpy as np
+
+from detections import Detections
+from fakes import FakeDetector
+from tracker import KeyframeTracker, MultiObjectTracker
+
+
+def boxes(*xyxy, cls=None):
+    return Detections(np.array(xyxy, dtype=np.float32), np.full(len(xyxy), 0.9), cls)
+
+
+def test_association_keeps_ids_of_moving_objects():
+    tracker = MultiObjectTracker(min_hits=2)
+    tracker.update(boxes([0, 0, 20, 40], [200, 200, 220, 240]))
+    assert tracker.ids.tolist() == [1, 2]
+
+    for step in range(1, 4):
+        tracker.predict()
+        tracker.update(boxes([200, 200 + 2 * step, 220, 240 + 2 * step], [3 * step, 0, 20 + 3 * step, 40]))
+    assert sorted(tracker.ids.tolist()) == [1, 2]
+    assert tracker.confirmed_ids == {1, 2}
+
+    # The tracks followed their own object, not the detection order
+    track_1 = tracker.boxes_xyxy()[tracker.ids == 1][0]
+    assert abs(track_1[0] - 9) < 3
+
+
+def test_association_is_class_aware_and_unmatched_tracks_expire():
+    tracker = MultiObjectTracker(max_misses=1)
+    tracker.update(boxes([0, 0, 20, 40], cls=[0]))
+    tracker.predict()
+    # Same place, other class: a new track, and the old one misses
+    tracker.update(boxes([0, 0, 20, 40], cls=[1]))
+    assert tracker.ids.tolist() == [1, 2]
+    assert tracker.misses.tolist() == [1, 0]
+
+    tracker.predict()
+    tracker.update(boxes([0, 0, 20, 40], cls=[1]))
+    assert tracker.ids.tolist() == [2]
+
+
+def test_each_detection_matches_at_most_one_track():
+    tracker = MultiObjectTracker()
+    tracker.update(boxes([0, 0, 20, 40], [2, 0, 22, 40]))
+    tracker.predict()
+    tracker.update(boxes([1, 0, 21, 40]))
+    # One track takes the detection, the other misses
+    assert sorted(tracker.misses.tolist()) == [0, 1]
+    assert len(tracker) == 2
+
+
+def test_keyframe_tracker_runs_detector_every_n_frames():
+    tracker = KeyframeTracker(every=3, min_confidence=0.0)
+    detector = FakeDetector(lambda frame: boxes([10, 10, 30, 50]))
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    results = tracker.detect_batch(detector, [frame] * 7)
+
+    assert detector.batches == [1, 1, 1]
+    assert all(len(result) == 1 and result.ids.tolist() == [1] for result in results)
+    stats = tracker.stats()
+    assert stats['keyframes'] == 3 and stats['frames'] == 7
@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+from detections import Detections
+from video_export import VideoExporter
+
+HIT = Detections([[1, 1, 5, 5]])
+
+
+def export(path, detected, frames=30, **kwargs):
+    exporter = VideoExporter(str(path), 30.0, queue_size=2, **kwargs)
+    for i in range(frames):
+        frame = np.full((32, 48, 3), i * 8, dtype=np.uint8)
+        exporter.write(i, frame, HIT if i in detected else Detections.empty())
+    return exporter.close()
+
+
+def frame_count(path):
+    cap = cv2.VideoCapture(str(path))
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    return count
+
+
+def test_writes_every_frame_by_default(tmp_path):
+    path = tmp_path / 'all.avi'
+    stats = export(path, set(), frames=10)
+    assert stats['frames_written'] == 10 and stats['segments'] == [(0, 9)]
+    assert frame_count(path) == 10
+
+
+def test_detections_only_writes_segments_with_pre_and_post_roll(tmp_path):
+    path = tmp_path / 'segments.avi'
+    stats = export(path, {5, 7, 20}, detections_only=True, pre_roll=2, post_roll=2)
+    # 3-4 pre-roll, 5-7 detections (7 extends the post-roll), 8-9 post-roll;
+    # then 18-19 pre-roll, 20, 21-22 post-roll
+    assert stats['segments'] == [(3, 9), (18, 22)]
+    assert stats['frames_seen'] == 30 and stats['frames_written'] == 12
+    assert frame_count(path) == 12
+
+
+def test_close_segments_merge(tmp_path):
+    stats = export(tmp_path / 'merged.avi', {5, 10}, frames=15,
+                   detections_only=True, pre_roll=2, post_roll=2)
+    # The pre-roll of 10 starts right after the post-roll of 5 ends
+    assert stats['segments'] == [(3, 12)]
+
+
+def test_no_detections_writes_nothing(tmp_path):
+    path = tmp_path / 'empty.avi'
+    stats = export(path, set(), frames=10, detections_only=True, pre_roll=3)
+    assert stats['frames_written'] == 0 and stats['segments'] == []
+    assert not path.exists()
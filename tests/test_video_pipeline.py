@@ -0,0 +1,54 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from fakes import FakeDetector, no_boxes
+from video_pipeline import VideoPipeline
+
+FRAMES = 23
+
+
+@pytest.fixture
+def video(tmp_path):
+    """MJPG clip whose frame i is filled with gray level 10 * i"""
+    path = str(tmp_path / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30.0, (32, 24))
+    for i in range(FRAMES):
+        writer.write(np.full((24, 32, 3), 10 * i, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_frames_come_out_in_order(video):
+    detector = FakeDetector(max_batch_size=4)
+    seen = []
+    stats = VideoPipeline(detector, queue_size=1, headless=True).run(
+        video, sink=lambda index, frame, detections: seen.append((index, int(frame.mean()))))
+
+    assert [index for index, _ in seen] == list(range(FRAMES))
+    assert all(abs(level - 10 * index) <= 2 for index, level in seen)
+    assert detector.batches == [4, 4, 4, 4, 4, 3]
+    assert stats['frames'] == FRAMES
+
+
+def test_inference_error_stops_every_stage(video):
+    def boxes(frame):
+        if frame.mean() > 100:
+            raise RuntimeError("model crashed")
+        return no_boxes(frame)
+
+    threads = threading.active_count()
+    seen = []
+    stats = VideoPipeline(FakeDetector(boxes, max_batch_size=4), queue_size=1, headless=True).run(
+        video, sink=lambda index, frame, detections: seen.append(index))
+
+    # Batches before the failing one are rendered, then the pipeline shuts down
+    assert seen == list(range(8))
+    assert stats['frames'] == 8
+    assert threading.active_count() == threads
+
+
+def test_missing_video_returns_none(tmp_path):
+    assert VideoPipeline(FakeDetector(), headless=True).run(str(tmp_path / 'missing.avi')) is None